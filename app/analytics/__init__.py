@@ -0,0 +1,14 @@
+# app/analytics/__init__.py
+# Cálculos sobre series de precios (vectorizados con numpy)
+from .resample import parse_interval, resample, source_interval
+from .indicators import IndicatorMemo, indicator_memo, indicators_response, parse_indicators
+
+__all__ = [
+    "parse_interval",
+    "resample",
+    "source_interval",
+    "IndicatorMemo",
+    "indicator_memo",
+    "indicators_response",
+    "parse_indicators"
+]
@@ -0,0 +1,351 @@
+# app/analytics/indicators.py
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.config import Config
+from app.timeseries import to_arrays
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Barras de historia que se conservan por serie memorizada
+MEMO_MAX_BARS = 20000
+
+Columns = Dict[str, np.ndarray]
+
+def _nan(size: int) -> np.ndarray:
+    return np.full(size, np.nan)
+
+def ema(x: np.ndarray, alpha: float, prev: Optional[float] = None) -> np.ndarray:
+    """
+    Media exponencial y_i = alpha * x_i + (1 - alpha) * y_{i-1}, calculada por bloques
+
+    Dentro de cada bloque la recurrencia se resuelve con una suma acumulada
+    ponderada; el tamaño del bloque se limita para que los factores
+    (1 - alpha)^-j no desborden.
+    Args:
+        x: Valores de entrada
+        alpha: Factor de suavizado (0, 1]
+        prev: Último valor de la media anterior a x (None: se parte de x[0])
+    """
+    out = np.empty(x.size)
+    if x.size == 0:
+        return out
+    beta = 1.0 - alpha
+    if beta <= 0:
+        out[:] = x
+        return out
+    prev = x[0] if prev is None or np.isnan(prev) else prev
+    if x.size <= 8:
+        # Colas cortas (actualizaciones incrementales): más rápido sin numpy
+        for i, value in enumerate(x.tolist()):
+            prev = alpha * value + beta * prev
+            out[i] = prev
+        return out
+    block = int(min(1024, max(1, 230 / -np.log(beta))))  # beta^-block <= e^230
+    powers = beta ** -np.arange(min(block, x.size))
+    for start in range(0, x.size, block):
+        segment = x[start:start + block]
+        weights = powers[:segment.size]
+        values = (beta * prev + alpha * np.cumsum(segment * weights)) / weights
+        out[start:start + segment.size] = values
+        prev = values[-1]
+    return out
+
+def _rolling_mean_std(x: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Media y desviación típica (poblacional) móviles; NaN hasta completar la ventana"""
+    mean, std = _nan(x.size), _nan(x.size)
+    if x.size < window:
+        return mean, std
+    shifted = x - x[0]  # Reduce la cancelación numérica de la suma de cuadrados
+    sums = np.cumsum(np.concatenate(([0.0], shifted)))
+    squares = np.cumsum(np.concatenate(([0.0], shifted * shifted)))
+    window_sum = sums[window:] - sums[:-window]
+    window_squares = squares[window:] - squares[:-window]
+    mean[window - 1:] = window_sum / window + x[0]
+    std[window - 1:] = np.sqrt(np.maximum(window_squares / window - (window_sum / window) ** 2, 0))
+    return mean, std
+
+def _previous(arrays: Columns, name: str, start: int) -> np.ndarray:
+    """Valores de la barra anterior a cada barra desde `start` (NaN para la primera)"""
+    values = arrays[name]
+    return np.concatenate(([values[start - 1]] if start > 0 else [np.nan], values[start:-1]))
+
+@dataclass
+class Indicator:
+    """
+    Indicador técnico con cálculo incremental
+
+    `update(arrays, start, prefix)` calcula las columnas desde la barra
+    `start` usando las columnas ya calculadas hasta `start - 1` (start=0:
+    cálculo completo). Las columnas que empiezan por '_' son estado interno.
+    """
+    name: str
+    params: Tuple[float, ...]
+    update: Callable[["Indicator", Columns, int, Columns], Columns] = field(repr=False)
+    key: str = field(init=False)  # Nombre de la columna principal (ej: 'sma_20')
+
+    def __post_init__(self):
+        self.key = "_".join([self.name, *(f"{p:g}" for p in self.params)])
+
+def _windowed(values: Callable[[Columns, int], np.ndarray], window: int, start: int, arrays: Columns,
+              compute: Callable[[np.ndarray], Dict[str, np.ndarray]]) -> Columns:
+    """Recalcula una ventana móvil solo sobre la cola (más las barras de ventana previas)"""
+    low = max(0, start - window + 1)
+    result = compute(values(arrays, low))
+    return {name: column[start - low:] for name, column in result.items()}
+
+def _sma(ind: Indicator, arrays: Columns, start: int, prefix: Columns) -> Columns:
+    window = int(ind.params[0])
+    return _windowed(lambda a, low: a["close"][low:], window, start, arrays,
+                     lambda x: {ind.key: _rolling_mean_std(x, window)[0]})
+
+def _ema(ind: Indicator, arrays: Columns, start: int, prefix: Columns) -> Columns:
+    window = int(ind.params[0])
+    prev = prefix[ind.key][start - 1] if start > 0 else None
+    return {ind.key: ema(arrays["close"][start:], 2 / (window + 1), prev)}
+
+def _rsi(ind: Indicator, arrays: Columns, start: int, prefix: Columns) -> Columns:
+    window = int(ind.params[0])
+    close = arrays["close"]
+    change = close[start:] - _previous(arrays, "close", start)
+    if start == 0:
+        change[0] = 0.0
+    gains, losses = np.maximum(change, 0), np.maximum(-change, 0)
+    alpha = 1 / window  # Suavizado de Wilder
+    avg_gain = ema(gains, alpha, prefix[f"_{ind.key}_gain"][start - 1] if start > 0 else None)
+    avg_loss = ema(losses, alpha, prefix[f"_{ind.key}_loss"][start - 1] if start > 0 else None)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    rsi[np.arange(start, close.size) < window] = np.nan
+    return {ind.key: rsi, f"_{ind.key}_gain": avg_gain, f"_{ind.key}_loss": avg_loss}
+
+def _macd(ind: Indicator, arrays: Columns, start: int, prefix: Columns) -> Columns:
+    fast, slow, signal = (int(p) for p in ind.params)
+    close = arrays["close"][start:]
+    previous = (lambda name: prefix[name][start - 1]) if start > 0 else (lambda name: None)
+    fast_ema = ema(close, 2 / (fast + 1), previous(f"_{ind.key}_fast"))
+    slow_ema = ema(close, 2 / (slow + 1), previous(f"_{ind.key}_slow"))
+    line = fast_ema - slow_ema
+    signal_line = ema(line, 2 / (signal + 1), previous(f"{ind.key}_signal"))
+    return {
+        ind.key: line,
+        f"{ind.key}_signal": signal_line,
+        f"{ind.key}_hist": line - signal_line,
+        f"_{ind.key}_fast": fast_ema,
+        f"_{ind.key}_slow": slow_ema
+    }
+
+def _bbands(ind: Indicator, arrays: Columns, start: int, prefix: Columns) -> Columns:
+    window, width = int(ind.params[0]), ind.params[1]
+
+    def compute(x):
+        mean, std = _rolling_mean_std(x, window)
+        return {f"{ind.key}_upper": mean + width * std, f"{ind.key}_middle": mean, f"{ind.key}_lower": mean - width * std}
+
+    return _windowed(lambda a, low: a["close"][low:], window, start, arrays, compute)
+
+def _atr(ind: Indicator, arrays: Columns, start: int, prefix: Columns) -> Columns:
+    window = int(ind.params[0])
+    high, low = arrays["high"][start:], arrays["low"][start:]
+    previous_close = _previous(arrays, "close", start)
+    with np.errstate(invalid="ignore"):
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    atr = ema(true_range, 1 / window, prefix[f"_{ind.key}_avg"][start - 1] if start > 0 else None)
+    result = atr.copy()
+    result[np.arange(start, arrays["close"].size) < window - 1] = np.nan
+    return {ind.key: result, f"_{ind.key}_avg": atr}
+
+def _volatility(ind: Indicator, arrays: Columns, start: int, prefix: Columns) -> Columns:
+    window = int(ind.params[0])
+
+    def returns(a, low):
+        close = a["close"][max(low - 1, 0):]
+        log_returns = np.diff(np.log(close))
+        return log_returns if low > 0 else np.concatenate(([np.nan], log_returns))
+
+    def compute(x):
+        # La primera barra no tiene rendimiento: la ventana empieza en la segunda
+        std = _nan(x.size)
+        if x.size and np.isnan(x[0]):
+            std[1:] = _rolling_mean_std(x[1:], window)[1]
+        else:
+            std = _rolling_mean_std(x, window)[1]
+        return {ind.key: std}
+
+    return _windowed(returns, window, start, arrays, compute)
+
+# Indicadores disponibles: nombre -> (función, parámetros por defecto)
+INDICATORS: Dict[str, Tuple[Callable, Tuple[float, ...]]] = {
+    "sma": (_sma, (20,)),
+    "ema": (_ema, (20,)),
+    "rsi": (_rsi, (14,)),
+    "macd": (_macd, (12, 26, 9)),
+    "bbands": (_bbands, (20, 2)),
+    "atr": (_atr, (14,)),
+    "volatility": (_volatility, (20,))
+}
+
+def parse_indicators(spec: str) -> List[Indicator]:
+    """
+    Interpreta una lista de indicadores ('sma:20,rsi:14,macd:12:26:9,bbands:20:2')
+    Raises:
+        ValueError: Si un indicador o sus parámetros no son válidos
+    """
+    indicators: Dict[str, Indicator] = {}
+    for item in filter(None, (part.strip().lower() for part in spec.split(","))):
+        name, *raw_params = item.split(":")
+        if name not in INDICATORS:
+            raise ValueError(f"Indicador no soportado: {name}. Usar: {', '.join(INDICATORS)}")
+        function, defaults = INDICATORS[name]
+        try:
+            params = tuple(float(p) for p in raw_params) or defaults
+        except ValueError:
+            raise ValueError(f"Parámetros no válidos para {name}: {item}")
+        if len(params) != len(defaults) or any(p <= 0 for p in params):
+            raise ValueError(f"{name} requiere {len(defaults)} parámetro(s) positivo(s)")
+        if name not in ("bbands",) and any(p != int(p) for p in params):
+            raise ValueError(f"Los periodos de {name} deben ser enteros")
+        indicator = Indicator(name, params, function)
+        indicators[indicator.key] = indicator
+    if not indicators:
+        raise ValueError("Debe indicar al menos un indicador")
+    return list(indicators.values())
+
+def compute(indicators: List[Indicator], arrays: Columns, start: int = 0, prefix: Optional[Columns] = None) -> Columns:
+    """Calcula (o continúa desde `start`) las columnas de varios indicadores"""
+    columns: Columns = {}
+    for indicator in indicators:
+        columns.update(indicator.update(indicator, arrays, start, prefix or {}))
+    return columns
+
+@dataclass
+class MemoEntry:
+    """Historia memorizada de una serie y columnas calculadas sobre ella"""
+    arrays: Columns
+    columns: Columns
+    indicators: Dict[str, Indicator]
+
+class IndicatorMemo:
+    """
+    Memoriza indicadores por (símbolo, intervalo) y los actualiza de forma incremental
+
+    Si la serie no cambia (misma primera y última barra) se devuelve el
+    resultado guardado; si llegan barras nuevas solo se calcula la cola desde
+    la penúltima barra memorizada (la última puede haber sido parcial). Una
+    serie que empieza en otra barra se recalcula entera: los indicadores
+    dependen de la historia previa y un rango debe dar siempre lo mismo.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], MemoEntry]" = OrderedDict()
+        self.counters = {"hits": 0, "incremental": 0, "full": 0}
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.counters = {key: 0 for key in self.counters}
+
+    def get(self, series: Dict, indicators: List[Indicator]) -> Columns:
+        """
+        Columnas de los indicadores alineadas con las barras de `series`
+        """
+        key = (series["symbol"], series["interval"])
+        arrays = to_arrays(series)
+        size = arrays["timestamps"].size
+        entry = self._entries.get(key)
+        requested = {indicator.key: indicator for indicator in indicators}
+        if not size:
+            return {name: column for name, column in compute(indicators, arrays).items() if not name.startswith("_")}
+
+        if entry is not None and self._unchanged(entry, arrays):
+            missing = [ind for name, ind in requested.items() if name not in entry.indicators]
+            if not missing:
+                self.counters["hits"] += 1
+                self._entries.move_to_end(key)
+                return self._align(entry, size)
+            # Indicadores nuevos sobre la historia ya memorizada
+            entry.columns.update(compute(missing, entry.arrays))
+            entry.indicators.update({ind.key: ind for ind in missing})
+            self.counters["full"] += 1
+            return self._align(entry, size)
+
+        start = self._continuation(entry, arrays) if entry is not None else None
+        if start is None:
+            entry = MemoEntry(arrays, compute(indicators, arrays), dict(requested))
+            self.counters["full"] += 1
+        else:
+            entry = self._extend(entry, arrays, start, requested)
+            self.counters["incremental"] += 1
+
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return self._align(entry, size)
+
+    @staticmethod
+    def _unchanged(entry: MemoEntry, arrays: Columns) -> bool:
+        """Misma primera barra y misma última barra (timestamp y valores) que la historia memorizada"""
+        return entry.arrays["timestamps"][0] == arrays["timestamps"][0] and \
+            all(entry.arrays[name][-1] == arrays[name][-1] for name in arrays)
+
+    @staticmethod
+    def _continuation(entry: MemoEntry, arrays: Columns) -> Optional[int]:
+        """
+        Posición de `arrays` desde la que continuar la historia memorizada
+        (None si no empiezan en la misma barra o no se solapan y hay que recalcular)
+        """
+        memo_ts = entry.arrays["timestamps"]
+        if memo_ts.size < 2 or arrays["timestamps"][0] != memo_ts[0]:
+            return None
+        anchor = memo_ts[-2]
+        timestamps = arrays["timestamps"]
+        position = int(np.searchsorted(timestamps, anchor))
+        if position >= timestamps.size or timestamps[position] != anchor or timestamps[-1] <= anchor:
+            return None
+        return position + 1
+
+    def _extend(self, entry: MemoEntry, arrays: Columns, start: int, requested: Dict[str, Indicator]) -> MemoEntry:
+        """Añade a la historia las barras nuevas y calcula solo su tramo"""
+        keep = entry.arrays["timestamps"].size - 1  # Se recalcula la última barra memorizada
+        merged = {name: np.concatenate((entry.arrays[name][:keep], arrays[name][start:])) for name in arrays}
+        indicators = {**entry.indicators, **requested}
+        known = [ind for name, ind in indicators.items() if name in entry.indicators]
+        new = [ind for name, ind in indicators.items() if name not in entry.indicators]
+
+        prefix = {name: column[:keep] for name, column in entry.columns.items()}
+        tail = compute(known, merged, keep, prefix)
+        columns = {name: np.concatenate((prefix[name], tail[name])) for name in tail}
+        columns.update(compute(new, merged))
+
+        # Limitar la historia conservada
+        if merged["timestamps"].size > MEMO_MAX_BARS:
+            cut = merged["timestamps"].size - MEMO_MAX_BARS
+            merged = {name: values[cut:] for name, values in merged.items()}
+            columns = {name: values[cut:] for name, values in columns.items()}
+        return MemoEntry(merged, columns, indicators)
+
+    @staticmethod
+    def _align(entry: MemoEntry, size: int) -> Columns:
+        """Últimas `size` barras de cada columna pública"""
+        return {name: column[-size:] for name, column in entry.columns.items()
+                if not name.startswith("_")}
+
+indicator_memo = IndicatorMemo(Config.INDICATORS_MEMO_MAX_ENTRIES)
+
+def indicators_response(series: Dict, indicators: List[Indicator], columns: Columns) -> Dict:
+    """Respuesta JSON: timestamps, cierre y columnas pedidas (NaN -> null)"""
+    wanted = [name for name in columns if any(name == ind.key or name.startswith(f"{ind.key}_") for ind in indicators)]
+    return {
+        "symbol": series["symbol"],
+        "interval": series["interval"],
+        "timestamps": series["timestamps"],
+        "close": series["close"],
+        "indicators": {
+            name: np.where(np.isnan(columns[name]), None, columns[name]).tolist() for name in wanted
+        }
+    }
@@ -0,0 +1,84 @@
+# app/analytics/resample.py
+import re
+from typing import Dict, Tuple
+import numpy as np
+from app.timeseries import from_arrays, series_meta, to_arrays, local_offsets
+
+# Intervalos nativos de Alpha Vantage, de más fino a más grueso (segundos)
+NATIVE_SECONDS = {"1min": 60, "5min": 300, "15min": 900, "30min": 1800, "60min": 3600}
+
+# Alias de intervalos de calendario
+CALENDAR_ALIASES = {"weekly": "1w", "monthly": "1mo", "quarterly": "3mo", "yearly": "12mo"}
+
+INTERVAL_PATTERN = re.compile(r"^(\d+)(min|h|d|w|mo)$")
+UNIT_SECONDS = {"min": 60, "h": 3600, "d": 86400}
+
+def parse_interval(interval: str) -> Tuple[str, int]:
+    """
+    Interpreta un intervalo destino ('2h', '90min', '3d', 'weekly', '1mo'...)
+    Returns:
+        Tupla (unidad, cantidad); unidad 's' (segundos fijos), 'w' o 'mo'
+    """
+    value = CALENDAR_ALIASES.get(interval, interval)
+    if value == "daily":
+        return "s", 86400
+    match = INTERVAL_PATTERN.match(value)
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Intervalo no válido: {interval}")
+    amount, unit = int(match.group(1)), match.group(2)
+    if unit in UNIT_SECONDS:
+        return "s", amount * UNIT_SECONDS[unit]
+    return unit, amount
+
+def source_interval(interval: str) -> str:
+    """Serie nativa más gruesa a partir de la que se construye el intervalo destino"""
+    unit, amount = parse_interval(interval)
+    if unit != "s" or amount % 86400 == 0:
+        return "daily"
+    for native, seconds in sorted(NATIVE_SECONDS.items(), key=lambda item: -item[1]):
+        if amount % seconds == 0:
+            return native
+    raise ValueError(f"Intervalo no válido: {interval} (debe ser múltiplo de 1min)")
+
+def _bucket_keys(timestamps: np.ndarray, unit: str, amount: int) -> np.ndarray:
+    """Clave de agrupación de cada barra (en hora local del mercado)"""
+    if unit == "s":
+        return timestamps // amount
+    days = timestamps // 86400
+    if unit == "w":
+        return (days + 3) // (7 * amount)  # El 1970-01-01 fue jueves: semanas de lunes a domingo
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return months // amount
+
+def resample(series: Dict, interval: str) -> Dict:
+    """
+    Agrega una serie columnar a un intervalo más grueso
+    (open=primero, high=máximo, low=mínimo, close=último, volume=suma)
+    Args:
+        series: Serie columnar ordenada por fecha ascendente
+        interval: Intervalo destino ('2h', '4h', 'weekly', 'monthly'...)
+
+    Returns:
+        Serie columnar agregada; cada barra lleva el timestamp de su primera barra de origen
+    """
+    unit, amount = parse_interval(interval)
+    arrays = to_arrays(series)
+    timestamps = arrays["timestamps"]
+    meta = {**series_meta(series), "interval": interval, "source_interval": series["interval"]}
+    if timestamps.size == 0:
+        return from_arrays(meta, arrays)
+
+    # Las barras intradía se agrupan por hora local (las diarias ya están en fecha de sesión)
+    local = timestamps if series["interval"] == "daily" else timestamps + local_offsets(timestamps, series.get("timezone"))
+    keys = _bucket_keys(local, unit, amount)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.concatenate((starts[1:], [timestamps.size])) - 1
+
+    return from_arrays(meta, {
+        "timestamps": timestamps[starts],
+        "open": arrays["open"][starts],
+        "high": np.maximum.reduceat(arrays["high"], starts),
+        "low": np.minimum.reduceat(arrays["low"], starts),
+        "close": arrays["close"][ends],
+        "volume": np.add.reduceat(arrays["volume"], starts)
+    })
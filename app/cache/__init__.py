@@ -1,4 +1,20 @@
 # app/cache/__init__.py
-from .redis_cache import CacheManager
+from .redis_cache import CacheManager, cache, is_error
+from .keys import build_key
+from .ttl import ttl_for, PRICES_INTRADAY, PRICES_DAILY, FUNDAMENTALS, NEWS, FIGI
+from .validators import etag_for, last_modified_for
 
-__all__ = ["CacheManager"]
\ No newline at end of file
+__all__ = [
+    "CacheManager",
+    "cache",
+    "is_error",
+    "build_key",
+    "ttl_for",
+    "etag_for",
+    "last_modified_for",
+    "PRICES_INTRADAY",
+    "PRICES_DAILY",
+    "FUNDAMENTALS",
+    "NEWS",
+    "FIGI"
+]
\ No newline at end of file
@@ -0,0 +1,53 @@
+# app/cache/keys.py
+import hashlib
+import inspect
+from typing import Any, Dict
+
+# Prefijo común (versionado para invalidar todo el caché si cambia el formato)
+KEY_PREFIX = "fin:v1"
+
+# Longitud máxima de la parte de argumentos antes de resumirla con un hash
+MAX_ARGS_LENGTH = 200
+
+def normalize_value(value: Any) -> str:
+    """Normaliza un argumento para que variantes equivalentes compartan clave"""
+    if isinstance(value, str):
+        return value.strip().casefold()
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize_value(v) for v in value]
+        return ",".join(sorted(items) if isinstance(value, set) else items)
+    if isinstance(value, dict):
+        return ",".join(f"{k}:{normalize_value(v)}" for k, v in sorted(value.items()))
+    return str(value)
+
+def bind_arguments(signature: inspect.Signature, args: tuple, kwargs: dict) -> Dict[str, Any]:
+    """Asocia argumentos posicionales y por nombre a la firma (con valores por defecto)"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+def build_key(provider: str, endpoint: str, arguments: Dict[str, Any]) -> str:
+    """
+    Construye la clave de caché de una llamada a un proveedor
+    Args:
+        provider: Proveedor (ej: 'alpha_vantage')
+        endpoint: Recurso consultado (ej: 'prices')
+        arguments: Argumentos de la llamada ya asociados a su nombre
+
+    Returns:
+        Clave del tipo 'fin:v1:alpha_vantage:prices:interval=daily|symbol=aapl'
+    """
+    normalized = "|".join(
+        f"{name}={normalize_value(value)}" for name, value in sorted(arguments.items())
+    )
+    if len(normalized) > MAX_ARGS_LENGTH:
+        normalized = hashlib.sha1(normalized.encode()).hexdigest()
+    return f"{KEY_PREFIX}:{provider}:{endpoint}:{normalized}"
+
+def stale_key(key: str) -> str:
+    """Clave de la copia de respaldo que se sirve si el proveedor falla"""
+    return f"stale:{key}"
+
+def modified_key(key: str) -> str:
+    """Clave con el hash del valor y el instante en que cambió (Last-Modified)"""
+    return f"modified:{key}"
@@ -0,0 +1,79 @@
+# app/cache/memory.py
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+@dataclass
+class MemoryEntry:
+    """Entrada del caché en memoria"""
+    value: Any
+    size: int  # Tamaño serializado en bytes
+    fresh_until: float  # Instante (monotónico) hasta el que la entrada es fresca
+    stale_until: float  # Instante hasta el que puede servirse caducada
+    payload: Optional[bytes] = None  # JSON ya serializado (respuestas rápidas)
+    etag: Optional[str] = None  # Hash del JSON (respuestas condicionales)
+    last_modified: Optional[float] = None  # Última actualización del dato (segundos UNIX)
+    expires_at: float = 0.0  # Instante (monotónico) en que caduca en L2 (max-age de las respuestas)
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.fresh_until
+
+class MemoryCache:
+    """Caché LRU por proceso con límite de entradas/bytes y expiración por TTL"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, MemoryEntry]" = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[MemoryEntry]:
+        """Devuelve la entrada (fresca o caducada servible) o None si no existe"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic() if now is None else now
+        if now >= entry.stale_until:
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, value: Any, size: int, ttl: float, stale_ttl: float = 0,
+            payload: Optional[bytes] = None, etag: Optional[str] = None,
+            last_modified: Optional[float] = None, expires_in: Optional[float] = None) -> None:
+        """
+        Guarda una entrada y expulsa las menos usadas si se superan los límites
+        (expires_in: segundos de vida que le quedan en L2; por defecto, ttl)
+        """
+        if payload is not None:
+            size += len(payload)  # El payload ocupa memoria además del valor
+        if size > self.max_bytes:
+            return
+        self.delete(key)
+        now = time.monotonic()
+        self._entries[key] = MemoryEntry(
+            value, size, now + ttl, now + ttl + stale_ttl, payload, etag, last_modified,
+            now + (ttl if expires_in is None else expires_in)
+        )
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
@@ -0,0 +1,430 @@
+# app/cache/redis_cache.py
+import asyncio
+import inspect
+import logging
+import time
+from collections import Counter
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from app.config import Config
+from app.cache.keys import bind_arguments, build_key, modified_key, stale_key
+from app.cache.memory import MemoryCache
+from app.cache.serialization import dumps, loads
+from app.cache.singleflight import SingleFlight
+from app.cache.ttl import ttl_for
+from app.cache.validators import etag_for, last_modified_for, modified_record, written_at_for
+from app.metrics import InstrumentedCounter, observe_resilience
+from app.resilience import mark_stale, stale_value
+from app.tracing import span
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Clase de datos fija o función que la deriva de los argumentos de la llamada
+DataClass = Union[str, Callable[[dict], str]]
+
+# Errores del proveedor (no de la petición) ante los que se sirve la copia caducada
+STALE_IF_ERROR_CODES = {429, 502, 503, 504}
+
+def _remaining(pttl: int) -> float:
+    """TTL restante en segundos a partir del PTTL de Redis (sin expiración: el de L1)"""
+    return pttl / 1000 if pttl > 0 else Config.CACHE_L1_TTL
+
+def is_error(result: Any) -> bool:
+    """Indica si un servicio devolvió un diccionario de error (no se cachea)"""
+    return isinstance(result, dict) and "error" in result
+
+class CacheManager:
+    """
+    Gestor de caché en dos niveles:
+    - L1: LRU en memoria del proceso (stale-while-revalidate)
+    - L2: Redis compartido entre workers
+    Las cargas idénticas simultáneas se agrupan con single-flight.
+
+    Los valores de L1 se devuelven por referencia: no deben modificarse.
+    """
+
+    def __init__(self, client: Optional[redis.Redis] = None):
+        self.redis_client = client or redis.Redis(
+            host=Config.REDIS_HOST,
+            port=Config.REDIS_PORT,
+            password=Config.REDIS_PASSWORD,
+            db=Config.REDIS_DB,
+            socket_timeout=Config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=Config.REDIS_SOCKET_TIMEOUT
+        )
+        self.memory = MemoryCache(Config.CACHE_L1_MAX_ENTRIES, Config.CACHE_L1_MAX_BYTES)
+        self.counters: Counter = InstrumentedCounter()
+        self.flights = SingleFlight()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Lee un valor de Redis (None si no existe o Redis no responde)"""
+        payload, _, _ = await self._l2_get(key)
+        return None if payload is None else loads(payload)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        """Guarda un valor serializado en Redis con expiración"""
+        await self._l2_set(key, dumps(value), ttl)
+
+    async def delete(self, key: str) -> None:
+        """Elimina una clave de ambos niveles"""
+        self.memory.delete(key)
+        try:
+            await self.redis_client.delete(key)
+        except (RedisError, OSError) as e:
+            self.counters["l2_errors"] += 1
+            logger.warning(f"Redis no disponible al borrar {key}: {str(e)}")
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Lee varias claves: de L1 las frescas y el resto de L2 en un único viaje
+        (con su TTL restante y su registro de modificación, como `_l2_get`).
+        Una entrada de L1 caducada se revalida en L2; si Redis no responde se
+        devuelve la copia caducada y, si L2 ya no la tiene, None para que el
+        llamador la vuelva a pedir.
+        """
+        results: List[Optional[Any]] = [None] * len(keys)
+        missing = []
+        expired: Dict[int, Any] = {}
+        now = time.monotonic()
+        for index, key in enumerate(keys):
+            entry = self.memory.get(key, now)
+            if entry is not None and entry.is_fresh(now):
+                self.counters["l1_hits"] += 1
+                results[index] = entry.value
+                continue
+            if entry is not None:
+                self.counters["l1_stale_hits"] += 1
+                expired[index] = entry.value
+            else:
+                self.counters["l1_misses"] += 1
+            missing.append(index)
+
+        if missing:
+            try:
+                with span("cache.l2", op="get_many", keys=len(missing)):
+                    async with self.redis_client.pipeline(transaction=False) as pipe:
+                        for index in missing:
+                            pipe.get(keys[index]).pttl(keys[index]).get(modified_key(keys[index]))
+                        replies = await pipe.execute()
+            except (RedisError, OSError) as e:
+                self.counters["l2_errors"] += 1
+                logger.warning(f"Redis no disponible al leer {len(missing)} claves: {str(e)}")
+                for index, value in expired.items():
+                    results[index] = value
+                return results
+            for position, index in enumerate(missing):
+                payload, pttl, record = replies[3 * position:3 * position + 3]
+                if payload is None:
+                    self.counters["l2_misses"] += 1
+                    continue
+                self.counters["l2_hits"] += 1
+                results[index] = loads(payload)
+                self._remember(keys[index], results[index], payload, _remaining(pttl), record)
+        return results
+
+    async def set_many(self, items: Dict[str, Any], ttl: int) -> None:
+        """Guarda varios valores en ambos niveles con un único viaje a Redis"""
+        payloads = {key: dumps(value) for key, value in items.items()}
+        try:
+            with span("cache.l2", op="mset", keys=len(payloads)):
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for key, payload in payloads.items():
+                        pipe.set(key, payload, ex=ttl)
+                    await pipe.execute()
+        except (RedisError, OSError) as e:
+            self.counters["l2_errors"] += 1
+            logger.warning(f"Redis no disponible al escribir {len(payloads)} claves: {str(e)}")
+        for key, payload in payloads.items():
+            self._remember(key, items[key], payload, ttl)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Contadores de aciertos y fallos por nivel"""
+        return {
+            "l1": {
+                "hits": self.counters["l1_hits"],
+                "stale_hits": self.counters["l1_stale_hits"],
+                "payload_reuses": self.counters["payload_reuses"],
+                "misses": self.counters["l1_misses"],
+                "entries": len(self.memory),
+                "bytes": self.memory.size_bytes
+            },
+            "l2": {
+                "hits": self.counters["l2_hits"],
+                "misses": self.counters["l2_misses"],
+                "errors": self.counters["l2_errors"],
+                "stale_if_error": self.counters["stale_if_error"]
+            },
+            "refreshes": {
+                "started": self.counters["refreshes"],
+                "in_progress": len(self._refreshing)
+            },
+            "singleflight": self.flights.stats()
+        }
+
+    def reset(self) -> None:
+        """Vacía el nivel en memoria y reinicia los contadores"""
+        self.memory.clear()
+        self.counters.clear()
+        self.flights.counters.clear()
+
+    async def _l2_get(self, key: str) -> Tuple[Optional[bytes], float, Optional[bytes]]:
+        """
+        Lee el payload, el TTL restante (segundos) y el registro de modificación
+        (ver `modified_record`) de Redis en un solo viaje
+        """
+        try:
+            with span("cache.l2", op="get"):
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    payload, pttl, record = await pipe.get(key).pttl(key).get(modified_key(key)).execute()
+        except (RedisError, OSError) as e:
+            self.counters["l2_errors"] += 1
+            logger.warning(f"Redis no disponible al leer {key}: {str(e)}")
+            return None, 0, None
+        if payload is None:
+            self.counters["l2_misses"] += 1
+            return None, 0, None
+        self.counters["l2_hits"] += 1
+        return payload, _remaining(pttl), record
+
+    async def _l2_set(self, key: str, payload: bytes, ttl: int, keep_stale: bool = False,
+                      record: Optional[str] = None) -> None:
+        """
+        Escribe en Redis y, en el mismo viaje, la copia de respaldo (keep_stale)
+        y el registro de modificación, que dura tanto como la copia para que un
+        refresco con el mismo contenido conserve su Last-Modified
+        """
+        try:
+            with span("cache.l2", op="set"):
+                if keep_stale or record is not None:
+                    async with self.redis_client.pipeline(transaction=False) as pipe:
+                        pipe.set(key, payload, ex=ttl)
+                        if keep_stale:
+                            pipe.set(stale_key(key), payload, ex=Config.CACHE_STALE_IF_ERROR_TTL)
+                        if record is not None:
+                            pipe.set(modified_key(key), record, ex=max(ttl, Config.CACHE_STALE_IF_ERROR_TTL))
+                        await pipe.execute()
+                else:
+                    await self.redis_client.set(key, payload, ex=ttl)
+        except (RedisError, OSError) as e:
+            self.counters["l2_errors"] += 1
+            logger.warning(f"Redis no disponible al escribir {key}: {str(e)}")
+
+    def payload_for(self, key: str, value: Any) -> bytes:
+        """
+        JSON de un valor cacheado: reutiliza los bytes guardados en L1 si
+        corresponden a ese mismo valor y, si no, lo serializa
+        """
+        entry = self.memory.get(key)
+        if entry is not None and entry.value is value and entry.payload is not None:
+            self.counters["payload_reuses"] += 1
+            return entry.payload
+        return dumps(value)
+
+    def validators_for(self, key: str, value: Any, ttl: int) -> Tuple[str, Optional[float], float]:
+        """
+        ETag, Last-Modified y segundos de vigencia de un valor cacheado: los de
+        su entrada en L1 si corresponden a ese mismo valor (vigencia = TTL
+        restante en L2) y, si no, calculados al momento con `ttl` de vigencia
+        """
+        entry = self.memory.get(key)
+        if entry is not None and entry.value is value and entry.etag is not None:
+            return entry.etag, entry.last_modified, max(entry.expires_at - time.monotonic(), 0)
+        return etag_for(dumps(value)), last_modified_for(value), ttl
+
+    def _remember(self, key: str, value: Any, payload: bytes, ttl: float,
+                  record: Union[str, bytes, None] = None) -> None:
+        """
+        Guarda en L1 sin superar el TTL restante de L2, con los validadores HTTP
+        del valor. Last-Modified es el 'last_refreshed' del proveedor o, si no
+        lo da, el instante en que se guardó ese contenido según su registro de
+        modificación; sin él, el de la entrada anterior si el hash no cambió.
+        """
+        etag = etag_for(payload)
+        last_modified = last_modified_for(value) or written_at_for(record, etag)
+        if last_modified is None:
+            previous = self.memory.get(key)
+            if previous is not None and previous.etag == etag:
+                last_modified = previous.last_modified
+        self.memory.set(
+            key, value, len(payload), min(Config.CACHE_L1_TTL, ttl), Config.CACHE_STALE_TTL,
+            payload if Config.FAST_JSON_RESPONSES else None, etag, last_modified, ttl
+        )
+
+    async def _written_at(self, key: str, etag: str) -> float:
+        """Instante en que se guardó por primera vez este contenido (ahora si ha cambiado)"""
+        try:
+            written_at = written_at_for(await self.redis_client.get(modified_key(key)), etag)
+        except (RedisError, OSError) as e:
+            self.counters["l2_errors"] += 1
+            logger.warning(f"Redis no disponible al leer la modificación de {key}: {str(e)}")
+            written_at = None
+        return time.time() if written_at is None else written_at
+
+    async def _load(self, key: str, fetch: Callable[[], Awaitable[Any]], data_class: str) -> Any:
+        """Carga una clave agrupando las llamadas concurrentes del worker"""
+        return await self.flights.do(key, lambda: self._load_once(key, fetch, data_class))
+
+    async def _load_once(self, key: str, fetch: Callable[[], Awaitable[Any]], data_class: str) -> Any:
+        """Lee de L2 o, si falta, del proveedor; actualiza ambos niveles"""
+        payload, remaining, record = await self._l2_get(key)
+        if payload is not None:
+            value = loads(payload)
+            self._remember(key, value, payload, remaining, record)
+            return value
+
+        # Solo un worker consulta al proveedor; el resto espera su resultado en L2
+        token = await self.flights.acquire(self.redis_client, key)
+        if token is None:
+            with span("cache.wait"):
+                published = await self.flights.wait_for_leader(self.redis_client, key)
+            if published is not None:
+                payload, pttl, record = published
+                value = loads(payload)
+                self._remember(key, value, payload, _remaining(pttl), record)
+                return value
+
+        try:
+            result = await self._fetch_and_store(key, fetch, data_class)
+            if is_error(result) and result.get("code") in STALE_IF_ERROR_CODES:
+                return await self._stale_fallback(key, result)
+            return result
+        finally:
+            if token:
+                await self.flights.release(self.redis_client, key, token)
+
+    async def _fetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Any]], data_class: str) -> Any:
+        """Consulta al proveedor y guarda el resultado en ambos niveles (salvo errores)"""
+        result = await fetch()
+        if not is_error(result):
+            ttl = ttl_for(data_class)
+            payload = dumps(result)
+            etag = etag_for(payload)
+            record = modified_record(etag, await self._written_at(key, etag))
+            await self._l2_set(key, payload, ttl, keep_stale=Config.CACHE_STALE_IF_ERROR, record=record)
+            self._remember(key, result, payload, ttl, record)
+        return result
+
+    async def _stale_fallback(self, key: str, error: Dict[str, Any]) -> Any:
+        """
+        Con el proveedor caído, devuelve la última copia conocida marcada como
+        caducada ('stale': true y cabecera Warning); sin copia, el error original.
+        No se guarda en L1 para volver a intentarlo en la siguiente petición.
+        """
+        if not Config.CACHE_STALE_IF_ERROR:
+            return error
+        try:
+            with span("cache.l2", op="stale"):
+                payload = await self.redis_client.get(stale_key(key))
+        except (RedisError, OSError) as e:
+            self.counters["l2_errors"] += 1
+            logger.warning(f"Redis no disponible al leer la copia de respaldo de {key}: {str(e)}")
+            return error
+        if payload is None:
+            return error
+        self.counters["stale_if_error"] += 1
+        observe_resilience(key.split(":")[2], "stale_served")
+        mark_stale(key)
+        logger.warning(f"Sirviendo copia caducada de {key}: {error['error']}")
+        return stale_value(loads(payload))
+
+    async def ttl_many(self, keys: List[str]) -> List[float]:
+        """TTL restante en Redis (segundos) de varias claves; 0 si no existen o Redis no responde"""
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.pttl(key)
+                remaining = await pipe.execute()
+        except (RedisError, OSError) as e:
+            self.counters["l2_errors"] += 1
+            logger.warning(f"Redis no disponible al leer TTL de {len(keys)} claves: {str(e)}")
+            return [0.0] * len(keys)
+        return [max(pttl, 0) / 1000 for pttl in remaining]
+
+    def _schedule_refresh(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        """Lanza un único refresco en segundo plano por clave"""
+        if key in self._refreshing:
+            return
+        self.counters["refreshes"] += 1
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+
+        def done(finished: asyncio.Task):
+            self._refreshing.pop(key, None)
+            if not finished.cancelled() and finished.exception():
+                logger.error(f"Error refrescando {key}: {finished.exception()}")
+
+        task.add_done_callback(done)
+
+    def cached(self, provider: str, endpoint: str, data_class: DataClass):
+        """
+        Decorador de caché read-through para funciones asíncronas de servicios
+        Args:
+            provider: Proveedor de los datos (ej: 'alpha_vantage')
+            endpoint: Recurso consultado (ej: 'prices')
+            data_class: Clase de datos que determina el TTL (o función que la
+                deriva de los argumentos de la llamada)
+        """
+        def decorator(func: Callable):
+            signature = inspect.signature(func)
+
+            def key_for(*args, **kwargs) -> str:
+                return build_key(provider, endpoint, bind_arguments(signature, args, kwargs))
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not Config.CACHE_ENABLED:
+                    return await func(*args, **kwargs)
+
+                arguments = bind_arguments(signature, args, kwargs)
+                key = build_key(provider, endpoint, arguments)
+                klass = data_class(arguments) if callable(data_class) else data_class
+
+                async def load():
+                    return await self._load(key, lambda: func(*args, **kwargs), klass)
+
+                entry = self.memory.get(key)
+                if entry is not None:
+                    if entry.is_fresh(time.monotonic()):
+                        self.counters["l1_hits"] += 1
+                    else:
+                        self.counters["l1_stale_hits"] += 1
+                        self._schedule_refresh(key, load)
+                    return entry.value
+
+                self.counters["l1_misses"] += 1
+                result = await load()
+                if isinstance(result, dict) and result.get("stale") is True:
+                    mark_stale(key)  # Las llamadas agrupadas con la que falló también lo marcan
+                return result
+
+            async def raw(*args, **kwargs) -> Tuple[Any, Optional[bytes]]:
+                """Como la función decorada, pero también devuelve el JSON ya serializado"""
+                result = await wrapper(*args, **kwargs)
+                if is_error(result):
+                    return result, None
+                return result, self.payload_for(key_for(*args, **kwargs), result)
+
+            async def refresh(*args, **kwargs):
+                """Consulta al proveedor sin leer la caché y sustituye la entrada"""
+                arguments = bind_arguments(signature, args, kwargs)
+                key = build_key(provider, endpoint, arguments)
+                klass = data_class(arguments) if callable(data_class) else data_class
+                return await self.flights.do(key, lambda: self._fetch_and_store(key, lambda: func(*args, **kwargs), klass))
+
+            def data_class_for(*args, **kwargs) -> str:
+                arguments = bind_arguments(signature, args, kwargs)
+                return data_class(arguments) if callable(data_class) else data_class
+
+            wrapper.cache_key = key_for
+            wrapper.data_class = data_class_for
+            wrapper.raw = raw
+            wrapper.refresh = refresh
+            return wrapper
+        return decorator
+
+cache = CacheManager()
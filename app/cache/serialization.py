@@ -0,0 +1,11 @@
+# app/cache/serialization.py
+from typing import Any
+import orjson
+
+def dumps(value: Any) -> bytes:
+    """Serializa a JSON compacto (bytes) para almacenar en Redis"""
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+def loads(payload: bytes) -> Any:
+    """Deserializa un valor almacenado en Redis"""
+    return orjson.loads(payload)
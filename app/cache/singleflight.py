@@ -0,0 +1,120 @@
+# app/cache/singleflight.py
+import asyncio
+import logging
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from redis.exceptions import RedisError
+from app.config import Config
+from app.cache.keys import modified_key
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Borra el lease solo si sigue perteneciendo a quien lo adquirió
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Renueva un lease si es nuestro o lo adquiere si está libre (liderazgo de tareas periódicas)
+# KEYS[1]: lease; ARGV: id del worker, duración (ms)
+LEADER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas simultáneas en una sola petición al proveedor:
+    - dentro del worker, con una tarea compartida por clave
+    - entre workers y nodos, con un lease en Redis (SET NX PX)
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters: Counter = Counter()
+
+    def stats(self) -> Dict[str, int]:
+        """Peticiones deduplicadas y leases adquiridos"""
+        return {
+            "local_deduplicated": self.counters["local_deduplicated"],
+            "remote_deduplicated": self.counters["remote_deduplicated"],
+            "leases_acquired": self.counters["leases_acquired"],
+            "lease_timeouts": self.counters["lease_timeouts"],
+            "in_flight": len(self._inflight)
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecuta `fn` una sola vez por clave entre las llamadas concurrentes del worker"""
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["local_deduplicated"] += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: si un cliente se desconecta, la petición sigue para los demás
+        return await asyncio.shield(task)
+
+    async def acquire(self, redis_client, key: str) -> Optional[str]:
+        """
+        Intenta adquirir el lease distribuido de una clave
+        Returns:
+            Token del lease, "" si Redis no responde (se continúa sin lease)
+            o None si otro worker ya está consultando al proveedor
+        """
+        token = uuid.uuid4().hex
+        try:
+            acquired = await redis_client.set(
+                f"lease:{key}", token, nx=True, px=Config.SINGLEFLIGHT_LEASE_MS
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Lease no disponible para {key}: {str(e)}")
+            return ""
+        if acquired:
+            self.counters["leases_acquired"] += 1
+            return token
+        return None
+
+    async def release(self, redis_client, key: str, token: str) -> None:
+        """Libera el lease si sigue siendo nuestro"""
+        if not token:
+            return
+        try:
+            await redis_client.eval(RELEASE_SCRIPT, 1, f"lease:{key}", token)
+        except (RedisError, OSError) as e:
+            logger.warning(f"No se pudo liberar el lease de {key}: {str(e)}")
+
+    async def wait_for_leader(self, redis_client, key: str) -> Optional[Tuple[bytes, int, Optional[bytes]]]:
+        """
+        Espera a que el worker con el lease publique el resultado en Redis
+        Returns:
+            Payload publicado con su PTTL y su registro de modificación (leídos
+            en el mismo viaje), o None si el lease se liberó o caducó sin resultado
+        """
+        interval = Config.SINGLEFLIGHT_POLL_MS / 1000
+        attempts = max(int(Config.SINGLEFLIGHT_LEASE_MS / Config.SINGLEFLIGHT_POLL_MS), 1)
+        for _ in range(attempts):
+            await asyncio.sleep(interval)
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    payload, pttl, record, leased = await pipe.get(key).pttl(key).get(modified_key(key)) \
+                        .exists(f"lease:{key}").execute()
+            except (RedisError, OSError):
+                return None
+            if payload is not None:
+                self.counters["remote_deduplicated"] += 1
+                return payload, pttl, record
+            if not leased:
+                return None
+        self.counters["lease_timeouts"] += 1
+        return None
@@ -0,0 +1,45 @@
+# app/cache/ttl.py
+from datetime import datetime, time, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from app.config import Config
+
+try:
+    MARKET_TZ = ZoneInfo("America/New_York")
+except ZoneInfoNotFoundError:  # Sin base de datos de zonas horarias (p. ej. Windows sin tzdata)
+    MARKET_TZ = timezone(timedelta(hours=-5))
+
+# Cierre del mercado estadounidense y margen hasta que el proveedor publica la barra diaria
+MARKET_CLOSE = time(16, 0)
+CLOSE_PUBLISH_DELAY = timedelta(minutes=30)
+
+# Clases de datos con TTL propio (segundos)
+PRICES_INTRADAY = "prices_intraday"
+PRICES_DAILY = "prices_daily"
+FUNDAMENTALS = "fundamentals"
+NEWS = "news"
+FIGI = "figi"
+
+TTL_BY_DATA_CLASS = {
+    PRICES_INTRADAY: Config.CACHE_TTL_INTRADAY,
+    FUNDAMENTALS: Config.CACHE_TTL_FUNDAMENTALS,
+    NEWS: Config.CACHE_TTL_NEWS,
+    FIGI: Config.CACHE_TTL_FIGI,
+}
+
+def seconds_until_next_close(now: Optional[datetime] = None) -> int:
+    """
+    Segundos hasta que el proveedor publique la próxima barra diaria
+    (cierre de NYSE + margen, saltando fines de semana)
+    """
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+    target = datetime.combine(now.date(), MARKET_CLOSE, tzinfo=MARKET_TZ) + CLOSE_PUBLISH_DELAY
+    while target <= now or target.weekday() >= 5:
+        target = datetime.combine(target.date() + timedelta(days=1), MARKET_CLOSE, tzinfo=MARKET_TZ) + CLOSE_PUBLISH_DELAY
+    return max(int((target - now).total_seconds()), 1)
+
+def ttl_for(data_class: str, now: Optional[datetime] = None) -> int:
+    """Devuelve el TTL en segundos para una clase de datos"""
+    if data_class == PRICES_DAILY:
+        return seconds_until_next_close(now)
+    return TTL_BY_DATA_CLASS[data_class]
@@ -0,0 +1,54 @@
+# app/cache/validators.py
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+def etag_for(payload: bytes) -> str:
+    """Hash del JSON serializado (mismo valor en todos los workers)"""
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+def _timestamp(value: Any, tz_name: Optional[str] = None) -> Optional[float]:
+    """
+    Segundos UNIX de una fecha del proveedor: 'YYYY-MM-DD' (UTC), 'YYYY-MM-DD
+    HH:MM:SS' (hora local de tz_name) o ISO 8601 con zona ('...T10:00:00Z')
+    """
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        zone = timezone.utc
+        if len(value) > 10 and tz_name:
+            try:
+                zone = ZoneInfo(tz_name)
+            except (ZoneInfoNotFoundError, ValueError):
+                pass
+        moment = moment.replace(tzinfo=zone)
+    return moment.timestamp()
+
+def last_modified_for(value: Any) -> Optional[float]:
+    """
+    Última actualización del dato según el proveedor: el 'last_refreshed' de
+    una serie (el "Last Refreshed" de Alpha Vantage). None si no lo da.
+    """
+    if isinstance(value, dict) and value.get("last_refreshed"):
+        return _timestamp(value["last_refreshed"], value.get("timezone"))
+    return None
+
+def modified_record(etag: str, written_at: float) -> str:
+    """Hash del JSON e instante (segundos UNIX) en que se guardó con ese contenido"""
+    return f"{etag} {int(written_at)}"
+
+def written_at_for(record: Any, etag: str) -> Optional[float]:
+    """Instante guardado por `modified_record` si corresponde a ese mismo hash"""
+    if isinstance(record, bytes):
+        record = record.decode()
+    if not isinstance(record, str):
+        return None
+    stored_etag, _, written_at = record.partition(" ")
+    if stored_etag != etag or not written_at.isdigit():
+        return None
+    return float(written_at)
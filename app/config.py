@@ -20,6 +20,46 @@ class Config:
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_PASSWORD: Optional[str] = os.getenv("REDIS_PASSWORD")
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))
+    
+    # Caché de respuestas (TTL en segundos por clase de datos)
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "True").lower() == "true"
+    CACHE_TTL_INTRADAY: int = int(os.getenv("CACHE_TTL_INTRADAY", "60"))
+    CACHE_TTL_FUNDAMENTALS: int = int(os.getenv("CACHE_TTL_FUNDAMENTALS", "21600"))
+    CACHE_TTL_NEWS: int = int(os.getenv("CACHE_TTL_NEWS", "900"))
+    CACHE_TTL_FIGI: int = int(os.getenv("CACHE_TTL_FIGI", "2592000"))
+    
+    # Caché L1 en memoria por proceso (delante de Redis)
+    CACHE_L1_MAX_ENTRIES: int = int(os.getenv("CACHE_L1_MAX_ENTRIES", "2048"))
+    CACHE_L1_MAX_BYTES: int = int(os.getenv("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_L1_TTL: int = int(os.getenv("CACHE_L1_TTL", "30"))
+    CACHE_STALE_TTL: int = int(os.getenv("CACHE_STALE_TTL", "60"))
+    # Copia de respaldo en Redis que se sirve (marcada 'stale') si el proveedor falla
+    CACHE_STALE_IF_ERROR: bool = os.getenv("CACHE_STALE_IF_ERROR", "True").lower() == "true"
+    CACHE_STALE_IF_ERROR_TTL: int = int(os.getenv("CACHE_STALE_IF_ERROR_TTL", "604800"))
+    
+    # Respuestas rápidas: sin revalidar con response_model, serializadas con
+    # orjson y reutilizando el JSON guardado en caché (opcional)
+    FAST_JSON_RESPONSES: bool = os.getenv("FAST_JSON_RESPONSES", "False").lower() == "true"
+    
+    # Métricas de Prometheus en /metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    
+    # Trazas por petición (cabecera Server-Timing y exportación OTLP/JSON opcional)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+    TRACING_SAMPLE_RATE: float = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))  # Fracción de peticiones trazadas
+    TRACING_MAX_PER_SECOND: int = int(os.getenv("TRACING_MAX_PER_SECOND", "10"))  # Por worker
+    TRACING_SERVER_TIMING: bool = os.getenv("TRACING_SERVER_TIMING", "True").lower() == "true"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "none")  # none, otlp o file
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACING_EXPORT_FILE: str = os.getenv("TRACING_EXPORT_FILE", os.path.join("data", "traces.jsonl"))
+    TRACING_EXPORT_INTERVAL: float = float(os.getenv("TRACING_EXPORT_INTERVAL", "5"))
+    TRACING_EXPORT_BATCH: int = int(os.getenv("TRACING_EXPORT_BATCH", "512"))
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "financial-api")
+    
+    # Single-flight entre workers (lease en Redis mientras se consulta al proveedor)
+    SINGLEFLIGHT_LEASE_MS: int = int(os.getenv("SINGLEFLIGHT_LEASE_MS", "20000"))
+    SINGLEFLIGHT_POLL_MS: int = int(os.getenv("SINGLEFLIGHT_POLL_MS", "50"))
     
     # Configuración general
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
@@ -30,6 +70,55 @@ class Config:
     ALPHA_VANTAGE_RATE_LIMIT: int = int(os.getenv("ALPHA_VANTAGE_RATE_LIMIT", "5"))
     FMP_RATE_LIMIT: int = int(os.getenv("FMP_RATE_LIMIT", "250"))
     NEWSAPI_RATE_LIMIT: int = int(os.getenv("NEWSAPI_RATE_LIMIT", "100"))
+    OPENFIGI_RATE_LIMIT: int = int(os.getenv("OPENFIGI_RATE_LIMIT", "25"))
+    # Ventanas de los límites (segundos)
+    ALPHA_VANTAGE_RATE_WINDOW: int = int(os.getenv("ALPHA_VANTAGE_RATE_WINDOW", "60"))
+    FMP_RATE_WINDOW: int = int(os.getenv("FMP_RATE_WINDOW", "86400"))
+    NEWSAPI_RATE_WINDOW: int = int(os.getenv("NEWSAPI_RATE_WINDOW", "86400"))
+    OPENFIGI_RATE_WINDOW: int = int(os.getenv("OPENFIGI_RATE_WINDOW", "6"))
+    # Mapeo por lotes en OpenFIGI
+    OPENFIGI_BATCH_MAX_JOBS: int = int(os.getenv("OPENFIGI_BATCH_MAX_JOBS", "10000"))
+    OPENFIGI_BATCH_CONCURRENCY: int = int(os.getenv("OPENFIGI_BATCH_CONCURRENCY", "5"))
+    OPENFIGI_BATCH_MAX_WAIT: float = float(os.getenv("OPENFIGI_BATCH_MAX_WAIT", "60"))
+    # Espera máxima en cola antes de rechazar una llamada (segundos)
+    RATE_LIMIT_MAX_WAIT: float = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5"))
+    # Workers por nodo (reparte la cuota local si Redis no responde)
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+    
+    # URLs base de los proveedores (sobrescribibles para pruebas y benchmarks)
+    ALPHA_VANTAGE_BASE_URL: str = os.getenv("ALPHA_VANTAGE_BASE_URL", "https://www.alphavantage.co")
+    FMP_BASE_URL: str = os.getenv("FMP_BASE_URL", "https://financialmodelingprep.com")
+    OPENFIGI_BASE_URL: str = os.getenv("OPENFIGI_BASE_URL", "https://api.openfigi.com")
+    NEWS_API_BASE_URL: str = os.getenv("NEWS_API_BASE_URL", "https://newsapi.org")
+    
+    # Proveedores por tipo de dato, en orden de preferencia inicial (el enrutado
+    # elige después el más rápido que esté sano y tenga cuota)
+    PRICE_PROVIDERS: list = os.getenv("PRICE_PROVIDERS", "alpha_vantage,fmp").split(",")
+    RATIOS_PROVIDERS: list = os.getenv("RATIOS_PROVIDERS", "fmp").split(",")
+    INCOME_STATEMENT_PROVIDERS: list = os.getenv("INCOME_STATEMENT_PROVIDERS", "fmp,alpha_vantage").split(",")
+    # Peso de cada llamada en la media móvil de latencia y errores
+    PROVIDER_STATS_ALPHA: float = float(os.getenv("PROVIDER_STATS_ALPHA", "0.2"))
+    # Vida media de la tasa de errores sin nuevas llamadas (segundos)
+    PROVIDER_ERROR_HALF_LIFE: float = float(os.getenv("PROVIDER_ERROR_HALF_LIFE", "300"))
+    # Latencia supuesta de un proveedor aún sin medir (segundos)
+    PROVIDER_DEFAULT_LATENCY: float = float(os.getenv("PROVIDER_DEFAULT_LATENCY", "1.0"))
+    
+    # Pool de conexiones HTTP (un cliente compartido por proveedor)
+    HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+    
+    # Resiliencia frente a proveedores caídos (circuito por proveedor y worker)
+    BREAKER_FAILURES: int = int(os.getenv("BREAKER_FAILURES", "5"))
+    BREAKER_RESET: float = float(os.getenv("BREAKER_RESET", "30"))
+    # Reintentos de peticiones idempotentes (backoff exponencial con jitter)
+    RETRY_ATTEMPTS: int = int(os.getenv("RETRY_ATTEMPTS", "2"))
+    RETRY_BACKOFF_BASE: float = float(os.getenv("RETRY_BACKOFF_BASE", "0.2"))
+    RETRY_BACKOFF_MAX: float = float(os.getenv("RETRY_BACKOFF_MAX", "2"))
+    # Petición duplicada si la primera tarda más de HEDGE_AFTER segundos (0 = desactivado)
+    HEDGE_AFTER: float = float(os.getenv("HEDGE_AFTER", "0"))
+    HEDGE_PROVIDERS: list = os.getenv("HEDGE_PROVIDERS", "fmp,openfigi,newsapi").split(",")
     
     # Base de datos
     DATABASE_URI: Optional[str] = os.getenv("DATABASE_URI")
@@ -37,6 +126,68 @@ class Config:
     DATABASE_PASSWORD: Optional[str] = os.getenv("DATABASE_PASSWORD")
     DATABASE_NAME: Optional[str] = os.getenv("DATABASE_NAME")
     
+    # Precios de múltiples símbolos
+    PRICES_BATCH_MAX_SYMBOLS: int = int(os.getenv("PRICES_BATCH_MAX_SYMBOLS", "500"))
+    PRICES_BATCH_CONCURRENCY: int = int(os.getenv("PRICES_BATCH_CONCURRENCY", "10"))
+    
+    # Indicadores técnicos (series memorizadas por proceso)
+    INDICATORS_MEMO_MAX_ENTRIES: int = int(os.getenv("INDICATORS_MEMO_MAX_ENTRIES", "10000"))
+    
+    # Almacenamiento local
+    DATA_DIR: str = os.getenv("DATA_DIR", "data")
+    FIGI_INDEX_ENABLED: bool = os.getenv("FIGI_INDEX_ENABLED", "True").lower() == "true"
+    FIGI_INDEX_PATH: str = os.getenv("FIGI_INDEX_PATH", os.path.join(DATA_DIR, "figi_index.sqlite3"))
+    FIGI_INDEX_MAX_AGE_DAYS: float = float(os.getenv("FIGI_INDEX_MAX_AGE_DAYS", "90"))
+    PRICE_STORE_PATH: str = os.getenv("PRICE_STORE_PATH", os.path.join(DATA_DIR, "prices.sqlite3"))
+    FUNDAMENTALS_STORE_PATH: str = os.getenv("FUNDAMENTALS_STORE_PATH", os.path.join(DATA_DIR, "fundamentals.sqlite3"))
+    
+    # Screener (tabla de fundamentales refrescada en segundo plano)
+    SCREENER_ENABLED: bool = os.getenv("SCREENER_ENABLED", "True").lower() == "true"
+    SCREENER_UNIVERSE: str = os.getenv("SCREENER_UNIVERSE", "")  # Símbolos separados por comas
+    SCREENER_UNIVERSE_FILE: str = os.getenv("SCREENER_UNIVERSE_FILE", "")  # Un símbolo por línea
+    SCREENER_MAX_AGE: int = int(os.getenv("SCREENER_MAX_AGE", "86400"))
+    SCREENER_REFRESH_BATCH: int = int(os.getenv("SCREENER_REFRESH_BATCH", "50"))
+    SCREENER_REFRESH_INTERVAL: int = int(os.getenv("SCREENER_REFRESH_INTERVAL", "3600"))
+    SCREENER_RELOAD_INTERVAL: int = int(os.getenv("SCREENER_RELOAD_INTERVAL", "60"))
+    SCREENER_MAX_LIMIT: int = int(os.getenv("SCREENER_MAX_LIMIT", "1000"))
+    
+    # Precarga (mantiene en caché la watchlist y lo más consultado)
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "True").lower() == "true"
+    PREFETCH_WATCHLIST: str = os.getenv("PREFETCH_WATCHLIST", "")  # Símbolos separados por comas
+    PREFETCH_WATCHLIST_FILE: str = os.getenv("PREFETCH_WATCHLIST_FILE", "")  # Un símbolo por línea
+    PREFETCH_KINDS: list = os.getenv("PREFETCH_KINDS", "prices,ratios,financials,news").split(",")
+    PREFETCH_INTERVAL: int = int(os.getenv("PREFETCH_INTERVAL", "60"))
+    # Fracción de la cuota de cada proveedor que puede gastar la precarga
+    PREFETCH_QUOTA_SHARE: float = float(os.getenv("PREFETCH_QUOTA_SHARE", "0.5"))
+    # Se refresca cuando queda menos de esta fracción del TTL
+    PREFETCH_REFRESH_AHEAD: float = float(os.getenv("PREFETCH_REFRESH_AHEAD", "0.2"))
+    # Consultas más frecuentes (fuera de la watchlist) que también se precargan
+    PREFETCH_TOP_N: int = int(os.getenv("PREFETCH_TOP_N", "200"))
+    # Vida media de la frecuencia observada (segundos)
+    PREFETCH_DEMAND_HALF_LIFE: int = int(os.getenv("PREFETCH_DEMAND_HALF_LIFE", "3600"))
+    
+    # Streaming de precios (WebSocket / SSE)
+    STREAM_POLL_INTERVAL: float = float(os.getenv("STREAM_POLL_INTERVAL", "15"))
+    STREAM_HEARTBEAT: float = float(os.getenv("STREAM_HEARTBEAT", "15"))
+    STREAM_MAX_SYMBOLS: int = int(os.getenv("STREAM_MAX_SYMBOLS", "50"))  # Por conexión
+    STREAM_SNAPSHOT_BARS: int = int(os.getenv("STREAM_SNAPSHOT_BARS", "30"))  # Barras enviadas al suscribirse
+    # Barras pendientes por símbolo para un cliente lento (se conservan las más recientes)
+    STREAM_MAX_PENDING_BARS: int = int(os.getenv("STREAM_MAX_PENDING_BARS", "200"))
+    
+    # Exportaciones masivas (trabajos en segundo plano)
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", os.path.join(DATA_DIR, "exports"))
+    EXPORT_WORKERS: int = int(os.getenv("EXPORT_WORKERS", "2"))  # Trabajos simultáneos por worker
+    EXPORT_CONCURRENCY: int = int(os.getenv("EXPORT_CONCURRENCY", "4"))  # Símbolos en vuelo por trabajo
+    EXPORT_MAX_SYMBOLS: int = int(os.getenv("EXPORT_MAX_SYMBOLS", "10000"))
+    EXPORT_MAX_RETRIES: int = int(os.getenv("EXPORT_MAX_RETRIES", "5"))  # Reintentos ante un 429
+    EXPORT_RETENTION: int = int(os.getenv("EXPORT_RETENTION", "172800"))  # Segundos que se conservan los ficheros
+    
+    # Ficha de un símbolo (/snapshot): plazo por sección en segundos
+    SNAPSHOT_DEADLINE: float = float(os.getenv("SNAPSHOT_DEADLINE", "2.0"))
+    SNAPSHOT_MAX_DEADLINE: float = float(os.getenv("SNAPSHOT_MAX_DEADLINE", "15"))
+    # Segundos que se sugiere esperar antes de volver a pedir una sección pendiente
+    SNAPSHOT_RETRY_AFTER: float = float(os.getenv("SNAPSHOT_RETRY_AFTER", "2"))
+    
     # CORS
     CORS_ORIGINS: list = os.getenv("CORS_ORIGINS", "*").split(",")
     
@@ -0,0 +1,346 @@
+# app/exports.py
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from calendar import timegm
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import Config
+from app.cache import is_error
+from app.cache.serialization import dumps, loads
+from app.ratelimit import RateLimiter
+from app.services import alpha_vantage, fmp
+from app.tracing import detach
+from app.utils import validate_date_format
+
+try:  # Dependencia opcional: sin pyarrow se exporta CSV comprimido
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Columnas de cada conjunto de datos y su tipo en Arrow
+DATASETS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "prices": (("symbol", "string"), ("timestamp", "timestamp"), ("open", "float64"), ("high", "float64"),
+               ("low", "float64"), ("close", "float64"), ("volume", "int64")),
+    "financials": (("symbol", "string"), ("date", "string"), ("revenue", "float64"),
+                   ("net_income", "float64"), ("pe_ratio", "float64")),
+    "ratios": (("symbol", "string"), ("date", "string"), ("current_ratio", "float64"),
+               ("debt_to_equity", "float64"), ("roe", "float64"), ("pe_ratio", "float64"))
+}
+
+# Proveedor del que sale cada conjunto (para esperar según su límite de tasa)
+DATASET_PROVIDERS = {"prices": "alpha_vantage", "financials": "fmp", "ratios": "fmp"}
+
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv.gz"}
+MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+    "csv": "application/gzip"
+}
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Errores por símbolo que se guardan en el estado del trabajo
+MAX_REPORTED_ERRORS = 100
+
+def resolve_format(requested: str) -> str:
+    """Formato efectivo: Parquet/Arrow si pyarrow está instalado, si no CSV"""
+    return requested if requested == "csv" or pa is not None else "csv"
+
+class ColumnWriter:
+    """
+    Escritura incremental por lotes (un lote por símbolo)
+
+    Parquet escribe un row group por lote y Arrow IPC un record batch, de
+    modo que la memoria no depende del tamaño total de la exportación.
+    """
+
+    def __init__(self, path: str, dataset: str, format: str):
+        self.path = path
+        self.format = format
+        self.columns = DATASETS[dataset]
+        self.rows = 0
+        self._writer = None
+        self._handle = None
+        if format == "csv":
+            self._handle = gzip.open(path, "wt", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._handle)
+            self._writer.writerow([name for name, _ in self.columns])
+            return
+        self.schema = pa.schema([(name, self._arrow_type(kind)) for name, kind in self.columns])
+        if format == "parquet":
+            self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._handle = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._handle, self.schema,
+                                           options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+    @staticmethod
+    def _arrow_type(kind: str):
+        return pa.timestamp("s", tz="UTC") if kind == "timestamp" else getattr(pa, kind)()
+
+    def write(self, batch: Dict[str, List]) -> None:
+        """Escribe un lote columnar con las columnas del conjunto"""
+        length = len(batch[self.columns[0][0]])
+        if not length:
+            return
+        if self.format == "csv":
+            self._writer.writerows(zip(*(batch[name] for name, _ in self.columns)))
+        else:
+            table = pa.Table.from_pydict({name: batch[name] for name, _ in self.columns}, schema=self.schema)
+            self._writer.write_table(table)
+        self.rows += length
+
+    def close(self) -> None:
+        if self._writer is not None and self.format != "csv":
+            self._writer.close()
+        if self._handle is not None:
+            self._handle.close()
+
+def _day_start(day: str) -> int:
+    return timegm(datetime.strptime(day, "%Y-%m-%d").timetuple())
+
+async def fetch_dataset(dataset: str, symbol: str, request: Dict) -> Dict[str, Any]:
+    """
+    Datos de un símbolo en formato columnar (o diccionario de error)
+    Los precios salen del histórico local (sincronizado de forma incremental)
+    y los fundamentales de FMP, filtrados por fecha.
+    """
+    start, end = request.get("start"), request.get("end")
+    if dataset == "prices":
+        series = await alpha_vantage.get_price_history(
+            symbol, request["interval"],
+            _day_start(start) if start else None,
+            _day_start(end) + 86399 if end else None
+        )
+        if is_error(series):
+            return series
+        return {
+            "symbol": [symbol] * len(series["timestamps"]),
+            "timestamp": series["timestamps"],
+            **{field: series[field] for field in ("open", "high", "low", "close", "volume")}
+        }
+
+    service = fmp.get_income_statement if dataset == "financials" else fmp.get_financial_ratios
+    result = await service(symbol, request["period"])
+    if is_error(result):
+        return result
+    rows = [
+        row for row in sorted(result, key=lambda row: row.get("date") or "")
+        if (not start or (row.get("date") or "") >= start) and (not end or (row.get("date") or "") <= end)
+    ]
+    return {name: [symbol if name == "symbol" else row.get(name) for row in rows] for name, _ in DATASETS[dataset]}
+
+class ExportManager:
+    """
+    Trabajos de exportación masiva en segundo plano
+
+    Cada trabajo tiene un directorio en EXPORT_DIR con su estado (status.json)
+    y un fichero por conjunto de datos, de modo que cualquier worker que
+    comparta el directorio puede informar del estado y servir la descarga.
+    Los trabajos los ejecuta un pool de EXPORT_WORKERS tareas del worker que
+    recibió la solicitud.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(Config.EXPORT_DIR, job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Estado de un trabajo o None si no existe"""
+        if not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            with open(os.path.join(self._job_dir(job_id), "status.json"), "rb") as handle:
+                return loads(handle.read())
+        except FileNotFoundError:
+            return None
+
+    def file_path(self, job_id: str, dataset: str) -> Optional[Tuple[str, str]]:
+        """Ruta y tipo MIME del fichero de un conjunto si el trabajo ha terminado"""
+        status = self.status(job_id)
+        if not status or status["status"] != "completed" or dataset not in status["files"]:
+            return None
+        return os.path.join(self._job_dir(job_id), status["files"][dataset]["name"]), MEDIA_TYPES[status["format"]]
+
+    def _save(self, status: Dict) -> None:
+        """Escritura atómica del estado"""
+        status["updated_at"] = time.time()
+        path = os.path.join(self._job_dir(status["id"]), "status.json")
+        with open(path + ".tmp", "wb") as handle:
+            handle.write(dumps(status))
+        os.replace(path + ".tmp", path)
+
+    def validate(self, request: Dict) -> Optional[Dict]:
+        """Error de la solicitud o None si es válida"""
+        unknown = [dataset for dataset in request["datasets"] if dataset not in DATASETS]
+        if unknown:
+            return {"error": f"Conjuntos no soportados: {', '.join(unknown)}",
+                    "details": f"Usar: {', '.join(DATASETS)}", "code": 400}
+        if len(request["symbols"]) > Config.EXPORT_MAX_SYMBOLS:
+            return {"error": "Demasiados símbolos en la exportación",
+                    "details": f"Máximo {Config.EXPORT_MAX_SYMBOLS}", "code": 413}
+        for field in ("start", "end"):
+            if request.get(field) and not validate_date_format(request[field]):
+                return {"error": f"Fecha no válida: {request[field]}", "details": "Formato YYYY-MM-DD", "code": 400}
+        if request.get("start") and request.get("end") and request["start"] > request["end"]:
+            return {"error": "La fecha inicial es posterior a la final", "code": 400}
+        return None
+
+    async def submit(self, request: Dict) -> Dict:
+        """Crea y encola un trabajo; devuelve su estado inicial (o un error)"""
+        request = {
+            **request,
+            "symbols": list(dict.fromkeys(s.strip().upper() for s in request["symbols"] if s.strip())),
+            "datasets": list(dict.fromkeys(request["datasets"]))
+        }
+        error = self.validate(request)
+        if error:
+            return error
+
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id), exist_ok=True)
+        status = {
+            "id": job_id,
+            "status": "queued",
+            "format": resolve_format(request["format"]),
+            "request": request,
+            "created_at": time.time(),
+            "progress": {"done": 0, "total": len(request["symbols"]) * len(request["datasets"])},
+            "files": {},
+            "errors": {},
+            "error_count": 0
+        }
+        self._save(status)
+        self._ensure_workers()
+        await self._queue.put(job_id)
+        return status
+
+    async def run(self, job_id: str) -> Optional[Dict]:
+        """Ejecuta un trabajo: un fichero por conjunto, escrito símbolo a símbolo"""
+        status = self.status(job_id)
+        if status is None:
+            logger.warning(f"Exportación {job_id} no encontrada (eliminada antes de ejecutarse)")
+            return None
+        status["status"] = "running"
+        self._save(status)
+        request = status["request"]
+        try:
+            for dataset in request["datasets"]:
+                await self._export_dataset(status, dataset)
+            status["status"] = "completed"
+        except Exception as e:
+            logger.error(f"Error en la exportación {job_id}: {str(e)}", exc_info=True)
+            status.update(status="failed", error=str(e))
+        self._save(status)
+        return status
+
+    async def _export_dataset(self, status: Dict, dataset: str) -> None:
+        request, format = status["request"], status["format"]
+        name = f"{dataset}{EXTENSIONS[format]}"
+        path = os.path.join(self._job_dir(status["id"]), name)
+        writer = ColumnWriter(path, dataset, format)
+        try:
+            symbols = request["symbols"]
+            # Ventanas de EXPORT_CONCURRENCY símbolos: cada lote se escribe y se descarta
+            for offset in range(0, len(symbols), Config.EXPORT_CONCURRENCY):
+                window = symbols[offset:offset + Config.EXPORT_CONCURRENCY]
+                results = await asyncio.gather(*(self._fetch(dataset, symbol, request) for symbol in window))
+                for symbol, result in zip(window, results):
+                    if is_error(result):
+                        self._record_error(status, symbol, dataset, result)
+                    else:
+                        writer.write(result)
+                status["progress"]["done"] += len(window)
+                self._save(status)
+        finally:
+            writer.close()
+        status["files"][dataset] = {"name": name, "rows": writer.rows, "bytes": os.path.getsize(path)}
+
+    async def _fetch(self, dataset: str, symbol: str, request: Dict) -> Dict:
+        """Consulta con reintentos si el límite de tasa del proveedor rechaza la llamada"""
+        limit = RateLimiter._limits[DATASET_PROVIDERS[dataset]]
+        delay = min(limit["window"] / limit["max"], 60)
+        for attempt in range(Config.EXPORT_MAX_RETRIES + 1):
+            result = await fetch_dataset(dataset, symbol, request)
+            if not (is_error(result) and result.get("code") == 429) or attempt == Config.EXPORT_MAX_RETRIES:
+                return result
+            await asyncio.sleep(delay * (attempt + 1))
+        return result
+
+    @staticmethod
+    def _record_error(status: Dict, symbol: str, dataset: str, error: Dict) -> None:
+        status["error_count"] += 1
+        if len(status["errors"]) < MAX_REPORTED_ERRORS or symbol in status["errors"]:
+            status["errors"].setdefault(symbol, {})[dataset] = error["error"]
+
+    def cleanup(self) -> int:
+        """
+        Elimina los trabajos sin cambios desde hace más de EXPORT_RETENTION
+
+        Incluye los que quedaron 'queued' o 'running' tras un reinicio o un
+        stop() (un trabajo en curso actualiza su estado tras cada lote) y los
+        directorios sin estado de trabajos que no llegaron a crearse.
+        """
+        if not os.path.isdir(Config.EXPORT_DIR):
+            return 0
+        removed, threshold = 0, time.time() - Config.EXPORT_RETENTION
+        for job_id in os.listdir(Config.EXPORT_DIR):
+            if not JOB_ID_PATTERN.match(job_id):
+                continue
+            status = self.status(job_id)
+            try:
+                updated_at = status["updated_at"] if status else os.path.getmtime(self._job_dir(job_id))
+            except OSError:
+                continue
+            if updated_at < threshold:
+                if status and status["status"] not in ("completed", "failed"):
+                    logger.warning(f"Eliminando la exportación abandonada {job_id} ({status['status']})")
+                shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+                removed += 1
+        return removed
+
+    async def _worker(self) -> None:
+        detach()
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run(job_id)
+            except Exception as e:
+                # Un fallo fuera del trabajo (p. ej. al escribir su estado) no detiene el pool
+                logger.error(f"Error ejecutando la exportación {job_id}: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _ensure_workers(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(max(Config.EXPORT_WORKERS, 1))]
+
+    async def stop(self) -> None:
+        """Detiene el pool (los trabajos en curso quedan como 'running' hasta que cleanup los expira)"""
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers, self._queue = [], None
+
+exports = ExportManager()
@@ -1,9 +1,14 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse  # Importación añadida
-from typing import Optional, List, Dict, Union
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse  # Importación añadida
+from typing import Any, AsyncIterator, Callable, Optional, List, Dict, Tuple, Union
+import asyncio
 import logging
+import math
+import os
+import sqlite3
+from contextlib import asynccontextmanager
 from app.services import (
     alpha_vantage,
     fmp,
@@ -11,17 +16,66 @@ from app.services import (
     openfigi
 )
 from app.config import Config
-from app.schemas import FinancialRatios
-from app.utils import cache
+from app.services.clients import close_clients
+from app.services.providers import router as provider_router
+from app.schemas import FinancialRatios, BatchMappingRequest, BatchMappingResult, PriceBatchRequest, PriceSeries, ExportRequest
+from app.cache.serialization import dumps
+from app.cache import cache, ttl_for
+from app.storage import figi_index
+from app.timeseries import to_alpha_vantage
+from app.responses import FastJSONResponse, not_modified, validation_headers
+from app.analytics import resample, source_interval, indicator_memo, indicators_response, parse_indicators
+from app.utils import validate_date_format
+from app.screener import parse_query, screener
+from app.prefetch import prefetcher
+from app.streaming import price_stream, sse_events, websocket_session
+from app.exports import exports
+from app.snapshot import build_snapshot, parse_deadlines, parse_sections
+from app.projection import Projection, parse_projection
+from app.metrics import MetricsMiddleware, render as render_metrics
+from app.tracing import TracedRoute, TracingMiddleware, exporter as trace_exporter
+from app.resilience import StaleResponseMiddleware, circuit_stats
+from calendar import timegm
+from dataclasses import replace
+from datetime import datetime
 from pydantic import BaseModel
 
+# Parámetros de proyección comunes a los endpoints de datos
+FIELDS_DESCRIPTION = "Campos separados por comas (columnas de la serie o claves de cada fila)"
+LIMIT_DESCRIPTION = "Solo las N barras o filas más recientes"
+SINCE_DESCRIPTION = "Solo desde esta fecha YYYY-MM-DD (UTC) o timestamp UNIX"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Ciclo de vida del worker: arranca las tareas en segundo plano (refresco
+    del screener y precarga) y, al terminar, las detiene junto con el stream
+    de precios, las exportaciones y el exportador de trazas, y cierra los
+    clientes HTTP de los proveedores
+    """
+    screener.start()
+    prefetcher.start()
+    try:
+        yield
+    finally:
+        await screener.stop()
+        await prefetcher.stop()
+        await price_stream.stop()
+        await exports.stop()
+        await trace_exporter.stop()
+        await close_clients()
+
 # Configurar aplicación FastAPI
 app = FastAPI(
     title="API Financiera Integrada",
     description="API que unifica múltiples fuentes de datos financieros",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Los endpoints se miden con un span 'handler' (separa la validación de la respuesta)
+app.router.route_class = TracedRoute
+
 # Configurar CORS para desarrollo
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +85,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas por ruta (middleware ASGI puro: no interfiere con el streaming)
+app.add_middleware(MetricsMiddleware)
+
+# Trazas de las peticiones muestreadas y cabecera Server-Timing
+app.add_middleware(TracingMiddleware)
+
+# Cabeceras Warning/X-Stale cuando se sirven datos caducados de un proveedor caído
+app.add_middleware(StaleResponseMiddleware)
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -71,34 +134,78 @@ async def root():
 
 @app.get("/health", tags=["Root"])
 async def health_check():
-    """Verifica el estado de la API y sus dependencias (Redis)"""
+    """Verifica el estado de la API y sus dependencias (Redis y circuitos de los proveedores)"""
     redis_error = None
     try:
-        cache.redis_client.ping()
+        await cache.redis_client.ping()
         redis_status = "connected"
     except Exception as e:
         redis_status = "unreachable"
         redis_error = str(e)
 
+    # Un proveedor caído degrada el servicio pero no lo deja sin responder (copias caducadas)
+    circuits = circuit_stats()
+    providers_ok = all(circuit["state"] == "closed" for circuit in circuits.values())
+
     healthy = redis_status == "connected"
     return JSONResponse(
         status_code=200 if healthy else 503,
         content={
-            "status": "ok" if healthy else "degraded",
+            "status": "ok" if healthy and providers_ok else "degraded",
             "redis": redis_status,
-            "details": redis_error
+            "details": redis_error,
+            "circuits": circuits
         }
     )
 
+@app.get("/cache/stats", tags=["Root"])
+async def cache_stats():
+    """Aciertos y fallos del caché por nivel (L1 en memoria del worker, L2 Redis)"""
+    return cache.stats()
+
+@app.get("/metrics", tags=["Root"], include_in_schema=False)
+async def metrics():
+    """Métricas en formato de texto de Prometheus (agregadas entre workers)"""
+    payload, content_type = render_metrics()
+    return Response(payload, media_type=content_type)
+
+@app.get("/prefetch/stats", tags=["Root"])
+async def prefetch_stats():
+    """Estado de la precarga (líder, consultas refrescadas y cuota disponible)"""
+    return prefetcher.stats()
+
+@app.get("/tracing/stats", tags=["Root"])
+async def tracing_stats():
+    """Trazas exportadas, descartadas y pendientes del worker"""
+    return trace_exporter.stats()
+
+@app.get("/providers/stats", tags=["Root"])
+async def providers_stats():
+    """Latencia, tasa de errores y orden de preferencia de los proveedores (por worker)"""
+    return {**provider_router.stats(), "circuits": circuit_stats()}
+
 @app.get("/instruments", response_model=Union[List[InstrumentInfo], ErrorResponse], tags=["Instrumentos"])
 async def search_instruments(
+    request: Request,
+    response: Response,
     query: str = Query(..., min_length=2),
     id_type: str = Query("TICKER", min_length=3),
-    market: str = Query("US", min_length=2)
+    market: str = Query("US", min_length=2),
+    refresh: bool = Query(False, description="Ignorar caché e índice local y consultar OpenFIGI"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    limit: Optional[int] = Query(None, ge=1, description="Solo los N primeros instrumentos")
 ):
     """Buscar instrumentos financieros por identificador"""
     try:
-        result = openfigi.search_instrument(query, id_type, market)
+        projection = parse_projection(fields, limit)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e), "code": 400})
+    try:
+        if refresh:
+            await cache.delete(openfigi.search_instrument.cache_key(query, id_type, market))
+            await asyncio.to_thread(figi_index.delete, id_type, query, market)
+
+        result = await openfigi.search_instrument(query, id_type, market)
         
         # Manejar errores de la API
         if isinstance(result, dict) and "error" in result:
@@ -107,7 +214,7 @@ async def search_instruments(
                 content=result
             )
             
-        return result
+        return _cached_response(request, response, openfigi.search_instrument, (query, id_type, market), result, projection)
         
     except Exception as e:
         logger.error(f"Error en búsqueda: {str(e)}", exc_info=True)
@@ -119,20 +226,152 @@ async def search_instruments(
             }
         )
 
-@app.get("/prices", response_model=Union[Dict, ErrorResponse], tags=["Mercado"])
+@app.get("/instruments/figi/{figi}", response_model=Union[List[Dict], ErrorResponse], tags=["Instrumentos"])
+async def reverse_lookup(figi: str):
+    """Identificadores conocidos (ticker, ISIN, CUSIP...) de un FIGI, desde el índice local"""
+    try:
+        mappings = await asyncio.to_thread(figi_index.reverse, figi)
+    except sqlite3.Error as e:
+        logger.warning(f"Índice FIGI no disponible: {str(e)}")
+        return JSONResponse(
+            status_code=503,
+            content={"error": "Índice local de FIGI no disponible", "details": str(e), "code": 503}
+        )
+    if not mappings:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "FIGI no encontrado en el índice local", "details": figi}
+        )
+    return mappings
+
+@app.post("/instruments/batch", response_model=Union[Dict[str, Union[int, List[BatchMappingResult]]], ErrorResponse], tags=["Instrumentos"])
+async def map_instruments_batch(request: BatchMappingRequest):
+    """Resolver muchos identificadores (TICKER, ISIN, CUSIP...) en lote, en el orden recibido"""
+    if len(request.jobs) > Config.OPENFIGI_BATCH_MAX_JOBS:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "error": "Demasiados trabajos en el lote",
+                "details": f"Máximo {Config.OPENFIGI_BATCH_MAX_JOBS} por solicitud"
+            }
+        )
+
+    try:
+        jobs = [job.model_dump() for job in request.jobs]
+        results = await openfigi.map_instruments(jobs)
+
+        return {
+            "total": len(jobs),
+            "results": [
+                {"job": job, **result} if isinstance(result, dict) else {"job": job, "data": result}
+                for job, result in zip(jobs, results)
+            ]
+        }
+
+    except Exception as e:
+        logger.error(f"Error en mapeo por lotes: {str(e)}", exc_info=True)
+        return JSONResponse(
+            status_code=500,
+            content={
+                "error": "Error interno del servidor",
+                "details": str(e)
+            }
+        )
+
+def _conditional(
+    request: Request,
+    service: Callable,
+    args: tuple,
+    value: Any,
+    variant: str = ""
+) -> Tuple[Optional[Response], Dict[str, str]]:
+    """
+    Cabeceras de validación de un dato cacheado (ETag, Last-Modified y
+    Cache-Control según el TTL que le queda en la caché) y, si el cliente ya
+    tiene esa versión, la respuesta 304, sin serializar el dato
+    """
+    etag, last_modified, max_age = cache.validators_for(
+        service.cache_key(*args), value, ttl_for(service.data_class(*args))
+    )
+    headers = validation_headers(etag, last_modified, max_age, variant)
+    if not_modified(request.headers, headers["ETag"], last_modified):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
+
+def _variant(*parts: Any) -> str:
+    """Identificador de la representación servida (formato, proyección) para su ETag"""
+    return "|".join(repr(part) for part in parts if part is not None and part != "columnar")
+
+def _cached_response(
+    request: Request,
+    response: Response,
+    service: Callable,
+    args: tuple,
+    value: Any,
+    projection: Optional[Projection] = None
+):
+    """Respuesta de un dato cacheado: 304, proyección, JSON ya serializado o el valor tal cual"""
+    cached, headers = _conditional(request, service, args, value, _variant(projection))
+    if cached is not None:
+        return cached
+    if projection is not None:
+        return FastJSONResponse(projection.apply(value), headers=headers)
+    if Config.FAST_JSON_RESPONSES:
+        return FastJSONResponse(cache.payload_for(service.cache_key(*args), value), headers=headers)
+    response.headers.update(headers)
+    return value
+
+def _format_prices(prices: Dict, format: str, projection: Optional[Projection] = None) -> Dict:
+    """
+    Serie columnar o formato original de Alpha Vantage ('raw', heredado),
+    recortada según la proyección (en 'raw' solo se aplican limit y since)
+    """
+    if format == "raw" and "error" not in prices:
+        if projection is not None:
+            prices = replace(projection, fields=None).apply(prices)
+        return to_alpha_vantage(prices)
+    return projection.apply(prices) if projection is not None else prices
+
+@app.get("/prices", response_model=Union[PriceSeries, Dict, ErrorResponse], tags=["Mercado"])
 async def get_prices(
+    request: Request,
+    response: Response,
     symbol: str = Query(..., min_length=1),
-    interval: str = Query("daily", pattern="^(daily|1min|5min|15min|30min|60min)$")
+    interval: str = Query("daily", description="daily, 1min-60min o agregado: 2h, 4h, 90min, 3d, weekly, monthly..."),
+    format: str = Query("columnar", pattern="^(columnar|raw)$", description="'raw' devuelve el formato original de Alpha Vantage"),
+    start: Optional[str] = Query(None, description="Fecha inicial YYYY-MM-DD (UTC), desde el histórico local"),
+    end: Optional[str] = Query(None, description="Fecha final YYYY-MM-DD (UTC), incluida"),
+    fields: Optional[str] = Query(None, description="Columnas separadas por comas: open, high, low, close, volume"),
+    limit: Optional[int] = Query(None, ge=1, description="Solo las N barras más recientes"),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION)
 ):
     """Obtener datos históricos de precios"""
     try:
-        prices = alpha_vantage.get_stock_prices(symbol, interval)
+        projection = parse_projection(fields, limit, since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e), "code": 400})
+    try:
+        if start or end or interval not in alpha_vantage.FUNCTION_MAP:
+            return await _price_range(symbol, interval, format, start, end, projection)
+        prefetcher.record("prices", symbol, interval)
+        prices = await alpha_vantage.get_stock_prices(symbol, interval)
         if "error" in prices:
             return JSONResponse(
-                status_code=400,
+                status_code=prices.get("code", 400),
                 content=prices
             )
-        return prices
+        cached, headers = _conditional(request, alpha_vantage.get_stock_prices, (symbol, interval), prices, _variant(format, projection))
+        if cached is not None:
+            return cached
+        if projection is not None:
+            return FastJSONResponse(_format_prices(prices, format, projection), headers=headers)
+        if Config.FAST_JSON_RESPONSES and format == "columnar":
+            payload = cache.payload_for(alpha_vantage.get_stock_prices.cache_key(symbol, interval), prices)
+            return FastJSONResponse(payload, headers=headers)
+        if Config.FAST_JSON_RESPONSES:
+            return FastJSONResponse(to_alpha_vantage(prices), headers=headers)
+        response.headers.update(headers)
+        return _format_prices(prices, format)
     except Exception as e:
         logger.error(f"Error en precios: {str(e)}")
         return JSONResponse(
@@ -143,19 +382,214 @@ async def get_prices(
             }
         )
 
+def _day_start(day: str) -> int:
+    """Timestamp UNIX de las 00:00 UTC de una fecha YYYY-MM-DD"""
+    return timegm(datetime.strptime(day, "%Y-%m-%d").timetuple())
+
+async def _load_prices(symbol: str, interval: str, start: Optional[str], end: Optional[str]) -> Dict:
+    """Serie del histórico local en un rango de fechas, agregada si el intervalo no es nativo"""
+    try:
+        source = interval if interval in alpha_vantage.FUNCTION_MAP else source_interval(interval)
+    except ValueError as e:
+        return {"error": str(e), "code": 400}
+    for value in (start, end):
+        if value and not validate_date_format(value):
+            return {"error": f"Fecha no válida: {value}", "details": "Formato YYYY-MM-DD", "code": 400}
+    start_ts = _day_start(start) if start else None
+    end_ts = _day_start(end) + 86399 if end else None
+    if start_ts is not None and end_ts is not None and start_ts > end_ts:
+        return {"error": "La fecha inicial es posterior a la final", "code": 400}
+
+    prices = await alpha_vantage.get_price_history(symbol, source, start_ts, end_ts)
+    if "error" in prices or source == interval:
+        return prices
+    return resample(prices, interval)
+
+async def _price_range(
+    symbol: str,
+    interval: str,
+    format: str,
+    start: Optional[str],
+    end: Optional[str],
+    projection: Optional[Projection] = None
+):
+    """Rango de fechas servido desde el histórico local"""
+    prices = await _load_prices(symbol, interval, start, end)
+    if "error" in prices:
+        return JSONResponse(status_code=prices.get("code", 400), content=prices)
+    if Config.FAST_JSON_RESPONSES or projection is not None:
+        return FastJSONResponse(_format_prices(prices, format, projection))
+    return _format_prices(prices, format)
+
+@app.get("/prices/indicators", tags=["Mercado"])
+async def get_indicators(
+    symbol: str = Query(..., min_length=1),
+    indicators: str = Query(..., description="Ej: sma:20,ema:12,rsi:14,macd:12:26:9,bbands:20:2,atr:14,volatility:20"),
+    interval: str = Query("daily", description="Intervalo nativo o agregado (ver /prices)"),
+    start: Optional[str] = Query(None, description="Fecha inicial YYYY-MM-DD (UTC), desde el histórico local"),
+    end: Optional[str] = Query(None, description="Fecha final YYYY-MM-DD (UTC), incluida"),
+    limit: Optional[int] = Query(None, ge=1, description="Solo las N barras más recientes"),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION)
+):
+    """Indicadores técnicos calculados en el servidor sobre la serie de precios"""
+    try:
+        requested = parse_indicators(indicators)
+        projection = parse_projection(limit=limit, since=since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    if start or end or interval not in alpha_vantage.FUNCTION_MAP:
+        prices = await _load_prices(symbol, interval, start, end)
+    else:
+        prices = await alpha_vantage.get_stock_prices(symbol, interval)
+    if "error" in prices:
+        return JSONResponse(status_code=prices.get("code", 400), content=prices)
+
+    columns = indicator_memo.get(prices, requested)
+    response = indicators_response(prices, requested, columns)
+    if projection is not None:
+        # Los indicadores se calculan con toda la historia y se recorta solo la salida
+        start = projection.start(response["timestamps"])
+        response["timestamps"] = response["timestamps"][start:]
+        response["close"] = response["close"][start:]
+        response["indicators"] = {name: values[start:] for name, values in response["indicators"].items()}
+    return FastJSONResponse(response)
+
+def _parse_symbols(symbols: List[str]) -> List[str]:
+    """Normaliza símbolos (mayúsculas, sin vacíos ni duplicados, en orden)"""
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+
+async def _prices_batch(
+    symbols: List[str],
+    interval: str,
+    stream: bool,
+    format: str = "columnar",
+    projection: Optional[Projection] = None
+):
+    """Respuesta común de GET y POST /prices/batch"""
+    if not symbols:
+        return JSONResponse(status_code=400, content={"error": "Debe indicar al menos un símbolo"})
+    if len(symbols) > Config.PRICES_BATCH_MAX_SYMBOLS:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "error": "Demasiados símbolos en el lote",
+                "details": f"Máximo {Config.PRICES_BATCH_MAX_SYMBOLS} por solicitud"
+            }
+        )
+    for symbol in symbols:
+        prefetcher.record("prices", symbol, interval)
+
+    if stream:
+        # NDJSON: una línea por símbolo según se completa
+        async def lines():
+            async for symbol, result in alpha_vantage.iter_stock_prices(symbols, interval):
+                item = {"symbol": symbol, **result} if "error" in result else {"symbol": symbol, "data": _format_prices(result, format, projection)}
+                yield dumps(item) + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    results, errors = {}, {}
+    async for symbol, result in alpha_vantage.iter_stock_prices(symbols, interval):
+        if "error" in result:
+            errors[symbol] = result
+        else:
+            results[symbol] = _format_prices(result, format, projection)
+
+    if Config.FAST_JSON_RESPONSES and format == "columnar" and projection is None:
+        # Se ensambla el documento con los JSON de cada símbolo ya serializados
+        parts = [
+            dumps(symbol) + b":" + cache.payload_for(alpha_vantage.get_stock_prices.cache_key(symbol, interval), results[symbol])
+            for symbol in symbols if symbol in results
+        ]
+        return FastJSONResponse(
+            b'{"interval":' + dumps(interval) + b',"total":' + dumps(len(symbols))
+            + b',"results":{' + b",".join(parts) + b'},"errors":'
+            + dumps({symbol: errors[symbol] for symbol in symbols if symbol in errors}) + b"}"
+        )
+
+    response = {
+        "interval": interval,
+        "total": len(symbols),
+        "results": {symbol: results[symbol] for symbol in symbols if symbol in results},
+        "errors": {symbol: errors[symbol] for symbol in symbols if symbol in errors}
+    }
+    return FastJSONResponse(response) if Config.FAST_JSON_RESPONSES or projection is not None else response
+
+@app.get("/prices/batch", tags=["Mercado"])
+async def get_prices_batch(
+    symbols: str = Query(..., min_length=1, description="Símbolos separados por comas"),
+    interval: str = Query("daily", pattern="^(daily|1min|5min|15min|30min|60min)$"),
+    stream: bool = Query(False, description="Devolver NDJSON según se completa cada símbolo"),
+    format: str = Query("columnar", pattern="^(columnar|raw)$"),
+    fields: Optional[str] = Query(None, description="Columnas separadas por comas: open, high, low, close, volume"),
+    limit: Optional[int] = Query(None, ge=1, description="Solo las N barras más recientes de cada símbolo"),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION)
+):
+    """Obtener precios de múltiples símbolos en paralelo"""
+    try:
+        projection = parse_projection(fields, limit, since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e), "code": 400})
+    return await _prices_batch(_parse_symbols(symbols.split(",")), interval, stream, format, projection)
+
+@app.post("/prices/batch", tags=["Mercado"])
+async def post_prices_batch(request: PriceBatchRequest):
+    """Obtener precios de múltiples símbolos (para listas largas)"""
+    try:
+        projection = parse_projection(",".join(request.fields) if request.fields else None, request.limit, request.since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e), "code": 400})
+    return await _prices_batch(_parse_symbols(request.symbols), request.interval, request.stream, request.format, projection)
+
+@app.websocket("/stream/prices")
+async def stream_prices(websocket: WebSocket, symbols: str = "", interval: str = "1min"):
+    """
+    Actualizaciones de precios en tiempo real (solo las barras nuevas o modificadas)
+    El cliente puede enviar {"action": "subscribe"|"unsubscribe", "symbols": [...], "interval": "1min"}
+    """
+    await websocket_session(websocket, _parse_symbols(symbols.split(",")), interval)
+
+@app.get("/stream/prices/sse", tags=["Mercado"])
+async def stream_prices_sse(
+    request: Request,
+    symbols: str = Query(..., min_length=1, description="Símbolos separados por comas"),
+    interval: str = Query("1min", pattern="^(daily|1min|5min|15min|30min|60min)$")
+):
+    """Alternativa Server-Sent Events a /stream/prices para una lista fija de símbolos"""
+    parsed = _parse_symbols(symbols.split(","))
+    error = price_stream.validate(parsed, interval)
+    if error:
+        return JSONResponse(status_code=error["code"], content=error)
+    return StreamingResponse(
+        sse_events(request, parsed, interval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/financials", response_model=Union[List[FinancialData], ErrorResponse], tags=["Fundamentales"])
 async def get_financials(
+    request: Request,
+    response: Response,
     symbol: str = Query(..., min_length=1),
-    period: str = Query("annual", pattern="^(annual|quarterly)$")
+    period: str = Query("annual", pattern="^(annual|quarterly)$"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    limit: Optional[int] = Query(None, ge=1, description="Solo los N periodos más recientes"),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION)
 ):
     try:
-        financials = fmp.get_income_statement(symbol, period)
+        projection = parse_projection(fields, limit, since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e), "code": 400})
+    try:
+        prefetcher.record("financials", symbol, period)
+        financials = await fmp.get_income_statement(symbol, period)
         if isinstance(financials, dict) and "error" in financials:
             return JSONResponse(
-                status_code=400,
+                status_code=financials.get("code", 400),
                 content=financials
             )
-        return financials
+        return _cached_response(request, response, fmp.get_income_statement, (symbol, period), financials, projection)
     except Exception as e:
         logger.error(f"Error en datos financieros: {str(e)}")
         return JSONResponse(
@@ -165,18 +599,28 @@ async def get_financials(
 
 @app.get("/financials/ratios", response_model=Union[List[FinancialRatios], ErrorResponse], tags=["Fundamentales"])
 async def get_financial_ratios(
+    request: Request,
+    response: Response,
     symbol: str = Query(..., min_length=1),
-    period: str = Query("annual", pattern="^(annual|quarterly)$")
+    period: str = Query("annual", pattern="^(annual|quarterly)$"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    limit: Optional[int] = Query(None, ge=1, description="Solo los N periodos más recientes"),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION)
 ):
     """Obtener ratios financieros clave (liquidez, apalancamiento, rentabilidad)"""
     try:
-        ratios = fmp.get_financial_ratios(symbol, period)
+        projection = parse_projection(fields, limit, since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e), "code": 400})
+    try:
+        prefetcher.record("ratios", symbol, period)
+        ratios = await fmp.get_financial_ratios(symbol, period)
         if isinstance(ratios, dict) and "error" in ratios:
             return JSONResponse(
-                status_code=400,
+                status_code=ratios.get("code", 400),
                 content=ratios
             )
-        return ratios
+        return _cached_response(request, response, fmp.get_financial_ratios, (symbol, period), ratios, projection)
     except Exception as e:
         logger.error(f"Error en ratios financieros: {str(e)}")
         return JSONResponse(
@@ -184,21 +628,31 @@ async def get_financial_ratios(
             content={"error": "Error obteniendo ratios financieros"}
         )
 
-@app.get("/news", response_model=Union[Dict[str, Union[int, List[NewsItem]]], ErrorResponse], tags=["Noticias"])
+@app.get("/news", response_model=Union[Dict[str, Union[bool, int, List[NewsItem]]], ErrorResponse], tags=["Noticias"])
 async def get_news(
+    request: Request,
+    response: Response,
     query: str = Query(..., min_length=2),
     limit: int = Query(5, ge=1, le=100),
-    sort_by: str = Query("publishedAt", pattern="^(relevancy|popularity|publishedAt)$")
+    sort_by: str = Query("publishedAt", pattern="^(relevancy|popularity|publishedAt)$"),
+    fields: Optional[str] = Query(None, description="Campos de cada noticia: title, source, url, published_at, content"),
+    since: Optional[str] = Query(None, description="Solo noticias publicadas desde esta fecha YYYY-MM-DD (UTC) o timestamp UNIX")
 ):
     """Obtener noticias financieras relevantes"""
     try:
-        news_data = news.get_financial_news(query, limit, sort_by)
+        # 'limit' ya es el número de noticias que se piden al proveedor
+        projection = parse_projection(fields, since=since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e), "code": 400})
+    try:
+        prefetcher.record("news", query, limit, sort_by)
+        news_data = await news.get_financial_news(query, limit, sort_by)
         if "error" in news_data:
             return JSONResponse(
-                status_code=400,
+                status_code=news_data.get("code", 400),
                 content=news_data
             )
-        return news_data
+        return _cached_response(request, response, news.get_financial_news, (query, limit, sort_by), news_data, projection)
     except Exception as e:
         logger.error(f"Error en noticias: {str(e)}")
         return JSONResponse(
@@ -209,6 +663,87 @@ async def get_news(
             }
         )
 
+@app.get("/snapshot/{symbol}", tags=["Fichas"])
+async def get_snapshot(
+    symbol: str,
+    sections: Optional[str] = Query(None, description="Secciones separadas por comas: instruments, prices, financials, ratios, news (todas por defecto)"),
+    deadline: float = Query(Config.SNAPSHOT_DEADLINE, ge=0, description="Plazo de cada sección en segundos"),
+    deadlines: Optional[str] = Query(None, description="Plazos por sección, p. ej. 'news:0.5,prices:3'"),
+    interval: str = Query("daily", description="Intervalo de los precios (daily, 1min-60min)"),
+    period: str = Query("annual", pattern="^(annual|quarterly)$"),
+    market: str = Query("US", min_length=2),
+    news_limit: int = Query(5, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Campos de cada sección (columnas de precios o claves de cada fila)"),
+    limit: Optional[int] = Query(None, ge=1, description=LIMIT_DESCRIPTION),
+    since: Optional[str] = Query(None, description=SINCE_DESCRIPTION)
+):
+    """
+    Ficha de un símbolo en una sola petición: instrumentos, precios, estados de
+    resultados, ratios y noticias consultados en paralelo. Las secciones que
+    no responden dentro de su plazo vuelven como 'pending' y se terminan de
+    obtener en segundo plano, de modo que una segunda petición las sirve de caché.
+    """
+    symbol = symbol.strip().upper()
+    if not symbol:
+        return JSONResponse(status_code=400, content={"error": "El símbolo no puede estar vacío", "code": 400})
+    try:
+        requested = parse_sections(sections)
+        section_deadlines = parse_deadlines(deadlines, requested, deadline)
+        projection = parse_projection(fields, limit, since)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e), "code": 400})
+
+    snapshot = await build_snapshot(
+        symbol, requested, section_deadlines,
+        {"interval": interval, "period": period, "market": market, "news_limit": news_limit},
+        projection
+    )
+    headers = {} if snapshot["complete"] else {"Retry-After": str(int(math.ceil(Config.SNAPSHOT_RETRY_AFTER)))}
+    return FastJSONResponse(snapshot, headers=headers)
+
+@app.get("/screener", tags=["Fundamentales"])
+async def screen_fundamentals(request: Request):
+    """
+    Filtrar y ordenar el universo por fundamentales, p. ej.
+    /screener?pe_ratio<20&roe>0.15&sort=-revenue&limit=50&fields=pe_ratio,roe
+    """
+    try:
+        query = parse_query(request.url.query)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    if not screener.table.version:
+        await screener.reload()  # Primera consulta del worker antes del primer ciclo de refresco
+    return FastJSONResponse(screener.table.screen(query))
+
+@app.post("/exports", status_code=202, tags=["Exportaciones"])
+async def create_export(request: ExportRequest):
+    """Crear un trabajo de exportación masiva (precios, estados de resultados, ratios)"""
+    status = await exports.submit(request.model_dump())
+    if "error" in status:
+        return JSONResponse(status_code=status["code"], content=status)
+    return status
+
+@app.get("/exports/{job_id}", tags=["Exportaciones"])
+async def get_export(job_id: str):
+    """Estado y progreso de un trabajo de exportación, con los ficheros generados"""
+    status = exports.status(job_id)
+    if status is None:
+        return JSONResponse(status_code=404, content={"error": "Exportación no encontrada", "code": 404})
+    if status["status"] == "completed":
+        for dataset, info in status["files"].items():
+            info["url"] = f"/exports/{job_id}/files/{dataset}"
+    return status
+
+@app.get("/exports/{job_id}/files/{dataset}", tags=["Exportaciones"])
+async def download_export(job_id: str, dataset: str):
+    """Descargar el fichero de un conjunto de datos de una exportación terminada"""
+    found = exports.file_path(job_id, dataset)
+    if found is None:
+        return JSONResponse(status_code=404, content={"error": "Fichero no disponible", "code": 404})
+    path, media_type = found
+    return FileResponse(path, media_type=media_type, filename=f"{job_id}-{os.path.basename(path)}")
+
 # Manejo global de errores mejorado
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -0,0 +1,155 @@
+# app/metrics.py
+import os
+import time
+from collections import Counter as CounterDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+from app.config import Config
+
+# Con varios workers de uvicorn/gunicorn, PROMETHEUS_MULTIPROC_DIR debe
+# apuntar a un directorio vacío compartido antes de arrancar: cada proceso
+# escribe sus métricas en ficheros mmap y /metrics las agrega todas.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+# Cubetas de latencia (segundos): de cachés locales a proveedores lentos
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Peticiones atendidas por ruta", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Duración de las peticiones por ruta", ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total", "Peticiones HTTP a proveedores por estado o clase de error", ["provider", "status"]
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "Duración de las peticiones HTTP a proveedores (cuerpo incluido)",
+    ["provider"], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_BYTES = Histogram(
+    "upstream_response_bytes", "Tamaño de las respuestas de los proveedores", ["provider"], buckets=SIZE_BUCKETS
+)
+PROVIDER_CALLS = Counter(
+    "provider_calls_total", "Llamadas a funciones de servicio por resultado", ["function", "outcome"]
+)
+PROVIDER_CALL_LATENCY = Histogram(
+    "provider_call_duration_seconds", "Duración de las llamadas de servicio (esperas de cuota incluidas)",
+    ["function"], buckets=LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Consultas a la caché por nivel y resultado", ["tier", "result"]
+)
+RATE_LIMIT_DECISIONS = Counter(
+    "ratelimit_decisions_total", "Decisiones del limitador de tasa", ["provider", "decision"]
+)
+RESILIENCE_EVENTS = Counter(
+    "resilience_events_total", "Reintentos, peticiones duplicadas, cambios de circuito y respuestas caducadas",
+    ["provider", "event"]
+)
+RATE_LIMIT_WAIT = Histogram(
+    "ratelimit_wait_seconds", "Espera en cola del limitador de tasa (solo llamadas encoladas)", ["provider"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+)
+
+# Hijos ya etiquetados: `labels()` toma un lock y valida etiquetas en cada llamada
+_children: Dict[Tuple, Any] = {}
+
+def _child(metric, *labels):
+    child = _children.get((metric, labels))
+    if child is None:
+        child = _children[(metric, labels)] = metric.labels(*labels)
+    return child
+
+def render() -> Tuple[bytes, str]:
+    """Exposición en formato de texto de Prometheus (agregada entre procesos si procede)"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+def observe_upstream(provider: str, status: str, seconds: float, size: int) -> None:
+    if Config.METRICS_ENABLED:
+        _child(UPSTREAM_REQUESTS, provider, status).inc()
+        _child(UPSTREAM_LATENCY, provider).observe(seconds)
+        _child(UPSTREAM_BYTES, provider).observe(size)
+
+def observe_call(function: str, outcome: str, seconds: float) -> None:
+    if Config.METRICS_ENABLED:
+        _child(PROVIDER_CALLS, function, outcome).inc()
+        _child(PROVIDER_CALL_LATENCY, function).observe(seconds)
+
+def observe_rate_limit(provider: str, decision: str, wait_seconds: float = 0.0) -> None:
+    if Config.METRICS_ENABLED:
+        _child(RATE_LIMIT_DECISIONS, provider, decision).inc()
+        if decision == "queued":
+            _child(RATE_LIMIT_WAIT, provider).observe(wait_seconds)
+
+def observe_resilience(provider: str, event: str) -> None:
+    if Config.METRICS_ENABLED:
+        _child(RESILIENCE_EVENTS, provider, event).inc()
+
+class InstrumentedCounter(CounterDict):
+    """
+    Contador en memoria que además exporta los incrementos de las claves
+    'l1_*' y 'l2_*' como cache_requests_total{tier, result}
+
+    Permite seguir usando `counters["l1_hits"] += 1` sin tocar cada punto
+    de la caché; las demás claves solo se cuentan en memoria.
+    """
+
+    LABELS = {
+        f"{tier}_{key}": (tier, result) for tier in ("l1", "l2")
+        for key, result in (("hits", "hit"), ("stale_hits", "stale"), ("misses", "miss"), ("errors", "error"))
+    }
+
+    def __setitem__(self, key, value):
+        labels = self.LABELS.get(key)
+        if labels is not None and Config.METRICS_ENABLED:
+            delta = value - self.get(key, 0)
+            if delta > 0:
+                _child(CACHE_REQUESTS, *labels).inc(delta)
+        super().__setitem__(key, value)
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI con peticiones y latencia por plantilla de ruta
+    ('/exports/{job_id}', no la URL concreta, para acotar la cardinalidad)
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not Config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status: Optional[int] = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            _child(HTTP_REQUESTS, method, template, str(status or 500)).inc()
+            _child(HTTP_LATENCY, method, template).observe(time.perf_counter() - start)
@@ -0,0 +1,310 @@
+# app/prefetch.py
+import asyncio
+import logging
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import orjson
+from redis.exceptions import RedisError
+from app.config import Config
+from app.cache import cache, is_error
+from app.cache.singleflight import LEADER_SCRIPT, RELEASE_SCRIPT
+from app.cache.ttl import ttl_for
+from app.ratelimit import RateLimiter
+from app.screener import load_symbols
+from app.services import alpha_vantage, fmp, news
+from app.services.providers import INCOME_STATEMENT, PRICES, RATIOS, router
+from app.services.providers.router import PREFERENCES
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Frecuencia observada de cada consulta (sorted set compartido por los workers)
+DEMAND_KEY = "prefetch:demand"
+DEMAND_MAX_MEMBERS = 10000
+DEMAND_MIN_SCORE = 0.01
+LEADER_KEY = "lease:prefetch:leader"
+
+@dataclass(frozen=True)
+class PrefetchTarget:
+    """
+    Función cacheada que se puede precargar y argumentos por defecto tras el
+    símbolo. Si pasa por el router (capability), la cuota se carga al
+    proveedor que este elegiría en cada ciclo; `provider` es el de reserva.
+    """
+    function: Callable
+    provider: str
+    defaults: Tuple = ()
+    capability: Optional[str] = None
+
+TARGETS: Dict[str, PrefetchTarget] = {
+    "prices": PrefetchTarget(alpha_vantage.get_stock_prices, "alpha_vantage", ("daily",), PRICES),
+    "ratios": PrefetchTarget(fmp.get_financial_ratios, "fmp", ("annual",), RATIOS),
+    "financials": PrefetchTarget(fmp.get_income_statement, "fmp", ("annual",), INCOME_STATEMENT),
+    "news": PrefetchTarget(news.get_financial_news, "newsapi", (5, "publishedAt"))
+}
+
+@dataclass
+class Candidate:
+    """Consulta candidata a refrescarse en un ciclo"""
+    kind: str
+    args: Tuple
+    score: float = 0.0
+    remaining: float = 0.0  # TTL restante en Redis (segundos)
+    routed: Optional[str] = None  # Proveedor que el router usaría ahora
+
+    @property
+    def target(self) -> PrefetchTarget:
+        return TARGETS[self.kind]
+
+    @property
+    def provider(self) -> str:
+        """Proveedor a cuya cuota se carga el refresco"""
+        return self.routed or self.target.provider
+
+    @property
+    def interval(self) -> Optional[str]:
+        """Intervalo con el que el router filtra los proveedores de precios"""
+        return self.args[1] if self.target.capability == PRICES and len(self.args) > 1 else None
+
+    @property
+    def key(self) -> str:
+        return self.target.function.cache_key(*self.args)
+
+    @property
+    def due(self) -> bool:
+        """Caducada o con menos de PREFETCH_REFRESH_AHEAD de su TTL por delante"""
+        ttl = ttl_for(self.target.function.data_class(*self.args))
+        return self.remaining <= ttl * Config.PREFETCH_REFRESH_AHEAD
+
+def encode_member(kind: str, args: Tuple) -> str:
+    return orjson.dumps([kind, *args]).decode()
+
+def decode_member(member: Any) -> Tuple[str, Tuple]:
+    kind, *args = orjson.loads(member)
+    return kind, tuple(args)
+
+def quota_rate(provider: str) -> float:
+    """Llamadas por segundo que la precarga puede hacer a un proveedor"""
+    limit = RateLimiter._limits[provider]
+    return limit["max"] / limit["window"] * Config.PREFETCH_QUOTA_SHARE
+
+def plan(candidates: List[Candidate], credit: Dict[str, float]) -> Tuple[List[Candidate], int]:
+    """
+    Elige qué refrescar en este ciclo
+    Args:
+        candidates: Consultas de la watchlist y más frecuentes, con su TTL restante
+        credit: Llamadas disponibles por proveedor (se descuentan las planificadas)
+
+    Returns:
+        Consultas a refrescar (más demandadas primero; a igual demanda, las
+        que caducan antes) y número de consultas pendientes aplazadas por cuota
+    """
+    selected, deferred = [], 0
+    for candidate in sorted(candidates, key=lambda c: (-c.score, c.remaining)):
+        if not candidate.due:
+            continue
+        provider = candidate.provider
+        if credit.get(provider, 0) < 1:
+            deferred += 1
+            continue
+        credit[provider] -= 1
+        selected.append(candidate)
+    return selected, deferred
+
+class Prefetcher:
+    """
+    Mantiene en caché la watchlist y las consultas más frecuentes
+
+    Cada worker cuenta las consultas que recibe y las acumula en Redis; un
+    único líder (lease renovable en Redis) refresca antes de que caduquen las
+    entradas más demandadas, sin gastar más de PREFETCH_QUOTA_SHARE de la
+    cuota de cada proveedor. Sin Redis no hay líder y no se precarga nada.
+    """
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        self.credit: Dict[str, float] = {}
+        self.leader = False
+        self._demand: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self._worker_id = uuid.uuid4().hex
+        self._last_cycle: Optional[float] = None
+
+    def record(self, kind: str, *args) -> None:
+        """Anota una consulta recibida (el símbolo o la búsqueda se normaliza a mayúsculas)"""
+        if kind in TARGETS and Config.PREFETCH_ENABLED and args:
+            self._demand[encode_member(kind, (str(args[0]).strip().upper(), *args[1:]))] += 1
+
+    def watchlist(self) -> List[Candidate]:
+        """Consultas por defecto de cada símbolo de la watchlist"""
+        symbols = load_symbols(Config.PREFETCH_WATCHLIST, Config.PREFETCH_WATCHLIST_FILE)
+        kinds = [kind.strip() for kind in Config.PREFETCH_KINDS if kind.strip() in TARGETS]
+        return [Candidate(kind, (symbol, *TARGETS[kind].defaults)) for symbol in symbols for kind in kinds]
+
+    async def flush_demand(self) -> None:
+        """Suma las consultas anotadas por este worker a la frecuencia compartida"""
+        if not self._demand:
+            return
+        demand, self._demand = self._demand, Counter()
+        try:
+            async with cache.redis_client.pipeline(transaction=False) as pipe:
+                for member, count in demand.items():
+                    pipe.zincrby(DEMAND_KEY, count, member)
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            self._demand.update(demand)  # Se reintenta en el siguiente ciclo
+            logger.warning(f"Precarga: no se pudo guardar la frecuencia de consultas: {str(e)}")
+
+    async def _decay_demand(self, elapsed: float) -> None:
+        """Reduce la frecuencia acumulada (vida media PREFETCH_DEMAND_HALF_LIFE) y acota el tamaño"""
+        weight = 0.5 ** (elapsed / max(Config.PREFETCH_DEMAND_HALF_LIFE, 1))
+        async with cache.redis_client.pipeline(transaction=True) as pipe:
+            pipe.zunionstore(DEMAND_KEY, {DEMAND_KEY: weight})
+            pipe.zremrangebyscore(DEMAND_KEY, 0, DEMAND_MIN_SCORE)
+            pipe.zremrangebyrank(DEMAND_KEY, 0, -(DEMAND_MAX_MEMBERS + 1))
+            await pipe.execute()
+
+    async def _is_leader(self) -> bool:
+        """Adquiere o renueva el lease de líder (tres ciclos de duración)"""
+        try:
+            self.leader = bool(await cache.redis_client.eval(
+                LEADER_SCRIPT, 1, LEADER_KEY, self._worker_id, Config.PREFETCH_INTERVAL * 3000
+            ))
+        except (RedisError, OSError) as e:
+            logger.warning(f"Precarga: lease de líder no disponible: {str(e)}")
+            self.leader = False
+        return self.leader
+
+    async def candidates(self) -> List[Candidate]:
+        """Watchlist y consultas más frecuentes, con su demanda y TTL restante"""
+        by_member = {encode_member(c.kind, c.args): c for c in self.watchlist()}
+        if Config.PREFETCH_TOP_N > 0:
+            top = await cache.redis_client.zrevrange(DEMAND_KEY, 0, Config.PREFETCH_TOP_N - 1, withscores=True)
+            for member, score in top:
+                member = member.decode() if isinstance(member, bytes) else member
+                if member not in by_member:
+                    kind, args = decode_member(member)
+                    if kind not in TARGETS:
+                        continue
+                    by_member[member] = Candidate(kind, args)
+                by_member[member].score = score
+
+        candidates = list(by_member.values())
+        if candidates:
+            remaining = await cache.ttl_many([c.key for c in candidates])
+            for candidate, seconds in zip(candidates, remaining):
+                candidate.remaining = seconds
+        return candidates
+
+    async def route(self, candidates: List[Candidate]) -> None:
+        """Anota en cada consulta enrutada el proveedor que el router elegiría ahora"""
+        choices: Dict[Tuple[str, Optional[str]], Optional[str]] = {}
+        for candidate in candidates:
+            capability = candidate.target.capability
+            if capability is None:
+                continue
+            route = (capability, candidate.interval)
+            if route not in choices:
+                ranked = await router.candidates(capability, candidate.interval)
+                choices[route] = ranked[0].name if ranked else None
+            candidate.routed = choices[route]
+
+    def _accrue(self, elapsed: float) -> None:
+        """Suma la cuota del tiempo transcurrido (hasta PREFETCH_QUOTA_SHARE de una ventana)"""
+        providers = {target.provider for target in TARGETS.values()}
+        for target in TARGETS.values():
+            if target.capability is not None:
+                providers.update(name.strip() for name in getattr(Config, PREFERENCES[target.capability]))
+        for provider in providers & RateLimiter._limits.keys():
+            limit = RateLimiter._limits[provider]
+            cap = max(limit["max"] * Config.PREFETCH_QUOTA_SHARE, 1)
+            self.credit[provider] = min(cap, self.credit.get(provider, 0.0) + quota_rate(provider) * elapsed)
+
+    async def refresh(self, selected: List[Candidate]) -> int:
+        """Refresca las consultas planificadas (se detiene por proveedor ante un 429)"""
+        refreshed, exhausted = 0, set()
+        for candidate in selected:
+            provider = candidate.provider
+            if provider in exhausted:
+                continue
+            result = await candidate.target.function.refresh(*candidate.args)
+            if is_error(result):
+                self.counters["failed"] += 1
+                if result.get("code") == 429:
+                    exhausted.add(provider)
+                    self.credit[provider] = 0.0
+                    logger.warning(f"Precarga: límite de {provider} alcanzado, se continúa en el siguiente ciclo")
+                continue
+            refreshed += 1
+        self.counters["refreshed"] += refreshed
+        return refreshed
+
+    async def run_cycle(self) -> None:
+        """Un ciclo: frecuencia compartida (todos) y refresco planificado (solo el líder)"""
+        now = time.monotonic()
+        elapsed = Config.PREFETCH_INTERVAL if self._last_cycle is None else now - self._last_cycle
+        self._last_cycle = now
+        self.counters["cycles"] += 1
+
+        await self.flush_demand()
+        if not await self._is_leader():
+            return
+        self._accrue(elapsed)
+        try:
+            await self._decay_demand(elapsed)
+            candidates = await self.candidates()
+            await self.route(candidates)
+        except (RedisError, OSError) as e:
+            logger.warning(f"Precarga: Redis no disponible: {str(e)}")
+            return
+
+        selected, deferred = plan(candidates, self.credit)
+        self.counters["deferred"] += deferred
+        if selected:
+            refreshed = await self.refresh(selected)
+            logger.info(f"Precarga: {refreshed}/{len(selected)} consultas refrescadas ({deferred} aplazadas por cuota)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "leader": self.leader,
+            "cycles": self.counters["cycles"],
+            "refreshed": self.counters["refreshed"],
+            "failed": self.counters["failed"],
+            "deferred": self.counters["deferred"],
+            "credit": {provider: round(value, 2) for provider, value in self.credit.items()}
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.error(f"Error en la precarga: {str(e)}", exc_info=True)
+            await asyncio.sleep(Config.PREFETCH_INTERVAL)
+
+    def start(self) -> None:
+        """Arranca la precarga en segundo plano"""
+        if self._task is None and Config.PREFETCH_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Detiene la precarga y libera el lease de líder"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.leader:
+            try:
+                await cache.redis_client.eval(RELEASE_SCRIPT, 1, LEADER_KEY, self._worker_id)
+            except (RedisError, OSError):
+                pass
+            self.leader = False
+
+prefetcher = Prefetcher()
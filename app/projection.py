@@ -0,0 +1,127 @@
+# app/projection.py
+import re
+from bisect import bisect_left
+from calendar import timegm
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from app.timeseries import SERIES_FIELDS
+
+FIELD_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+
+# Claves con la fecha de cada fila (estados financieros, ratios, noticias)
+DATE_KEYS = ("date", "published_at")
+
+@dataclass(frozen=True)
+class Projection:
+    """
+    Subconjunto de una respuesta pedido por el cliente (fields, limit, since)
+
+    Se aplica sobre el valor cacheado justo antes de serializar y nunca lo
+    modifica: devuelve estructuras nuevas que comparten los valores.
+    """
+    fields: Optional[Tuple[str, ...]] = None
+    limit: Optional[int] = None
+    since_ts: Optional[int] = None
+    since: Optional[str] = None  # Mismo instante como texto comparable con fechas ISO
+
+    def apply(self, value: Any) -> Any:
+        """
+        Proyecta una serie columnar, una lista de filas o un documento con
+        'articles' (noticias); cualquier otro valor se devuelve tal cual
+        """
+        if isinstance(value, list):
+            return self._rows(value)
+        if not isinstance(value, dict) or "error" in value:
+            return value
+        if "timestamps" in value:
+            return self._series(value)
+        if isinstance(value.get("articles"), list):
+            return {**value, "articles": self._rows(value["articles"])}
+        return value
+
+    def start(self, timestamps: List[int]) -> int:
+        """Primera barra (de timestamps ascendentes) que se conserva según `since` y `limit`"""
+        start = bisect_left(timestamps, self.since_ts) if self.since_ts is not None else 0
+        if self.limit is not None:
+            start = max(start, len(timestamps) - self.limit)
+        return start
+
+    def _series(self, series: Dict) -> Dict:
+        """Columnas pedidas de las barras desde `since` (las últimas `limit`)"""
+        timestamps = series["timestamps"]
+        start = self.start(timestamps)
+        columns = SERIES_FIELDS if self.fields is None else [field for field in SERIES_FIELDS if field in self.fields]
+        projected = {key: value for key, value in series.items() if key != "timestamps" and key not in SERIES_FIELDS}
+        projected["timestamps"] = timestamps[start:]
+        for field in columns:
+            projected[field] = series[field][start:]
+        return projected
+
+    def _rows(self, rows: List) -> List:
+        """Filas desde `since`, las `limit` más recientes (en su orden original) y con los campos pedidos"""
+        date_key = next((key for key in DATE_KEYS if rows and isinstance(rows[0], dict) and key in rows[0]), None)
+        if self.since is not None and date_key is not None:
+            rows = [row for row in rows if _comparable(row.get(date_key)) >= self.since]
+        if self.limit is not None and len(rows) > self.limit:
+            if date_key is None:
+                rows = rows[:self.limit]
+            else:
+                newest = sorted(range(len(rows)), key=lambda i: _comparable(rows[i].get(date_key)), reverse=True)
+                rows = [rows[i] for i in sorted(newest[:self.limit])]
+        if self.fields is not None:
+            rows = [
+                {key: row[key] for key in self.fields if key in row} if isinstance(row, dict) else row
+                for row in rows
+            ]
+        return rows
+
+def _comparable(value: Any) -> str:
+    """Fecha de una fila como texto ISO comparable ('YYYY-MM-DD' -> 'YYYY-MM-DDT00:00:00')"""
+    text = str(value or "").replace(" ", "T", 1)
+    return f"{text}T00:00:00" if len(text) == 10 else text
+
+def parse_projection(
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    since: Optional[str] = None
+) -> Optional[Projection]:
+    """
+    Proyección de los parámetros de la petición (None si no se pide ninguna)
+    Args:
+        fields: Campos separados por comas (columnas de la serie o claves de cada fila)
+        limit: Número de barras o filas más recientes
+        since: Fecha YYYY-MM-DD (UTC) o timestamp UNIX en segundos
+
+    Raises:
+        ValueError: Si algún parámetro no es válido
+    """
+    if fields is None and limit is None and since is None:
+        return None
+
+    names = None
+    if fields is not None:
+        names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        if not names:
+            raise ValueError("fields debe indicar al menos un campo")
+        invalid = [name for name in names if not FIELD_PATTERN.match(name)]
+        if invalid:
+            raise ValueError(f"Campos no válidos: {', '.join(invalid)}")
+
+    if limit is not None and limit < 1:
+        raise ValueError("limit debe ser mayor que 0")
+
+    since_ts = since_text = None
+    if since is not None:
+        since = since.strip()
+        try:
+            if since.isdigit():
+                since_ts = int(since)
+                since_text = datetime.fromtimestamp(since_ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            else:
+                since_ts = timegm(datetime.strptime(since, "%Y-%m-%d").timetuple())
+                since_text = f"{since}T00:00:00"
+        except (ValueError, OverflowError, OSError):
+            raise ValueError(f"since no válido: '{since}' (YYYY-MM-DD o timestamp UNIX)")
+
+    return Projection(names, limit, since_ts, since_text)
@@ -0,0 +1,183 @@
+# app/ratelimit.py
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+from redis.exceptions import RedisError
+from app.config import Config
+from app.cache import cache
+from app.metrics import observe_rate_limit
+from app.tracing import annotate, span
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Token bucket con reserva: si hay que esperar menos de max_wait se reserva el
+# token (el saldo puede quedar negativo) y se devuelve la espera en ms; si no,
+# se devuelve -espera sin consumir nada.
+# KEYS[1]: bucket; ARGV: capacidad, tokens por ms, ahora (ms), espera máxima (ms)
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = math.ceil((1 - tokens) / rate)
+end
+if wait > max_wait then
+    return -wait
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) + wait + 1000)
+return wait
+"""
+
+class LocalTokenBucket:
+    """Token bucket en memoria (respaldo temporal si Redis no responde)"""
+
+    def __init__(self, capacity: float, rate_per_ms: float):
+        self.capacity = capacity
+        self.rate = rate_per_ms
+        self.tokens = capacity
+        self.ts = time.time() * 1000
+
+    def reserve(self, now_ms: float, max_wait_ms: float) -> float:
+        """Misma semántica que TOKEN_BUCKET_SCRIPT"""
+        tokens = min(self.capacity, self.tokens + max(0.0, now_ms - self.ts) * self.rate)
+        wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+        if wait > max_wait_ms:
+            return -wait
+        self.tokens, self.ts = tokens - 1, now_ms
+        return wait
+
+class RateLimiter:
+    """
+    Gestor de límites de tasa para APIs externas, compartido entre workers
+
+    Usa un token bucket atómico en Redis (Lua). Las llamadas que deban esperar
+    menos de RATE_LIMIT_MAX_WAIT se encolan; el resto se rechazan antes de
+    llegar al proveedor.
+    """
+
+    _limits: Dict[str, Dict[str, Any]] = {
+        "alpha_vantage": {"max": Config.ALPHA_VANTAGE_RATE_LIMIT, "window": Config.ALPHA_VANTAGE_RATE_WINDOW},
+        "fmp": {"max": Config.FMP_RATE_LIMIT, "window": Config.FMP_RATE_WINDOW},
+        "newsapi": {"max": Config.NEWSAPI_RATE_LIMIT, "window": Config.NEWSAPI_RATE_WINDOW},
+        "openfigi": {"max": Config.OPENFIGI_RATE_LIMIT, "window": Config.OPENFIGI_RATE_WINDOW}
+    }
+
+    def __init__(self):
+        self.counters: Counter = Counter()
+        self._local: Dict[str, LocalTokenBucket] = {}
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Llamadas admitidas, encoladas y rechazadas por servicio"""
+        return {
+            service: {
+                "allowed": self.counters[f"{service}:allowed"],
+                "queued": self.counters[f"{service}:queued"],
+                "rejected": self.counters[f"{service}:rejected"],
+                "wait_ms": self.counters[f"{service}:wait_ms"]
+            }
+            for service in self._limits
+        }
+
+    def reset(self) -> None:
+        """Reinicia contadores y buckets locales"""
+        self.counters.clear()
+        self._local.clear()
+
+    async def acquire(self, service: str, max_wait: Optional[float] = None) -> bool:
+        """
+        Reserva una llamada al proveedor, esperando si es necesario
+        Args:
+            service: Nombre del servicio ('alpha_vantage', 'fmp', 'newsapi', 'openfigi')
+            max_wait: Espera máxima en segundos (por defecto RATE_LIMIT_MAX_WAIT)
+
+        Returns:
+            True si la llamada puede hacerse, False si se ha excedido el límite
+        """
+        with span("ratelimit", provider=service):
+            return await self._acquire(service, max_wait)
+
+    async def _acquire(self, service: str, max_wait: Optional[float]) -> bool:
+        limit = self._limits.get(service)
+        if not limit:
+            return True
+
+        capacity = limit["max"]
+        rate = capacity / (limit["window"] * 1000)
+        max_wait_ms = (Config.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait) * 1000
+        now_ms = time.time() * 1000
+
+        try:
+            wait_ms = await cache.redis_client.eval(
+                TOKEN_BUCKET_SCRIPT, 1, f"ratelimit:{service}", capacity, rate, int(now_ms), int(max_wait_ms)
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Redis no disponible para el límite de {service}, usando límite local: {str(e)}")
+            wait_ms = self._local_bucket(service, capacity, rate).reserve(now_ms, max_wait_ms)
+
+        if wait_ms < 0:
+            self.counters[f"{service}:rejected"] += 1
+            observe_rate_limit(service, "rejected")
+            annotate(decision="rejected")
+            logger.warning(f"Límite de llamadas excedido para {service} (espera necesaria {-wait_ms / 1000:.1f}s)")
+            return False
+
+        if wait_ms > 0:
+            self.counters[f"{service}:queued"] += 1
+            self.counters[f"{service}:wait_ms"] += wait_ms
+            observe_rate_limit(service, "queued", wait_ms / 1000)
+            annotate(decision="queued", wait_ms=wait_ms)
+            await asyncio.sleep(wait_ms / 1000)
+        else:
+            observe_rate_limit(service, "immediate")
+            annotate(decision="immediate")
+        self.counters[f"{service}:allowed"] += 1
+        return True
+
+    async def has_quota(self, service: str) -> bool:
+        """
+        Indica, sin consumir nada, si el servicio admite ahora una llamada sin esperar
+        (lo usa el enrutado entre proveedores para no encolar si hay alternativa)
+        """
+        limit = self._limits.get(service)
+        if not limit:
+            return True
+
+        capacity = limit["max"]
+        rate = capacity / (limit["window"] * 1000)
+        now_ms = time.time() * 1000
+        try:
+            tokens, ts = await cache.redis_client.hmget(f"ratelimit:{service}", "tokens", "ts")
+        except (RedisError, OSError):
+            bucket = self._local.get(service)
+            if bucket is None:
+                return True
+            tokens, ts = bucket.tokens, bucket.ts
+        if tokens is None:
+            return True
+        return min(capacity, float(tokens) + max(0.0, now_ms - float(ts)) * rate) >= 1
+
+    def _local_bucket(self, service: str, capacity: int, rate: float) -> LocalTokenBucket:
+        """Bucket local con la cuota repartida entre los workers del nodo"""
+        bucket = self._local.get(service)
+        if bucket is None:
+            workers = max(Config.WEB_CONCURRENCY, 1)
+            bucket = LocalTokenBucket(max(capacity / workers, 1), rate / workers)
+            self._local[service] = bucket
+        return bucket
+
+rate_limiter = RateLimiter()
+
+def rate_limit_error(service: str) -> Dict[str, Any]:
+    """Respuesta estándar cuando se rechaza una llamada por límite de tasa"""
+    return {"error": f"Límite de llamadas excedido para {service}", "code": 429}
@@ -0,0 +1,267 @@
+# app/resilience.py
+import asyncio
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+from app.config import Config
+from app.metrics import observe_resilience
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Estados del circuito
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Respuestas que indican un fallo transitorio del proveedor (se reintentan)
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+# Métodos que pueden repetirse sin efectos secundarios
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+class CircuitOpenError(httpx.TransportError):
+    """Llamada rechazada sin contactar con el proveedor porque su circuito está abierto"""
+
+class CircuitBreaker:
+    """
+    Circuito por proveedor (en memoria de cada worker)
+
+    Tras BREAKER_FAILURES fallos consecutivos (errores de red, timeouts o
+    5xx) se abre y las llamadas fallan al instante durante BREAKER_RESET
+    segundos; después deja pasar una única llamada de prueba (half-open)
+    que lo cierra si tiene éxito o lo vuelve a abrir si falla.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Indica si se puede llamar al proveedor (reserva la prueba en half-open)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < Config.BREAKER_RESET:
+                return False
+            self._transition(HALF_OPEN)
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def release(self) -> None:
+        """Libera la llamada de prueba que terminó sin resultado (p. ej. cancelada) para que pueda hacerse otra"""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= Config.BREAKER_FAILURES):
+            self.opened_at = time.monotonic()
+            self._transition(OPEN)
+
+    def retry_after(self) -> float:
+        """Segundos hasta la siguiente llamada de prueba"""
+        if self.state != OPEN:
+            return 0.0
+        return max(Config.BREAKER_RESET - (time.monotonic() - self.opened_at), 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "retry_after": round(self.retry_after(), 1)}
+
+    def _transition(self, state: str) -> None:
+        log = logger.warning if state == OPEN else logger.info
+        log(f"Circuito de {self.provider}: {self.state} -> {state}")
+        self.state = state
+        observe_resilience(self.provider, f"circuit_{state}")
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def breaker_for(provider: str) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = _breakers[provider] = CircuitBreaker(provider)
+    return breaker
+
+def is_open(provider: str) -> bool:
+    """Indica si el circuito del proveedor rechaza llamadas ahora mismo"""
+    breaker = _breakers.get(provider)
+    return breaker is not None and breaker.state == OPEN and breaker.retry_after() > 0
+
+def circuit_stats() -> Dict[str, Dict[str, Any]]:
+    """Estado del circuito de cada proveedor usado por este worker"""
+    return {provider: breaker.stats() for provider, breaker in _breakers.items()}
+
+def reset_breakers() -> None:
+    _breakers.clear()
+
+def backoff(attempt: int) -> float:
+    """Espera antes del reintento `attempt` (1, 2...): exponencial con jitter completo"""
+    return random.uniform(0, min(Config.RETRY_BACKOFF_MAX, Config.RETRY_BACKOFF_BASE * 2 ** (attempt - 1)))
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte con circuito, reintentos y peticiones de cobertura (hedging)
+
+    - Con el circuito abierto falla al instante con CircuitOpenError (los
+      servicios lo tratan como cualquier error de conexión).
+    - Las peticiones idempotentes se reintentan ante errores de red o
+      5xx, hasta RETRY_ATTEMPTS veces con backoff exponencial con jitter.
+    - Si HEDGE_AFTER > 0 y el proveedor está en HEDGE_PROVIDERS, una
+      petición idempotente que tarda más de ese umbral se duplica y se usa
+      la primera respuesta. La copia consume cuota del limitador; si no
+      queda, no se lanza.
+    """
+
+    def __init__(self, provider: str, transport: httpx.AsyncBaseTransport, idempotent_post: bool = False):
+        self.provider = provider
+        self._transport = transport
+        self._idempotent_post = idempotent_post
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        # Se busca en cada petición: reset_breakers() no deja circuitos huérfanos en clientes ya creados
+        return breaker_for(self.provider)
+
+    def _idempotent(self, request: httpx.Request) -> bool:
+        return request.method in IDEMPOTENT_METHODS or (self._idempotent_post and request.method == "POST")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = self.breaker
+        attempts = 1 + (Config.RETRY_ATTEMPTS if self._idempotent(request) else 0)
+        for attempt in range(1, attempts + 1):
+            if not breaker.allow():
+                observe_resilience(self.provider, "short_circuited")
+                raise CircuitOpenError(
+                    f"Circuito abierto para {self.provider} (reintento en {breaker.retry_after():.0f}s)", request=request
+                )
+            try:
+                response = await self._send(request)
+            except httpx.TransportError:
+                breaker.record_failure()
+                if attempt == attempts:
+                    raise
+                reason = "transport_error"
+            except BaseException:
+                # Cancelada (cliente desconectado, plazo de la ficha, cobertura perdedora): no dice nada del proveedor
+                breaker.release()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if attempt == attempts:
+                    return response
+                await response.aclose()
+                reason = f"status_{response.status_code}"
+
+            delay = backoff(attempt)
+            observe_resilience(self.provider, "retry")
+            logger.warning(f"Reintentando {request.method} {request.url.path} en {self.provider} "
+                           f"({reason}, intento {attempt + 1}/{attempts}, espera {delay:.2f}s)")
+            await asyncio.sleep(delay)
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        if Config.HEDGE_AFTER <= 0 or self.provider not in Config.HEDGE_PROVIDERS or not self._idempotent(request):
+            return await self._transport.handle_async_request(request)
+
+        primary = asyncio.ensure_future(self._transport.handle_async_request(request))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=Config.HEDGE_AFTER)
+            if done or not await self._hedge_allowed():
+                pending.clear()
+                return await primary
+
+            observe_resilience(self.provider, "hedge")
+            hedge = asyncio.ensure_future(self._transport.handle_async_request(request))
+            pending.add(hedge)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            observe_resilience(self.provider, "hedge_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # La petición perdedora (o todas, si se cancela la llamada) no debe quedar suelta
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_close_response)
+
+    async def _hedge_allowed(self) -> bool:
+        from app.ratelimit import rate_limiter  # Evita el import circular (ratelimit -> cache -> ...)
+        return await rate_limiter.acquire(self.provider, max_wait=0)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+def _close_response(task: asyncio.Task) -> None:
+    """Cierra la respuesta de la petición perdedora si llegó a completarse"""
+    if not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(task.result().aclose())
+
+# Claves servidas caducadas en la petición en curso (None fuera de una petición)
+_stale: ContextVar[Optional[List[str]]] = ContextVar("stale", default=None)
+
+def mark_stale(key: str) -> None:
+    """Registra que la petición en curso sirve un valor caducado"""
+    keys = _stale.get()
+    if keys is not None:
+        keys.append(key)
+
+def stale_value(value: Any) -> Any:
+    """Copia del valor con 'stale': true (solo en objetos; las listas se marcan por cabecera)"""
+    return {**value, "stale": True} if isinstance(value, dict) else value
+
+class StaleResponseMiddleware:
+    """
+    Middleware ASGI que marca las respuestas con datos caducados servidos
+    por un proveedor caído: cabeceras 'Warning: 110' y 'X-Stale: true', y
+    'Cache-Control: no-cache' para que las cachés intermedias no la guarden
+    durante todo el TTL del dato
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        keys: List[str] = []
+        token = _stale.set(keys)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and keys:
+                message["headers"] = [
+                    *(header for header in message.get("headers", []) if header[0].lower() != b"cache-control"),
+                    (b"cache-control", b"no-cache"),
+                    (b"warning", b'110 - "Response is Stale"'),
+                    (b"x-stale", b"true")
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _stale.reset(token)
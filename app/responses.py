@@ -0,0 +1,54 @@
+# app/responses.py
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+from fastapi.responses import Response
+from app.cache.serialization import dumps
+
+class FastJSONResponse(Response):
+    """
+    Respuesta JSON serializada con orjson
+
+    Acepta bytes ya serializados (p. ej. el payload guardado en caché), que se
+    envían tal cual. Al devolver una Response, FastAPI no vuelve a validar el
+    contenido contra el response_model ni pasa por jsonable_encoder.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
+
+def validation_headers(etag: str, last_modified: Optional[float], max_age: int, variant: str = "") -> Dict[str, str]:
+    """
+    Cabeceras ETag, Last-Modified y Cache-Control de un dato cacheado
+    Args:
+        etag: Hash del dato completo
+        last_modified: Última actualización del dato (segundos UNIX)
+        max_age: Segundos que le quedan al dato en la caché
+        variant: Representación servida (formato, proyección...): cada una tiene su ETag
+    """
+    if variant:
+        etag = f"{etag}-{hashlib.blake2b(variant.encode(), digest_size=6).hexdigest()}"
+    headers = {"ETag": f'"{etag}"', "Cache-Control": f"public, max-age={max(int(max_age), 0)}"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+def not_modified(request_headers: Mapping[str, str], etag: str, last_modified: Optional[float]) -> bool:
+    """
+    Indica si el cliente ya tiene esta versión (If-None-Match o, si no lo
+    envía, If-Modified-Since)
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
@@ -16,6 +16,53 @@ class PriceData(BaseModel):
     close: float = Field(..., example=151.75)
     volume: Optional[int] = Field(None, example=1000000)
 
+class PriceSeries(BaseModel):
+    """Modelo para series de precios en formato columnar"""
+    model_config = ConfigDict(
+        extra="allow",  # 'stale': true cuando se sirve la copia de respaldo
+        json_schema_extra={"description": "Serie OHLCV ordenada por fecha ascendente, una lista por columna"}
+    )
+
+    symbol: str = Field(..., example="AAPL")
+    interval: str = Field(..., example="daily")
+    timezone: str = Field("US/Eastern", example="US/Eastern")
+    last_refreshed: Optional[str] = Field(None, example="2023-10-05")
+    source_interval: Optional[str] = Field(None, example="daily", description="Serie nativa de la que se agregó")
+    timestamps: List[int] = Field(..., example=[1696464000, 1696550400], description="Segundos UNIX (UTC)")
+    open: List[float] = Field(..., example=[171.25, 172.81])
+    high: List[float] = Field(..., example=[173.05, 174.26])
+    low: List[float] = Field(..., example=[170.10, 170.80])
+    close: List[float] = Field(..., example=[172.40, 173.50])
+    volume: List[int] = Field(..., example=[9512345, 10058372])
+
+class PriceBatchRequest(BaseModel):
+    """Modelo para solicitudes de precios de múltiples símbolos"""
+    model_config = ConfigDict(
+        json_schema_extra={"description": "Lista de símbolos para consultar precios en lote"}
+    )
+
+    symbols: List[str] = Field(..., min_length=1, example=["AAPL", "MSFT"])
+    interval: str = Field("daily", pattern="^(daily|1min|5min|15min|30min|60min)$", example="daily")
+    stream: bool = Field(False, example=False)
+    format: str = Field("columnar", pattern="^(columnar|raw)$", example="columnar")
+    fields: Optional[List[str]] = Field(None, example=["close"])
+    limit: Optional[int] = Field(None, ge=1, example=1)
+    since: Optional[str] = Field(None, example="2023-10-01")
+
+class ExportRequest(BaseModel):
+    """Modelo para solicitudes de exportación masiva"""
+    model_config = ConfigDict(
+        json_schema_extra={"description": "Universo, datos y rango de fechas a exportar"}
+    )
+
+    symbols: List[str] = Field(..., min_length=1, example=["AAPL", "MSFT"])
+    datasets: List[str] = Field(["prices"], min_length=1, example=["prices", "financials", "ratios"])
+    interval: str = Field("daily", pattern="^(daily|1min|5min|15min|30min|60min)$", example="daily")
+    period: str = Field("annual", pattern="^(annual|quarterly)$", example="annual")
+    start: Optional[str] = Field(None, pattern=r"^\d{4}-\d{2}-\d{2}$", example="2020-01-01")
+    end: Optional[str] = Field(None, pattern=r"^\d{4}-\d{2}-\d{2}$", example="2023-12-31")
+    format: str = Field("parquet", pattern="^(parquet|arrow|csv)$", example="parquet")
+
 class FinancialData(BaseModel):
     """Modelo para datos financieros fundamentales"""
     model_config = ConfigDict(
@@ -70,6 +117,36 @@ class InstrumentInfo(BaseModel):
     currency: Optional[str] = Field(None, example="USD")
     country: Optional[str] = Field(None, example="United States")
 
+class MappingJob(BaseModel):
+    """Modelo para un trabajo de mapeo de identificadores"""
+    model_config = ConfigDict(
+        json_schema_extra={"description": "Identificador a resolver con OpenFIGI"}
+    )
+
+    id_type: str = Field("TICKER", example="TICKER")
+    value: str = Field(..., min_length=1, example="AAPL")
+    market: str = Field("US", example="US")
+
+class BatchMappingRequest(BaseModel):
+    """Modelo para solicitudes de mapeo por lotes"""
+    model_config = ConfigDict(
+        json_schema_extra={"description": "Lote de identificadores a resolver"}
+    )
+
+    jobs: List[MappingJob] = Field(..., min_length=1)
+
+class BatchMappingResult(BaseModel):
+    """Modelo para el resultado de un trabajo de mapeo"""
+    model_config = ConfigDict(
+        json_schema_extra={"description": "Resultado de un trabajo del lote (datos o error)"}
+    )
+
+    job: MappingJob
+    data: Optional[List[InstrumentInfo]] = None
+    error: Optional[str] = Field(None, example="No se encontraron instrumentos")
+    details: Optional[str] = Field(None, example="Parámetros usados: TICKER=XXXX")
+    code: Optional[int] = Field(None, example=404)
+
 class ErrorResponse(BaseModel):
     """Modelo para respuestas de error"""
     model_config = ConfigDict(
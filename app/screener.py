@@ -0,0 +1,266 @@
+# app/screener.py
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote_plus
+import numpy as np
+from redis.exceptions import RedisError
+from app.config import Config
+from app.cache import cache, is_error
+from app.services import fmp
+from app.storage.fundamentals import FUNDAMENTAL_COLUMNS, fundamentals_store
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "=": np.equal,
+    "==": np.equal,
+    "!=": np.not_equal
+}
+
+FILTER_PATTERN = re.compile(r"^([a-z_]+)\s*(<=|>=|!=|==|<|>|=)\s*(.*)$")
+
+@dataclass
+class ScreenerQuery:
+    """Filtros, orden y límite de una consulta al screener"""
+    filters: List[Tuple[str, str, float]] = field(default_factory=list)
+    sort: Optional[str] = None
+    descending: bool = False
+    limit: int = 50
+    fields: Tuple[str, ...] = FUNDAMENTAL_COLUMNS
+
+def parse_query(query_string: str) -> ScreenerQuery:
+    """
+    Interpreta la query string cruda ('pe_ratio<20&roe>0.15&sort=-revenue&limit=50')
+    Raises:
+        ValueError: Si una condición, columna o parámetro no es válido
+    """
+    query = ScreenerQuery()
+    for part in filter(None, query_string.split("&")):
+        match = FILTER_PATTERN.match(unquote_plus(part).strip())
+        if not match:
+            raise ValueError(f"Condición no válida: {unquote_plus(part)}")
+        name, operator, value = match.groups()
+
+        if name == "sort" and operator == "=":
+            query.descending = value.startswith("-")
+            query.sort = value.lstrip("+-")
+            if query.sort not in FUNDAMENTAL_COLUMNS:
+                raise ValueError(f"No se puede ordenar por {query.sort}. Usar: {', '.join(FUNDAMENTAL_COLUMNS)}")
+            continue
+        if name == "limit" and operator == "=":
+            if not value.isdigit() or not 1 <= int(value) <= Config.SCREENER_MAX_LIMIT:
+                raise ValueError(f"limit debe estar entre 1 y {Config.SCREENER_MAX_LIMIT}")
+            query.limit = int(value)
+            continue
+        if name == "fields" and operator == "=":
+            names = [column.strip() for column in value.split(",") if column.strip()]
+            unknown = [column for column in names if column not in FUNDAMENTAL_COLUMNS]
+            if not names or unknown:
+                raise ValueError(f"Campos no válidos: {', '.join(unknown) or value}. Usar: {', '.join(FUNDAMENTAL_COLUMNS)}")
+            query.fields = tuple(dict.fromkeys(names))
+            continue
+
+        if name not in FUNDAMENTAL_COLUMNS:
+            raise ValueError(f"Columna no soportada: {name}. Usar: {', '.join(FUNDAMENTAL_COLUMNS)}")
+        try:
+            query.filters.append((name, operator, float(value)))
+        except ValueError:
+            raise ValueError(f"Valor no numérico en {name}{operator}{value}")
+    return query
+
+class ScreenerTable:
+    """Tabla columnar en memoria con los últimos fundamentales de todo el universo"""
+
+    def __init__(self):
+        self.symbols = np.array([], dtype=object)
+        self.dates = np.array([], dtype=object)
+        self.columns: Dict[str, np.ndarray] = {column: np.empty(0) for column in FUNDAMENTAL_COLUMNS}
+        self.version = 0.0  # Última actualización de la tabla en disco que se ha cargado
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def load(self, rows: List[sqlite3.Row], version: float) -> None:
+        """Reconstruye la tabla (las consultas en curso siguen viendo la anterior)"""
+        columns = {
+            column: np.array([np.nan if row[column] is None else row[column] for row in rows], dtype=np.float64)
+            for column in FUNDAMENTAL_COLUMNS
+        }
+        self.symbols = np.array([row["symbol"] for row in rows], dtype=object)
+        self.dates = np.array([row["date"] for row in rows], dtype=object)
+        self.columns = columns
+        self.version = version
+
+    def screen(self, query: ScreenerQuery) -> Dict:
+        """Aplica filtros y orden con operaciones vectorizadas"""
+        symbols, dates, columns = self.symbols, self.dates, self.columns
+        mask = np.ones(len(symbols), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            for name, operator, value in query.filters:
+                mask &= OPERATORS[operator](columns[name], value)  # NaN nunca cumple la condición
+        indexes = np.flatnonzero(mask)
+
+        if query.sort:
+            values = columns[query.sort][indexes]
+            # NaN al final en ambos sentidos
+            order = np.argsort(-values if query.descending else values, kind="stable")
+            indexes = indexes[order]
+        indexes = indexes[:query.limit]
+
+        results = []
+        for index in indexes.tolist():
+            row = {"symbol": symbols[index], "date": dates[index]}
+            for name in query.fields:
+                value = columns[name][index]
+                row[name] = None if np.isnan(value) else float(value)
+            results.append(row)
+
+        return {
+            "total": int(mask.sum()),
+            "count": len(results),
+            "universe": len(symbols),
+            "as_of": datetime.fromtimestamp(self.version, timezone.utc).isoformat() if self.version else None,
+            "results": results
+        }
+
+def load_symbols(inline: str, path: str = "") -> List[str]:
+    """Símbolos separados por comas y/o de un fichero con un símbolo por línea ('#' comenta)"""
+    symbols = [symbol for symbol in inline.split(",")]
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as handle:
+            symbols.extend(line.split("#")[0] for line in handle)
+    return list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+
+def load_universe() -> List[str]:
+    """Símbolos del universo (SCREENER_UNIVERSE y/o SCREENER_UNIVERSE_FILE)"""
+    return load_symbols(Config.SCREENER_UNIVERSE, Config.SCREENER_UNIVERSE_FILE)
+
+def _latest(result) -> Dict:
+    """Periodo más reciente de una respuesta de FMP (lista ordenada de más nuevo a más antiguo)"""
+    if is_error(result) or not result:
+        return {}
+    return max(result, key=lambda item: item.get("date") or "")
+
+class Screener:
+    """
+    Mantiene la tabla del screener
+
+    Un solo worker (con un lease en Redis) refresca en cada ciclo los símbolos
+    más atrasados y los guarda en SQLite; todos los workers recargan su tabla
+    en memoria cuando cambia el fichero. Las consultas nunca llaman a FMP.
+    """
+
+    def __init__(self):
+        self.table = ScreenerTable()
+        self._task: Optional[asyncio.Task] = None
+        self._worker_id = uuid.uuid4().hex
+
+    def _read_changes(self) -> Optional[Tuple[float, List]]:
+        """Versión y filas del almacén si hay datos más nuevos que la tabla (None si no)"""
+        version = fundamentals_store.last_modified()
+        if version <= self.table.version:
+            return None
+        return version, fundamentals_store.load()
+
+    async def reload(self) -> bool:
+        """Recarga la tabla si hay datos nuevos en disco (SQLite en un hilo, sin bloquear el bucle)"""
+        changes = await asyncio.to_thread(self._read_changes)
+        if changes is None:
+            return False
+        version, rows = changes
+        self.table.load(rows, version)
+        logger.info(f"Screener: {len(self.table)} símbolos cargados")
+        return True
+
+    async def refresh(self, symbols: List[str]) -> int:
+        """
+        Actualiza los fundamentales de los símbolos indicados (ratios y
+        estado de resultados anuales más recientes)
+        Returns:
+            Número de símbolos actualizados
+        """
+        rows = []
+        for symbol in symbols:
+            ratios = await fmp.get_financial_ratios(symbol, "annual")
+            income = await fmp.get_income_statement(symbol, "annual")
+            if any(isinstance(result, dict) and result.get("code") == 429 for result in (ratios, income)):
+                logger.warning("Screener: límite de FMP alcanzado, se continúa en el siguiente ciclo")
+                break
+            if is_error(ratios) or is_error(income):
+                # Guardar solo una parte borraría los valores conocidos y retrasaría el reintento
+                failed = ratios if is_error(ratios) else income
+                logger.warning(f"Screener: {symbol} sin actualizar, se reintenta en el siguiente ciclo: {failed['error']}")
+                continue
+            latest_ratios, latest_income = _latest(ratios), _latest(income)
+            if not latest_ratios and not latest_income:
+                logger.warning(f"Screener: sin fundamentales para {symbol}")
+                continue
+            rows.append({
+                "symbol": symbol,
+                "date": latest_ratios.get("date") or latest_income.get("date"),
+                **{column: latest_ratios.get(column) for column in ("current_ratio", "debt_to_equity", "roe", "pe_ratio")},
+                "revenue": latest_income.get("revenue"),
+                "net_income": latest_income.get("net_income")
+            })
+        if rows:
+            await asyncio.to_thread(fundamentals_store.upsert, rows)
+        return len(rows)
+
+    async def _is_leader(self) -> bool:
+        """Lease de refresco para un ciclo (si Redis no responde, refresca cada worker)"""
+        try:
+            return bool(await cache.redis_client.set(
+                "lease:screener:refresh", self._worker_id, nx=True, ex=Config.SCREENER_REFRESH_INTERVAL
+            ))
+        except (RedisError, OSError) as e:
+            logger.warning(f"Lease del screener no disponible: {str(e)}")
+            return True
+
+    async def run_cycle(self) -> None:
+        """Un ciclo: refresco (solo el líder) y recarga de la tabla"""
+        universe = load_universe()
+        if universe and await self._is_leader():
+            pending = await asyncio.to_thread(
+                fundamentals_store.stale, universe, Config.SCREENER_MAX_AGE, Config.SCREENER_REFRESH_BATCH
+            )
+            if pending:
+                updated = await self.refresh(pending)
+                logger.info(f"Screener: {updated}/{len(pending)} símbolos actualizados")
+        await self.reload()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.error(f"Error refrescando el screener: {str(e)}", exc_info=True)
+            await asyncio.sleep(Config.SCREENER_RELOAD_INTERVAL)
+
+    def start(self) -> None:
+        """Arranca el refresco en segundo plano"""
+        if self._task is None and Config.SCREENER_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+screener = Screener()
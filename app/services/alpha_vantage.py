@@ -1,82 +1,167 @@
-import requests
+import asyncio
 import logging
-from typing import Dict, Union
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 from app.config import Config
+from app.cache import cache, ttl_for, PRICES_DAILY, PRICES_INTRADAY
+from app.storage import price_store
+from app.utils import generate_date_range, log_api_call
+from app.services.providers import PRICES, router
+from app.services.providers.alpha_vantage import FUNCTION_MAP
 
 # Configurar logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-# Mapeo de funciones de Alpha Vantage
-FUNCTION_MAP = {
-    "daily": "TIME_SERIES_DAILY",
-    "1min": "TIME_SERIES_INTRADAY",
-    "5min": "TIME_SERIES_INTRADAY",
-    "15min": "TIME_SERIES_INTRADAY",
-    "30min": "TIME_SERIES_INTRADAY",
-    "60min": "TIME_SERIES_INTRADAY"
-}
-
-def get_stock_prices(symbol: str, interval: str = "daily") -> Dict[str, Union[dict, str]]:
+# Barras que devuelve outputsize=compact
+COMPACT_BARS = 100
+
+# Duración de cada barra intradía (segundos)
+INTERVAL_SECONDS = {"1min": 60, "5min": 300, "15min": 900, "30min": 1800, "60min": 3600}
+
+def price_data_class(arguments: dict) -> str:
+    """Clase de caché según el intervalo solicitado"""
+    return PRICES_DAILY if arguments.get("interval") == "daily" else PRICES_INTRADAY
+
+# La clave conserva el prefijo 'alpha_vantage' para no invalidar la caché existente
+@cache.cached("alpha_vantage", "prices", data_class=price_data_class)
+async def get_stock_prices(symbol: str, interval: str = "daily") -> Dict[str, Union[dict, str]]:
     """
-    Obtiene datos históricos de precios de Alpha Vantage
+    Obtiene datos históricos de precios (Alpha Vantage o, si no está
+    disponible o es más rápido, Financial Modeling Prep)
     Args:
         symbol: Símbolo bursátil (ej: 'AAPL')
         interval: Intervalo de tiempo (daily, 1min, 5min, etc.)
     
     Returns:
-        Dict con datos de precios o mensaje de error
+        Serie columnar (timestamps, open, high, low, close, volume en orden
+        ascendente) o mensaje de error
+    """
+    return await _fetch_prices(symbol, interval)
+
+@log_api_call
+async def _fetch_prices(symbol: str, interval: str = "daily", outputsize: str = "compact") -> Dict[str, Union[dict, str]]:
+    """
+    Consulta el mejor proveedor de precios disponible (sin caché)
+    Args:
+        outputsize: 'compact' (últimas 100 barras) o 'full' (todo el histórico)
+    """
+    if not symbol or not symbol.strip():
+        return {"error": "El símbolo no puede estar vacío", "code": 400}
+
+    if interval not in FUNCTION_MAP:
+        return {"error": f"Intervalo no válido: {interval}", "code": 400}
+
+    return await router.fetch(PRICES, symbol.strip(), interval=interval, outputsize=outputsize)
+
+async def iter_stock_prices(symbols: List[str], interval: str = "daily") -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Obtiene precios de muchos símbolos en paralelo (con concurrencia acotada)
+    Args:
+        symbols: Símbolos bursátiles (ya normalizados y sin duplicados)
+        interval: Intervalo de tiempo (daily, 1min, 5min, etc.)
+
+    Yields:
+        Tuplas (símbolo, datos o error) según van completándose; los
+        símbolos en caché se devuelven primero, sin esperar a los demás
     """
+    keys = [get_stock_prices.cache_key(symbol, interval) for symbol in symbols]
+    cached_values = await cache.get_many(keys) if Config.CACHE_ENABLED else [None] * len(keys)
+
+    pending = []
+    for symbol, value in zip(symbols, cached_values):
+        if value is not None:
+            yield symbol, value
+        else:
+            pending.append(symbol)
+
+    semaphore = asyncio.Semaphore(Config.PRICES_BATCH_CONCURRENCY)
+
+    async def fetch(symbol: str) -> Tuple[str, Dict]:
+        async with semaphore:
+            return symbol, await get_stock_prices(symbol, interval)
+
+    tasks = [asyncio.ensure_future(fetch(symbol)) for symbol in pending]
     try:
-        # Validar parámetros iniciales
-        if not Config.ALPHA_VANTAGE_API_KEY:
-            logger.error("API key de Alpha Vantage no configurada")
-            return {"error": "Configuración de API incompleta"}
-        
-        if interval not in FUNCTION_MAP:
-            raise ValueError(f"Intervalo no válido: {interval}")
-
-        logger.info(f"Solicitando precios para {symbol} ({interval})")
-        
-        # Construir parámetros
-        params = {
-            "function": FUNCTION_MAP[interval],
-            "symbol": symbol,
-            "apikey": Config.ALPHA_VANTAGE_API_KEY,  # ¡Clave correcta aquí!
-            "outputsize": "compact"
-        }
-        
-        if interval != "daily":
-            params["interval"] = interval
-        
-        # Verificar parámetros en logs (solo para debug)
-        logger.debug(f"Parámetros de solicitud: {params}")
-        
-        # Hacer la solicitud
-        response = requests.get(
-            "https://www.alphavantage.co/query",
-            params=params,
-            timeout=15
-        )
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        # Manejar errores de Alpha Vantage
-        if "Error Message" in data:
-            logger.error(f"Error en API: {data['Error Message']}")
-            return {"error": data["Error Message"]}
-            
-        if "Note" in data:
-            logger.error("Límite de API alcanzado")
-            return {"error": data["Note"]}
-        
-        return data
-    
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error de conexión: {str(e)}")
-        return {"error": f"Error de conexión: {str(e)}"}
-    
-    except Exception as e:
-        logger.error(f"Error inesperado: {str(e)}", exc_info=True)
-        return {"error": f"Error interno: {str(e)}"}
\ No newline at end of file
+        for completed in asyncio.as_completed(tasks):
+            yield await completed
+    finally:
+        # Si el cliente se desconecta no seguimos lanzando peticiones
+        for task in tasks:
+            task.cancel()
+
+def _history_is_fresh(state: Dict, interval: str) -> bool:
+    """La serie local está al día si no ha caducado el TTL vigente cuando se actualizó"""
+    updated = datetime.fromtimestamp(state["updated_at"], timezone.utc)
+    return time.time() < state["updated_at"] + ttl_for(price_data_class({"interval": interval}), updated)
+
+def _compact_covers(state: Dict, interval: str) -> bool:
+    """Indica si las últimas 100 barras bastan para cubrir el hueco desde la última almacenada"""
+    if state["last_ts"] is None:
+        return False
+    if interval == "daily":
+        last = datetime.fromtimestamp(state["last_ts"], timezone.utc).strftime("%Y-%m-%d")
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        sessions = [day for day in generate_date_range(last, today) if datetime.strptime(day, "%Y-%m-%d").weekday() < 5]
+        return len(sessions) < COMPACT_BARS
+    return (time.time() - state["last_ts"]) / INTERVAL_SECONDS[interval] < COMPACT_BARS
+
+async def _sync_history(symbol: str, interval: str) -> Optional[Dict]:
+    """
+    Actualiza el histórico local: backfill completo la primera vez y después
+    solo la cola que falta
+    Returns:
+        None si la serie local queda al día, o el error del proveedor
+    """
+    state = await asyncio.to_thread(price_store.state, symbol, interval)
+    if state is not None and _history_is_fresh(state, interval):
+        return None
+
+    backfill = state is None or not _compact_covers(state, interval)
+    logger.info(f"Sincronizando histórico de {symbol} ({interval}): {'completo' if backfill else 'incremental'}")
+    series = await _fetch_prices(symbol, interval, "full" if backfill else "compact")
+    if "error" in series:
+        return series
+
+    written = await asyncio.to_thread(price_store.append, series, backfill)
+    logger.info(f"Histórico de {symbol} ({interval}): {written} barras escritas")
+    return None
+
+async def get_price_history(
+    symbol: str,
+    interval: str = "daily",
+    start: Optional[int] = None,
+    end: Optional[int] = None
+) -> Dict[str, Union[dict, str]]:
+    """
+    Devuelve un rango del histórico local de precios, sincronizándolo antes si hace falta
+    Args:
+        symbol: Símbolo bursátil (ej: 'AAPL')
+        interval: Intervalo de tiempo (daily, 1min, 5min, etc.)
+        start: Timestamp UNIX inicial (incluido)
+        end: Timestamp UNIX final (incluido)
+
+    Returns:
+        Serie columnar del rango o mensaje de error
+    """
+    symbol = symbol.strip().upper()
+    if interval not in FUNCTION_MAP:
+        return {"error": f"Intervalo no válido: {interval}", "code": 400}
+
+    try:
+        # Una sola sincronización por serie entre las peticiones concurrentes del worker
+        error = await cache.flights.do(f"history:{symbol}:{interval}", lambda: _sync_history(symbol, interval))
+        # SQLite en un hilo: un worker con el lock de escritura no para el bucle de eventos
+        series = await asyncio.to_thread(price_store.read, symbol, interval, start, end)
+    except sqlite3.Error as e:
+        logger.error(f"Histórico local no disponible: {str(e)}")
+        return {"error": f"Histórico local no disponible: {str(e)}", "code": 503}
+
+    if series is None:
+        return error or {"error": f"Sin histórico para {symbol}", "code": 404}
+    if error:
+        # Se sirve lo que hay en local aunque no se haya podido actualizar
+        logger.warning(f"Histórico de {symbol} sin actualizar: {error['error']}")
+    return series
@@ -0,0 +1,145 @@
+# app/services/clients.py
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+import httpx
+from app.config import Config
+from app.metrics import observe_upstream
+from app.resilience import ResilientTransport
+from app.tracing import KIND_CLIENT, Span, start_span
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Configuración por proveedor: URL base, timeout (segundos) y si sus POST son
+# consultas que se pueden reintentar (el mapeo de OpenFIGI no modifica nada)
+PROVIDERS = {
+    "alpha_vantage": {"base_url": Config.ALPHA_VANTAGE_BASE_URL, "timeout": 15.0},
+    "fmp": {"base_url": Config.FMP_BASE_URL, "timeout": 10.0},
+    "openfigi": {"base_url": Config.OPENFIGI_BASE_URL, "timeout": 15.0, "idempotent_post": True},
+    "newsapi": {"base_url": Config.NEWS_API_BASE_URL, "timeout": 10.0},
+}
+
+class MeteredStream(httpx.AsyncByteStream):
+    """Cuerpo de respuesta que mide bytes y duración total al cerrarse"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, provider: str, status: str, start: float, span: Optional[Span]):
+        self._stream = stream
+        self._provider = provider
+        self._status = status
+        self._start = start
+        self._size = 0
+        self._observed = False
+        self._span = span
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._size += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+        if not self._observed:
+            self._observed = True
+            observe_upstream(self._provider, self._status, time.perf_counter() - self._start, self._size)
+            if self._span is not None:
+                self._span.set(**{"http.response.body.size": self._size})
+                self._span.finish()
+
+class MeteredTransport(httpx.AsyncBaseTransport):
+    """
+    Transporte que registra latencia, estado (o clase de error) y tamaño de
+    cada petición; en las peticiones trazadas abre un span 'upstream' (la URL
+    se registra sin query string, que lleva la API key)
+    """
+
+    def __init__(self, provider: str, transport: httpx.AsyncBaseTransport):
+        self.provider = provider
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        span = start_span(
+            "upstream", KIND_CLIENT, provider=self.provider,
+            **{"http.method": request.method, "url.full": str(request.url.copy_with(query=None))}
+        )
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TimeoutException:
+            observe_upstream(self.provider, "timeout", time.perf_counter() - start, 0)
+            if span is not None:
+                span.finish("timeout")
+            raise
+        except httpx.TransportError:
+            observe_upstream(self.provider, "connection_error", time.perf_counter() - start, 0)
+            if span is not None:
+                span.finish("connection_error")
+            raise
+        if span is not None:
+            span.set(**{"http.status_code": response.status_code})
+        response.stream = MeteredStream(response.stream, self.provider, str(response.status_code), start, span)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+# Un cliente compartido por proveedor (reutiliza conexiones keep-alive)
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+def get_client(provider: str) -> httpx.AsyncClient:
+    """
+    Devuelve el cliente HTTP asíncrono compartido de un proveedor
+    Args:
+        provider: Nombre del proveedor ('alpha_vantage', 'fmp', 'openfigi', 'newsapi')
+
+    Returns:
+        Cliente httpx con pool de conexiones persistentes
+    """
+    client = _clients.get(provider)
+    if client is None or client.is_closed:
+        settings = PROVIDERS[provider]
+        client = httpx.AsyncClient(
+            base_url=settings["base_url"],
+            timeout=httpx.Timeout(settings["timeout"], connect=Config.HTTP_CONNECT_TIMEOUT),
+            # Cada intento (reintentos y peticiones duplicadas incluidos) se mide por separado
+            transport=ResilientTransport(
+                provider,
+                MeteredTransport(provider, httpx.AsyncHTTPTransport(limits=httpx.Limits(
+                    max_connections=Config.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY
+                ))),
+                idempotent_post=settings.get("idempotent_post", False)
+            ),
+            headers={"User-Agent": f"{Config.APP_NAME}/{Config.APP_VERSION}"}
+        )
+        _clients[provider] = client
+        logger.debug(f"Cliente HTTP creado para {provider}")
+    return client
+
+def connection_error(e: httpx.HTTPError) -> Dict[str, Any]:
+    """
+    Error estándar de un fallo al consultar un proveedor
+    Args:
+        e: Excepción de httpx (red, timeout, circuito abierto o estado HTTP)
+
+    Returns:
+        Diccionario de error con el código que se propaga al cliente: 429 si el
+        proveedor limita, 504 si no respondió a tiempo y 502/503 si está caído
+    """
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        code = status if status in (404, 429) else 502
+    elif isinstance(e, httpx.TimeoutException):
+        code = 504
+    else:
+        code = 503
+    return {"error": f"Error de conexión: {str(e)}", "code": code}
+
+async def close_clients() -> None:
+    """Cierra todos los clientes HTTP abiertos (al apagar la aplicación)"""
+    while _clients:
+        provider, client = _clients.popitem()
+        await client.aclose()
+        logger.debug(f"Cliente HTTP cerrado para {provider}")
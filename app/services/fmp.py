@@ -1,15 +1,31 @@
-import requests
 import logging
-from typing import Dict, List, Union
-from app.config import Config
+from typing import Dict, List, Optional, Union
+from app.cache import cache, FUNDAMENTALS
+from app.services.providers import INCOME_STATEMENT, RATIOS, router
+from app.utils import log_api_call
 
 # Configurar logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-def get_financial_ratios(symbol: str, period: str = "annual") -> Union[List[Dict[str, Union[dict, str]]], Dict[str, str]]:
+# Periodos admitidos por los proveedores de fundamentales
+VALID_PERIODS = ["annual", "quarterly"]
+
+def _validate(symbol: str, period: str) -> Optional[Dict[str, str]]:
+    """Error de parámetros antes de consultar a ningún proveedor (None si son válidos)"""
+    if period not in VALID_PERIODS:
+        logger.error("Error de parámetros: Periodo debe ser 'annual' o 'quarterly'")
+        return {"error": "Periodo debe ser 'annual' o 'quarterly'", "code": 400}
+    if not symbol or not symbol.strip():
+        return {"error": "El símbolo no puede estar vacío", "code": 400}
+    return None
+
+# Las claves conservan el prefijo 'fmp' aunque el dato pueda venir de otro proveedor
+@cache.cached("fmp", "ratios", data_class=FUNDAMENTALS)
+@log_api_call
+async def get_financial_ratios(symbol: str, period: str = "annual") -> Union[List[Dict[str, Union[dict, str]]], Dict[str, str]]:
     """
-    Obtiene ratios financieros de Financial Modeling Prep
+    Obtiene ratios financieros (Financial Modeling Prep)
     Args:
         symbol: Símbolo bursátil (ej: 'AAPL')
         period: 'annual' o 'quarterly'
@@ -17,107 +33,19 @@ def get_financial_ratios(symbol: str, period: str = "annual") -> Union[List[Dict
     Returns:
         Lista de ratios o mensaje de error
     """
-    try:
-        logger.info(f"Solicitando ratios financieros para {symbol} ({period})")
+    return _validate(symbol, period) or await router.fetch(RATIOS, symbol.strip(), period)
 
-        if period not in ["annual", "quarterly"]:
-            raise ValueError("Periodo debe ser 'annual' o 'quarterly'")
-
-        # Construir parámetros de la solicitud
-        params = {"apikey": Config.FMP_API_KEY, "period": period}
-
-        # Hacer la solicitud a la API
-        response = requests.get(
-            f"https://financialmodelingprep.com/api/v3/ratios/{symbol}",
-            params=params,
-            timeout=10
-        )
-
-        response.raise_for_status()
-
-        logger.debug("Respuesta recibida de Financial Modeling Prep")
-        data = response.json()
-
-        # Manejar errores de la API
-        if isinstance(data, dict) and "Error Message" in data:
-            logger.error(f"Error en FMP: {data['Error Message']}")
-            return {"error": data["Error Message"]}
-
-        # Transformar datos para que coincidan con el modelo FinancialRatios
-        processed_data = []
-        for item in data:
-            processed_data.append({
-                "symbol": item.get("symbol"),
-                "date": item.get("date"),
-                "current_ratio": item.get("currentRatio"),
-                "debt_to_equity": item.get("debtEquityRatio"),
-                "roe": item.get("returnOnEquity"),
-                "pe_ratio": item.get("priceEarningsRatio")
-            })
-
-        return processed_data
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error de conexión: {str(e)}")
-        return {"error": f"Error de conexión: {str(e)}"}
-
-    except ValueError as e:
-        logger.error(f"Error de parámetros: {str(e)}")
-        return {"error": str(e)}
-
-    except Exception as e:
-        logger.error(f"Error inesperado: {str(e)}", exc_info=True)
-        return {"error": f"Error interno del servidor: {str(e)}"}
-
-def get_income_statement(symbol: str, period: str = "annual") -> Union[List[Dict[str, Union[dict, str]]], Dict[str, str]]:
+@cache.cached("fmp", "income_statement", data_class=FUNDAMENTALS)
+@log_api_call
+async def get_income_statement(symbol: str, period: str = "annual") -> Union[List[Dict[str, Union[dict, str]]], Dict[str, str]]:
     """
-    Obtiene el estado de resultados de una empresa
+    Obtiene el estado de resultados de una empresa (Financial Modeling Prep
+    o, si no está disponible o es más rápido, Alpha Vantage)
     Args:
         symbol: Símbolo bursátil (ej: 'AAPL')
         period: 'annual' o 'quarterly'
-    
+
     Returns:
         Lista de estados de resultados o mensaje de error
     """
-    try:
-        logger.info(f"Solicitando estado de resultados para {symbol} ({period})")
-        
-        # Validar parámetros
-        if period not in ["annual", "quarterly"]:
-            raise ValueError("Periodo debe ser 'annual' o 'quarterly'")
-        
-        response = requests.get(
-            f"https://financialmodelingprep.com/api/v3/income-statement/{symbol}",
-            params={"apikey": Config.FMP_API_KEY, "period": period},
-            timeout=10
-        )
-        
-        response.raise_for_status()
-        
-        raw_data = response.json()
-        
-        # Transformar datos para que coincidan con el modelo
-        processed_data = []
-        for item in raw_data:
-            processed_item = {
-                "symbol": item.get("symbol"),
-                "date": item.get("date"),
-                "revenue": item.get("revenue"),
-                "net_income": item.get("netIncome"),  # Mapear netIncome a net_income
-                "pe_ratio": item.get("peRatio")  # Mapear peRatio a pe_ratio
-            }
-            processed_data.append(processed_item)
-        
-        return processed_data
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error de conexión: {str(e)}")
-        return {"error": f"Error de conexión: {str(e)}"}
-    
-    except ValueError as e:
-        logger.error(f"Error de parámetros: {str(e)}")
-        return {"error": str(e)}
-    
-    except Exception as e:
-        logger.error(f"Error inesperado: {str(e)}", exc_info=True)
-        return {"error": f"Error interno del servidor: {str(e)}"}
\ No newline at end of file
+    return _validate(symbol, period) or await router.fetch(INCOME_STATEMENT, symbol.strip(), period)
@@ -1,9 +1,14 @@
 # app/services/news.py
-import requests
+import httpx
 import logging
 from typing import Dict, List, Union
 from datetime import datetime, timedelta
 from app.config import Config
+from app.cache import cache, NEWS
+from app.ratelimit import rate_limiter, rate_limit_error
+from app.services.clients import connection_error, get_client
+from app.utils import log_api_call
+from app.tracing import span
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -12,7 +17,9 @@ logger.setLevel(logging.INFO)
 # Parámetros válidos para ordenación
 VALID_SORT_VALUES = ["relevancy", "popularity", "publishedAt"]
 
-def get_financial_news(
+@cache.cached("newsapi", "everything", data_class=NEWS)
+@log_api_call
+async def get_financial_news(
     query: str,
     limit: int = 5,
     sort_by: str = "publishedAt"
@@ -47,20 +54,17 @@ def get_financial_news(
             "from": (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")  # Últimos 7 días
         }
         
-        # Hacer la solicitud a la API
-        response = requests.get(
-            "https://newsapi.org/v2/everything",
-            params=params,
-            timeout=10  # Timeout de 10 segundos
-        )
+        if not await rate_limiter.acquire("newsapi"):
+            return rate_limit_error("NewsAPI")
         
-        # Log the raw response for debugging
-        logger.debug(f"Raw API response: {response.json()}")
+        # Hacer la solicitud a la API
+        response = await get_client("newsapi").get("/v2/everything", params=params)
         
         response.raise_for_status()
         logger.debug("Respuesta recibida de NewsAPI")
         
-        data = response.json()
+        with span("parse"):
+            data = response.json()
         
         # Manejar errores de la API
         if data.get("status") != "ok":
@@ -90,9 +94,9 @@ def get_financial_news(
             "articles": processed_articles
         }
     
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error de conexión: {str(e)}")
-        return {"error": f"Error de conexión: {str(e)}"}
+        return connection_error(e)
     
     except ValueError as e:
         logger.error(f"Error de parámetros: {str(e)}")
@@ -1,8 +1,16 @@
 # app/services/openfigi.py
-import requests
+import asyncio
+import httpx
 import logging
-from typing import Dict, List, Union
+import sqlite3
+from typing import Dict, List, Optional, Tuple, Union
 from app.config import Config
+from app.cache import cache, ttl_for, FIGI
+from app.ratelimit import rate_limiter, rate_limit_error
+from app.services.clients import connection_error, get_client
+from app.utils import log_api_call
+from app.tracing import span
+from app.storage import figi_index
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -14,7 +22,70 @@ VALID_ID_TYPES = [
     "ID_CUSIP", "ID_CINS", "TICKER", "ID_MIC", "ID_EXCH_SYMBOL"
 ]
 
-def search_instrument(
+# Trabajos de mapeo por petición que admite OpenFIGI (con y sin API key)
+MAX_JOBS_PER_REQUEST = 100 if Config.OPENFIGI_API_KEY else 10
+
+def _headers() -> Dict[str, str]:
+    return {
+        "Content-Type": "application/json",
+        "X-OPENFIGI-APIKEY": Config.OPENFIGI_API_KEY
+    }
+
+def _validate(identifier: str, id_type: str) -> None:
+    if id_type not in VALID_ID_TYPES:
+        raise ValueError(f"Tipo de ID no válido. Usar: {', '.join(VALID_ID_TYPES)}")
+
+    if not identifier.strip():
+        raise ValueError("El identificador no puede estar vacío")
+
+def _process_matches(item: Dict, identifier: str, market: str) -> List[Dict]:
+    """Convierte el resultado de un trabajo de mapeo al modelo InstrumentInfo"""
+    results = []
+    if isinstance(item, dict) and "data" in item:
+        for match in item.get("data", []):
+            results.append({
+                "figi": match.get("figi", ""),
+                "name": match.get("name", identifier),  # Usar identifier como fallback
+                "ticker": match.get("ticker", ""),
+                "market": match.get("exchCode", market),  # Usar parámetro market como fallback
+                "security_type": match.get("securityType", ""),
+                "currency": match.get("currency", "USD")  # Default a USD
+            })
+    return results
+
+def _not_found(identifier: str, id_type: str) -> Dict[str, Union[str, int]]:
+    return {"error": "No se encontraron instrumentos", "details": f"Parámetros usados: {id_type}={identifier}", "code": 404}
+
+async def _index_lookup(jobs: List[Dict[str, str]]) -> List[Optional[List[Dict]]]:
+    """
+    Consulta el índice local de FIGI para varios trabajos en un hilo (SQLite
+    no debe bloquear el bucle de eventos); None donde no está, caducó o falla
+    """
+    if not Config.FIGI_INDEX_ENABLED or not jobs:
+        return [None] * len(jobs)
+    try:
+        return await asyncio.to_thread(
+            figi_index.lookup_many, [(job["id_type"], job["value"], job["market"]) for job in jobs]
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"Índice FIGI no disponible: {str(e)}")
+        return [None] * len(jobs)
+
+async def _index_store(matches: List[Tuple[Dict[str, str], List[Dict]]]) -> None:
+    """Guarda en el índice local, en una transacción, los resultados de OpenFIGI de varios trabajos"""
+    if not Config.FIGI_INDEX_ENABLED or not matches:
+        return
+    try:
+        await asyncio.to_thread(
+            figi_index.store_many,
+            [(job["id_type"], job["value"], job["market"], instruments) for job, instruments in matches]
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"No se pudo actualizar el índice FIGI: {str(e)}")
+
+@cache.cached("openfigi", "mapping", data_class=FIGI)
+@log_api_call
+async def search_instrument(
     identifier: str,
     id_type: str = "TICKER",
     market: str = "US"
@@ -25,77 +96,173 @@ def search_instrument(
         identifier: Valor del identificador (ej: 'AAPL')
         id_type: Tipo de identificador (default: 'TICKER')
         market: Mercado objetivo (ej: 'US', 'EU')
-    
+
     Returns:
         Lista de resultados de mapeo o mensaje de error
     """
     try:
         logger.info(f"Buscando instrumento: {identifier} ({id_type})")
-        
+
         # Validar parámetros
-        if id_type not in VALID_ID_TYPES:
-            raise ValueError(f"Tipo de ID no válido. Usar: {', '.join(VALID_ID_TYPES)}")
-        
-        if not identifier.strip():
-            raise ValueError("El identificador no puede estar vacío")
-        
+        _validate(identifier, id_type)
+
+        # Índice local: responde sin salir a red
+        job = {"id_type": id_type, "value": identifier, "market": market}
+        indexed, = await _index_lookup([job])
+        if indexed:
+            return indexed
+
         # Construir payload para OpenFIGI
-        headers = {
-            "Content-Type": "application/json",
-            "X-OPENFIGI-APIKEY": Config.OPENFIGI_API_KEY
-        }
-        
         payload = [{
             "idType": id_type,
             "idValue": identifier,
             "exchCode": market
         }]
-        
+
+        if not await rate_limiter.acquire("openfigi"):
+            return rate_limit_error("OpenFIGI")
+
         # Hacer la solicitud POST
-        response = requests.post(
-            "https://api.openfigi.com/v3/mapping",
-            headers=headers,
-            json=payload,
-            timeout=15  # Aumenté el timeout
+        response = await get_client("openfigi").post(
+            "/v3/mapping",
+            headers=_headers(),
+            json=payload
         )
-        
+
         response.raise_for_status()
         logger.debug(f"Respuesta recibida: {response.status_code}")
-        
-        data = response.json()
-        
+
+        with span("parse"):
+            data = response.json()
+
         # Procesar resultados
         results = []
         for item in data:
-            if isinstance(item, dict) and "data" in item:
-                for match in item.get("data", []):
-                    result = {
-                        "figi": match.get("figi", ""),
-                        "name": match.get("name", identifier),  # Usar identifier como fallback
-                        "ticker": match.get("ticker", ""),
-                        "market": match.get("exchCode", market),  # Usar parámetro market como fallback
-                        "security_type": match.get("securityType", ""),
-                        "currency": match.get("currency", "USD")  # Default a USD
-                    }
-                    results.append(result)
-        
+            results.extend(_process_matches(item, identifier, market))
+
         if not results:
             logger.warning("No se encontraron resultados")
-            return {"error": "No se encontraron instrumentos", "details": f"Parámetros usados: {id_type}={identifier}"}
-        
+            return _not_found(identifier, id_type)
+
+        await _index_store([(job, results)])
         return results
-    
-    except requests.exceptions.RequestException as e:
-        error_msg = f"Error de conexión: {str(e)}"
-        logger.error(error_msg)
-        return {"error": error_msg, "code": 503}
-    
+
+    except httpx.HTTPError as e:
+        logger.error(f"Error de conexión: {str(e)}")
+        return connection_error(e)
+
     except ValueError as e:
         error_msg = str(e)
         logger.error(f"Error de parámetros: {error_msg}")
         return {"error": error_msg, "code": 400}
-    
+
     except Exception as e:
         error_msg = f"Error inesperado: {str(e)}"
         logger.error(error_msg, exc_info=True)
-        return {"error": error_msg, "code": 500}
\ No newline at end of file
+        return {"error": error_msg, "code": 500}
+
+@log_api_call
+async def _map_chunk(jobs: List[Dict[str, str]], semaphore: asyncio.Semaphore) -> List[Union[List[Dict], Dict]]:
+    """Envía un bloque de trabajos en una sola petición a /v3/mapping"""
+    async with semaphore:
+        if not await rate_limiter.acquire("openfigi", max_wait=Config.OPENFIGI_BATCH_MAX_WAIT):
+            return [rate_limit_error("OpenFIGI")] * len(jobs)
+        try:
+            response = await get_client("openfigi").post(
+                "/v3/mapping",
+                headers=_headers(),
+                json=[{"idType": job["id_type"], "idValue": job["value"], "exchCode": job["market"]} for job in jobs]
+            )
+            response.raise_for_status()
+            with span("parse"):
+                data = response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Error de conexión en mapeo por lotes: {str(e)}")
+            return [connection_error(e)] * len(jobs)
+        except ValueError as e:
+            logger.error(f"Respuesta no válida de OpenFIGI en mapeo por lotes: {str(e)}")
+            return [{"error": "Respuesta no válida de OpenFIGI", "code": 502}] * len(jobs)
+
+    # Los resultados se asocian a los trabajos por posición: sin uno por trabajo no se usa ninguno
+    if not isinstance(data, list) or len(data) != len(jobs):
+        received = len(data) if isinstance(data, list) else type(data).__name__
+        logger.error(f"Respuesta de OpenFIGI con {received} resultados para {len(jobs)} trabajos")
+        return [{"error": "Respuesta incompleta de OpenFIGI", "code": 502}] * len(jobs)
+
+    results, found = [], []
+    for job, item in zip(jobs, data):
+        if isinstance(item, dict) and "error" in item:
+            results.append({"error": item["error"], "code": 400})
+            continue
+        matches = _process_matches(item, job["value"], job["market"])
+        if matches:
+            found.append((job, matches))
+        results.append(matches or _not_found(job["value"], job["id_type"]))
+    await _index_store(found)
+    return results
+
+async def map_instruments(jobs: List[Dict[str, str]]) -> List[Union[List[Dict], Dict]]:
+    """
+    Resuelve muchos identificadores con peticiones multi-trabajo de OpenFIGI
+    Args:
+        jobs: Lista de trabajos {'id_type', 'value', 'market'}
+
+    Returns:
+        Un resultado por trabajo, en el mismo orden: lista de instrumentos
+        o diccionario de error
+    """
+    logger.info(f"Mapeo por lotes: {len(jobs)} trabajos")
+    results: List[Optional[Union[List[Dict], Dict]]] = [None] * len(jobs)
+
+    # Validar y normalizar trabajos
+    jobs = [
+        {"id_type": job.get("id_type", "TICKER"), "value": job.get("value", ""), "market": job.get("market", "US")}
+        for job in jobs
+    ]
+    keys: Dict[int, str] = {}
+    for index, job in enumerate(jobs):
+        try:
+            _validate(job["value"], job["id_type"])
+        except ValueError as e:
+            results[index] = {"error": str(e), "code": 400}
+            continue
+        keys[index] = search_instrument.cache_key(job["value"], job["id_type"], job["market"])
+
+    # Servir desde caché los mapeos ya conocidos (misma clave que /instruments)
+    indexes = list(keys)
+    cached_values = await cache.get_many([keys[index] for index in indexes]) if Config.CACHE_ENABLED else [None] * len(indexes)
+    pending: Dict[str, List[int]] = {}
+    for index, value in zip(indexes, cached_values):
+        if value is not None:
+            results[index] = value
+        else:
+            pending.setdefault(keys[index], []).append(index)  # Trabajos repetidos se consultan una vez
+
+    # Después, el índice local de FIGI (una sola consulta por lotes)
+    resolved = {}
+    indexed_values = await _index_lookup([jobs[positions[0]] for positions in pending.values()])
+    for (key, positions), indexed in zip(list(pending.items()), indexed_values):
+        if indexed:
+            for index in positions:
+                results[index] = indexed
+            resolved[key] = indexed
+            del pending[key]
+
+    if pending:
+        unique = [jobs[positions[0]] for positions in pending.values()]
+        chunks = [unique[i:i + MAX_JOBS_PER_REQUEST] for i in range(0, len(unique), MAX_JOBS_PER_REQUEST)]
+        semaphore = asyncio.Semaphore(Config.OPENFIGI_BATCH_CONCURRENCY)
+        chunk_results = await asyncio.gather(*(_map_chunk(chunk, semaphore) for chunk in chunks))
+
+        for key, result in zip(pending, (result for chunk in chunk_results for result in chunk)):
+            for index in pending[key]:
+                results[index] = result
+            if isinstance(result, list):
+                resolved[key] = result
+
+        logger.info(f"Mapeo por lotes: {len(unique)} consultados en {len(chunks)} peticiones, {len(jobs) - len(unique)} desde caché o duplicados")
+
+    if resolved and Config.CACHE_ENABLED:
+        await cache.set_many(resolved, ttl_for(FIGI))
+
+    return results
@@ -0,0 +1,25 @@
+# app/services/providers/__init__.py
+from .base import Provider, PRICES, RATIOS, INCOME_STATEMENT, FAILOVER_CODES
+from .alpha_vantage import AlphaVantageProvider
+from .fmp import FMPProvider
+from .fake import FakeProvider
+from .router import ProviderRouter, ProviderStats
+
+# Enrutador compartido con los proveedores reales registrados
+router = ProviderRouter()
+router.register(AlphaVantageProvider())
+router.register(FMPProvider())
+
+__all__ = [
+    "Provider",
+    "PRICES",
+    "RATIOS",
+    "INCOME_STATEMENT",
+    "FAILOVER_CODES",
+    "AlphaVantageProvider",
+    "FMPProvider",
+    "FakeProvider",
+    "ProviderRouter",
+    "ProviderStats",
+    "router"
+]
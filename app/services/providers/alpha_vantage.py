@@ -0,0 +1,125 @@
+# app/services/providers/alpha_vantage.py
+import httpx
+import logging
+from typing import Dict, List, Optional, Union
+from app.config import Config
+from app.ratelimit import rate_limiter, rate_limit_error
+from app.services.clients import connection_error, get_client
+from app.services.providers.base import INCOME_STATEMENT, PRICES, Provider
+from app.timeseries import normalize_alpha_vantage
+from app.tracing import span
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Mapeo de funciones de Alpha Vantage
+FUNCTION_MAP = {
+    "daily": "TIME_SERIES_DAILY",
+    "1min": "TIME_SERIES_INTRADAY",
+    "5min": "TIME_SERIES_INTRADAY",
+    "15min": "TIME_SERIES_INTRADAY",
+    "30min": "TIME_SERIES_INTRADAY",
+    "60min": "TIME_SERIES_INTRADAY"
+}
+
+def _number(value: Optional[str]) -> Optional[float]:
+    """Alpha Vantage devuelve los importes como texto ('None' si faltan)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class AlphaVantageProvider(Provider):
+    """Precios diarios e intradía y estados de resultados de Alpha Vantage"""
+
+    name = "alpha_vantage"
+    capabilities = frozenset({PRICES, INCOME_STATEMENT})
+    intervals = frozenset(FUNCTION_MAP)
+
+    async def _query(self, params: Dict[str, str]) -> Dict:
+        """
+        Llama a /query respetando el límite de tasa
+        Returns:
+            Respuesta JSON o diccionario de error (el aviso 'Note' de cuota
+            agotada se trata como un 429 para que se pruebe otro proveedor)
+        """
+        if not Config.ALPHA_VANTAGE_API_KEY:
+            logger.error("API key de Alpha Vantage no configurada")
+            return {"error": "API key no configurada para Alpha Vantage", "code": 500}
+
+        # Respetar el límite de tasa compartido antes de llamar al proveedor
+        if not await rate_limiter.acquire("alpha_vantage"):
+            return rate_limit_error("Alpha Vantage")
+
+        response = await get_client("alpha_vantage").get("/query", params={**params, "apikey": Config.ALPHA_VANTAGE_API_KEY})
+
+        response.raise_for_status()
+        with span("parse"):
+            data = response.json()
+
+        # Manejar errores de Alpha Vantage
+        if "Error Message" in data:
+            logger.error(f"Error en API: {data['Error Message']}")
+            return {"error": f"Error en Alpha Vantage: {data['Error Message']}"}
+
+        # El límite diario llega como {"Information": ...} sin serie
+        if "Note" in data or ("Information" in data and len(data) == 1):
+            logger.error("Límite de API alcanzado")
+            return {"error": data.get("Note") or data["Information"], "code": 429}
+
+        return data
+
+    async def fetch_prices(self, symbol: str, interval: str, outputsize: str = "compact") -> Dict:
+        """Serie OHLCV; outputsize 'compact' (100 barras) o 'full'"""
+        try:
+            logger.info(f"Solicitando precios para {symbol} ({interval}) a Alpha Vantage")
+
+            params = {"function": FUNCTION_MAP[interval], "symbol": symbol, "outputsize": outputsize}
+            if interval != "daily":
+                params["interval"] = interval
+
+            data = await self._query(params)
+            if "error" in data:
+                return data
+
+            # Se cachea y devuelve la forma columnar, no el diccionario anidado de cadenas
+            with span("normalize"):
+                return {**normalize_alpha_vantage(data, symbol, interval), "provider": self.name}
+
+        except httpx.HTTPError as e:
+            logger.error(f"Error de conexión: {str(e)}")
+            return connection_error(e)
+
+        except Exception as e:
+            logger.error(f"Error inesperado: {str(e)}", exc_info=True)
+            return {"error": f"Error interno: {str(e)}", "code": 500}
+
+    async def fetch_income_statement(self, symbol: str, period: str) -> Union[List[Dict], Dict]:
+        """Estados de resultados con los campos de FinancialData (sin PER)"""
+        try:
+            logger.info(f"Solicitando estado de resultados para {symbol} ({period}) a Alpha Vantage")
+
+            data = await self._query({"function": "INCOME_STATEMENT", "symbol": symbol})
+            if "error" in data:
+                return data
+
+            reports = data.get("annualReports" if period == "annual" else "quarterlyReports") or []
+            return [
+                {
+                    "symbol": data.get("symbol", symbol).upper(),
+                    "date": report.get("fiscalDateEnding"),
+                    "revenue": _number(report.get("totalRevenue")),
+                    "net_income": _number(report.get("netIncome")),
+                    "pe_ratio": None
+                }
+                for report in reports
+            ]
+
+        except httpx.HTTPError as e:
+            logger.error(f"Error de conexión: {str(e)}")
+            return connection_error(e)
+
+        except Exception as e:
+            logger.error(f"Error inesperado: {str(e)}", exc_info=True)
+            return {"error": f"Error interno: {str(e)}", "code": 500}
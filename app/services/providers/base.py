@@ -0,0 +1,39 @@
+# app/services/providers/base.py
+from typing import Optional
+
+# Tipos de dato que puede servir un proveedor
+PRICES = "prices"
+RATIOS = "ratios"
+INCOME_STATEMENT = "income_statement"
+
+# Errores del proveedor (no de la petición) ante los que se prueba el siguiente
+FAILOVER_CODES = {429, 500, 502, 503, 504}
+
+class Provider:
+    """
+    Fuente de datos intercambiable
+
+    Cada proveedor declara qué tipos de dato e intervalos sirve e implementa
+    el método `fetch_<tipo>` correspondiente, que devuelve los datos ya en el
+    esquema común (serie columnar de `app.timeseries` o filas con los campos
+    de FinancialRatios/FinancialData) o un diccionario de error con 'code'.
+    Los argumentos llegan ya validados. El router solo llama a los métodos de
+    los tipos declarados en `capabilities`, así que no hay implementación por
+    defecto: declarar un tipo sin su método es un error al definir la clase.
+    """
+
+    name: str = ""
+    capabilities: frozenset = frozenset()
+    intervals: frozenset = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        missing = [capability for capability in cls.capabilities if not callable(getattr(cls, f"fetch_{capability}", None))]
+        if missing:
+            raise TypeError(f"{cls.__name__} declara {', '.join(sorted(missing))} sin su método fetch_<tipo>")
+
+    def supports(self, capability: str, interval: Optional[str] = None) -> bool:
+        """Indica si el proveedor sirve ese tipo de dato (y ese intervalo de precios)"""
+        if capability not in self.capabilities:
+            return False
+        return interval is None or interval in self.intervals
@@ -0,0 +1,82 @@
+# app/services/providers/fake.py
+import asyncio
+import hashlib
+from typing import Dict, List, Optional, Union
+from app.services.providers.base import INCOME_STATEMENT, PRICES, RATIOS, Provider
+from app.timeseries import normalize_rows
+
+DAY = 86400
+
+class FakeProvider(Provider):
+    """
+    Proveedor local para pruebas: datos deterministas por símbolo sin red
+
+    Permite simular latencia y fallos para comprobar el enrutado, p. ej.
+    `router.register(FakeProvider("fmp", latency=0.2, errors=[503, 503]))`
+    sustituye a FMP y falla sus dos primeras llamadas.
+    Args:
+        name: Nombre con el que se registra (puede sustituir a uno real)
+        latency: Segundos que tarda cada llamada
+        errors: Códigos de error que devuelven las siguientes llamadas, en orden
+        capabilities: Tipos de dato que sirve (por defecto todos)
+    """
+
+    intervals = frozenset({"daily", "1min", "5min", "15min", "30min", "60min"})
+
+    def __init__(
+        self,
+        name: str,
+        latency: float = 0.0,
+        errors: Optional[List[int]] = None,
+        capabilities: Optional[frozenset] = None
+    ):
+        self.name = name
+        self.latency = latency
+        self.errors = list(errors or [])
+        self.capabilities = capabilities or frozenset({PRICES, RATIOS, INCOME_STATEMENT})
+        self.calls = 0
+
+    async def _respond(self) -> Optional[Dict]:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.errors:
+            code = self.errors.pop(0)
+            return {"error": f"Error simulado de {self.name}", "code": code}
+        return None
+
+    @staticmethod
+    def _seed(symbol: str) -> int:
+        return int(hashlib.sha1(symbol.upper().encode()).hexdigest()[:6], 16)
+
+    async def fetch_prices(self, symbol: str, interval: str, outputsize: str = "compact") -> Dict:
+        error = await self._respond()
+        if error:
+            return error
+        base = 50 + self._seed(symbol) % 200
+        rows = [
+            {"date": f"2023-10-{day:02d}", "open": base + day, "high": base + day + 1,
+             "low": base + day - 1, "close": base + day + 0.5, "volume": 1000 * day}
+            for day in range(2, 7)
+        ]
+        return {**normalize_rows(rows, symbol, "daily"), "interval": interval, "provider": self.name}
+
+    async def fetch_ratios(self, symbol: str, period: str) -> Union[List[Dict], Dict]:
+        error = await self._respond()
+        if error:
+            return error
+        seed = self._seed(symbol)
+        return [{
+            "symbol": symbol.upper(), "date": "2023-09-30", "current_ratio": 1 + seed % 100 / 100,
+            "debt_to_equity": seed % 300 / 100, "roe": seed % 40 / 100, "pe_ratio": 5 + seed % 50
+        }]
+
+    async def fetch_income_statement(self, symbol: str, period: str) -> Union[List[Dict], Dict]:
+        error = await self._respond()
+        if error:
+            return error
+        seed = self._seed(symbol)
+        return [{
+            "symbol": symbol.upper(), "date": "2023-09-30", "revenue": float(seed * 1000),
+            "net_income": float(seed * 100), "pe_ratio": None
+        }]
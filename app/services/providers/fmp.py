@@ -0,0 +1,137 @@
+# app/services/providers/fmp.py
+import httpx
+import logging
+from typing import Dict, List, Union
+from app.config import Config
+from app.ratelimit import rate_limiter, rate_limit_error
+from app.services.clients import connection_error, get_client
+from app.services.providers.base import INCOME_STATEMENT, PRICES, RATIOS, Provider
+from app.timeseries import normalize_rows
+from app.tracing import span
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Intervalos intradía de /historical-chart (la hora se llama '1hour')
+CHART_INTERVALS = {"1min": "1min", "5min": "5min", "15min": "15min", "30min": "30min", "60min": "1hour"}
+
+# Barras que devuelve Alpha Vantage con outputsize=compact (se pide lo mismo)
+COMPACT_BARS = 100
+
+class FMPProvider(Provider):
+    """Ratios, estados de resultados y precios históricos de Financial Modeling Prep"""
+
+    name = "fmp"
+    capabilities = frozenset({PRICES, RATIOS, INCOME_STATEMENT})
+    intervals = frozenset({"daily", *CHART_INTERVALS})
+
+    async def _get(self, path: str, params: Dict[str, Union[str, int]]) -> Union[List, Dict]:
+        """GET respetando el límite de tasa; devuelve el JSON o un diccionario de error"""
+        if not await rate_limiter.acquire("fmp"):
+            return rate_limit_error("Financial Modeling Prep")
+
+        response = await get_client("fmp").get(path, params={**params, "apikey": Config.FMP_API_KEY})
+
+        response.raise_for_status()
+
+        logger.debug("Respuesta recibida de Financial Modeling Prep")
+        with span("parse"):
+            data = response.json()
+
+        # Manejar errores de la API
+        if isinstance(data, dict) and "Error Message" in data:
+            logger.error(f"Error en FMP: {data['Error Message']}")
+            # FMP responde así también al agotar la cuota diaria
+            code = 429 if "limit" in data["Error Message"].lower() else None
+            return {"error": data["Error Message"], **({"code": code} if code else {})}
+        return data
+
+    async def fetch_prices(self, symbol: str, interval: str, outputsize: str = "compact") -> Dict:
+        """Serie OHLCV diaria (/historical-price-full) o intradía (/historical-chart)"""
+        try:
+            logger.info(f"Solicitando precios para {symbol} ({interval}) a Financial Modeling Prep")
+
+            if interval == "daily":
+                params = {"timeseries": COMPACT_BARS} if outputsize == "compact" else {}
+                data = await self._get(f"/api/v3/historical-price-full/{symbol}", params)
+                rows = data.get("historical") if isinstance(data, dict) and "error" not in data else data
+            else:
+                rows = await self._get(f"/api/v3/historical-chart/{CHART_INTERVALS[interval]}/{symbol}", {})
+            if isinstance(rows, dict) and "error" in rows:
+                return rows
+            if not rows:
+                return {"error": f"Sin precios en Financial Modeling Prep para {symbol}", "code": 404}
+
+            with span("normalize"):
+                series = normalize_rows(rows, symbol, interval)
+            if outputsize == "compact" and interval != "daily":
+                series = {key: value[-COMPACT_BARS:] if isinstance(value, list) else value for key, value in series.items()}
+            return {**series, "provider": self.name}
+
+        except httpx.HTTPError as e:
+            logger.error(f"Error de conexión: {str(e)}")
+            return connection_error(e)
+
+        except Exception as e:
+            logger.error(f"Error inesperado: {str(e)}", exc_info=True)
+            return {"error": f"Error interno del servidor: {str(e)}", "code": 500}
+
+    async def fetch_ratios(self, symbol: str, period: str) -> Union[List[Dict], Dict]:
+        try:
+            logger.info(f"Solicitando ratios financieros para {symbol} ({period})")
+
+            data = await self._get(f"/api/v3/ratios/{symbol}", {"period": period})
+            if isinstance(data, dict):
+                return data
+
+            # Transformar datos para que coincidan con el modelo FinancialRatios
+            processed_data = []
+            for item in data:
+                processed_data.append({
+                    "symbol": item.get("symbol"),
+                    "date": item.get("date"),
+                    "current_ratio": item.get("currentRatio"),
+                    "debt_to_equity": item.get("debtEquityRatio"),
+                    "roe": item.get("returnOnEquity"),
+                    "pe_ratio": item.get("priceEarningsRatio")
+                })
+
+            return processed_data
+
+        except httpx.HTTPError as e:
+            logger.error(f"Error de conexión: {str(e)}")
+            return connection_error(e)
+
+        except Exception as e:
+            logger.error(f"Error inesperado: {str(e)}", exc_info=True)
+            return {"error": f"Error interno del servidor: {str(e)}", "code": 500}
+
+    async def fetch_income_statement(self, symbol: str, period: str) -> Union[List[Dict], Dict]:
+        try:
+            logger.info(f"Solicitando estado de resultados para {symbol} ({period})")
+
+            raw_data = await self._get(f"/api/v3/income-statement/{symbol}", {"period": period})
+            if isinstance(raw_data, dict):
+                return raw_data
+
+            # Transformar datos para que coincidan con el modelo
+            processed_data = []
+            for item in raw_data:
+                processed_data.append({
+                    "symbol": item.get("symbol"),
+                    "date": item.get("date"),
+                    "revenue": item.get("revenue"),
+                    "net_income": item.get("netIncome"),  # Mapear netIncome a net_income
+                    "pe_ratio": item.get("peRatio")  # Mapear peRatio a pe_ratio
+                })
+
+            return processed_data
+
+        except httpx.HTTPError as e:
+            logger.error(f"Error de conexión: {str(e)}")
+            return connection_error(e)
+
+        except Exception as e:
+            logger.error(f"Error inesperado: {str(e)}", exc_info=True)
+            return {"error": f"Error interno del servidor: {str(e)}", "code": 500}
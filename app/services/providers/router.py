@@ -0,0 +1,157 @@
+# app/services/providers/router.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from app.config import Config
+from app.metrics import observe_resilience
+from app.ratelimit import rate_limiter
+from app.resilience import is_open
+from app.services.providers.base import FAILOVER_CODES, INCOME_STATEMENT, PRICES, RATIOS, Provider
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Orden de preferencia configurado para cada tipo de dato
+PREFERENCES = {
+    PRICES: "PRICE_PROVIDERS",
+    RATIOS: "RATIOS_PROVIDERS",
+    INCOME_STATEMENT: "INCOME_STATEMENT_PROVIDERS"
+}
+
+class ProviderStats:
+    """
+    Latencia y tasa de errores de un proveedor (medias móviles exponenciales)
+
+    La tasa de errores se va olvidando con el tiempo (PROVIDER_ERROR_HALF_LIFE)
+    para que un proveedor que falló y dejó de usarse vuelva a probarse.
+    """
+
+    __slots__ = ("latency", "error_rate", "updated_at", "calls", "errors")
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.updated_at = time.monotonic()
+        self.calls = 0
+        self.errors = 0
+
+    def current_error_rate(self, now: float) -> float:
+        return self.error_rate * 0.5 ** ((now - self.updated_at) / Config.PROVIDER_ERROR_HALF_LIFE)
+
+    def record(self, seconds: float, failed: bool) -> None:
+        now = time.monotonic()
+        alpha = Config.PROVIDER_STATS_ALPHA
+        self.error_rate = (1 - alpha) * self.current_error_rate(now) + alpha * (1.0 if failed else 0.0)
+        self.updated_at = now
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        else:
+            # Solo las respuestas válidas miden la velocidad (un fallo rápido no es un proveedor rápido)
+            self.latency = seconds if self.latency is None else (1 - alpha) * self.latency + alpha * seconds
+
+    def score(self, now: float) -> float:
+        """Tiempo esperado hasta obtener una respuesta válida (menor es mejor)"""
+        latency = Config.PROVIDER_DEFAULT_LATENCY if self.latency is None else self.latency
+        return latency / max(1.0 - self.current_error_rate(now), 0.05)
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "error_rate": round(self.current_error_rate(now), 3),
+            "calls": self.calls,
+            "errors": self.errors
+        }
+
+class ProviderRouter:
+    """
+    Reparte cada consulta entre los proveedores que sirven ese dato
+
+    Los candidatos se ordenan por: circuito cerrado, cuota disponible sin
+    esperar y menor tiempo esperado por respuesta válida (latencia / (1 -
+    tasa de errores)), con el orden de la configuración como desempate. Si
+    uno falla por causas del proveedor (429, 5xx) se prueba el siguiente;
+    los errores de la petición (símbolo inexistente...) se devuelven tal cual.
+    """
+
+    def __init__(self):
+        self._providers: Dict[str, Provider] = {}
+        self._stats: Dict[str, ProviderStats] = {}
+
+    def register(self, provider: Provider) -> None:
+        self._providers[provider.name] = provider
+
+    def unregister(self, name: str) -> None:
+        self._providers.pop(name, None)
+        self._stats.pop(name, None)
+
+    def providers_for(self, capability: str, interval: Optional[str] = None) -> List[Provider]:
+        """Proveedores registrados que sirven el dato, en el orden configurado"""
+        names = getattr(Config, PREFERENCES[capability])
+        providers = (self._providers.get(name.strip()) for name in names)
+        return [provider for provider in providers if provider is not None and provider.supports(capability, interval)]
+
+    def stats_for(self, name: str) -> ProviderStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = ProviderStats()
+        return stats
+
+    async def candidates(self, capability: str, interval: Optional[str] = None) -> List[Provider]:
+        """Proveedores del dato ordenados del más al menos conveniente"""
+        providers = self.providers_for(capability, interval)
+        if len(providers) < 2:
+            return providers
+
+        quotas = await asyncio.gather(*(rate_limiter.has_quota(provider.name) for provider in providers))
+        now = time.monotonic()
+        ranked = sorted(
+            zip(providers, quotas, range(len(providers))),
+            key=lambda item: (is_open(item[0].name), not item[1], self.stats_for(item[0].name).score(now), item[2])
+        )
+        return [provider for provider, _, _ in ranked]
+
+    async def fetch(self, capability: str, *args, interval: Optional[str] = None, **kwargs) -> Any:
+        """
+        Obtiene un dato del mejor proveedor disponible
+        Args:
+            capability: Tipo de dato (PRICES, RATIOS, INCOME_STATEMENT)
+            *args, **kwargs: Argumentos de `Provider.fetch_<tipo>`
+            interval: Intervalo de precios (filtra los proveedores que lo sirven)
+
+        Returns:
+            Datos en el esquema común o, si todos fallan, el error del primero
+        """
+        providers = await self.candidates(capability, interval)
+        if not providers:
+            return {"error": f"Ningún proveedor configurado sirve {capability} ({interval or 'todos'})", "code": 503}
+
+        errors = []
+        for provider in providers:
+            if errors:
+                observe_resilience(provider.name, "failover")
+                logger.warning(f"Probando {provider.name} para {capability} tras: {errors[-1]['error']}")
+            start = time.perf_counter()
+            fetch = getattr(provider, f"fetch_{capability}")
+            result = await fetch(*args, interval, **kwargs) if interval is not None else await fetch(*args, **kwargs)
+            failed = isinstance(result, dict) and result.get("code") in FAILOVER_CODES
+            self.stats_for(provider.name).record(time.perf_counter() - start, failed)
+            if not failed:
+                return result
+            errors.append(result)
+
+        return errors[0]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Latencia, tasa de errores y orden configurado de cada proveedor por tipo de dato"""
+        now = time.monotonic()
+        return {
+            "providers": {name: self.stats_for(name).to_dict(now) for name in self._providers},
+            "routes": {capability: [provider.name for provider in self.providers_for(capability)] for capability in PREFERENCES}
+        }
+
+    def reset(self) -> None:
+        """Olvida las medidas (los proveedores registrados se mantienen)"""
+        self._stats.clear()
@@ -0,0 +1,169 @@
+# app/snapshot.py
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from app.config import Config
+from app.cache import is_error
+from app.prefetch import prefetcher
+from app.projection import Projection
+from app.services import alpha_vantage, fmp, news, openfigi
+from app.tracing import span
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Estado de cada sección de la ficha
+OK = "ok"
+ERROR = "error"
+PENDING = "pending"
+
+def _instruments(symbol: str, options: Dict[str, Any]) -> Awaitable:
+    return openfigi.search_instrument(symbol, "TICKER", options["market"])
+
+def _prices(symbol: str, options: Dict[str, Any]) -> Awaitable:
+    prefetcher.record("prices", symbol, options["interval"])
+    return alpha_vantage.get_stock_prices(symbol, options["interval"])
+
+def _financials(symbol: str, options: Dict[str, Any]) -> Awaitable:
+    prefetcher.record("financials", symbol, options["period"])
+    return fmp.get_income_statement(symbol, options["period"])
+
+def _ratios(symbol: str, options: Dict[str, Any]) -> Awaitable:
+    prefetcher.record("ratios", symbol, options["period"])
+    return fmp.get_financial_ratios(symbol, options["period"])
+
+def _news(symbol: str, options: Dict[str, Any]) -> Awaitable:
+    prefetcher.record("news", symbol, options["news_limit"], "publishedAt")
+    return news.get_financial_news(symbol, options["news_limit"], "publishedAt")
+
+# Secciones de la ficha y la llamada de servicio (cacheada) que las obtiene
+SECTIONS: Dict[str, Callable[[str, Dict[str, Any]], Awaitable]] = {
+    "instruments": _instruments,
+    "prices": _prices,
+    "financials": _financials,
+    "ratios": _ratios,
+    "news": _news
+}
+
+# Consultas que siguen en curso tras vencer su plazo (terminan de llenar la caché)
+_background: Set[asyncio.Task] = set()
+
+def parse_sections(value: Optional[str]) -> List[str]:
+    """
+    Secciones solicitadas ('prices,news'); todas si no se indica ninguna
+    Raises:
+        ValueError: Si alguna sección no existe
+    """
+    if not value:
+        return list(SECTIONS)
+    sections = list(dict.fromkeys(name.strip().lower() for name in value.split(",") if name.strip()))
+    unknown = [name for name in sections if name not in SECTIONS]
+    if unknown:
+        raise ValueError(f"Secciones no válidas: {', '.join(unknown)}. Usar: {', '.join(SECTIONS)}")
+    return sections
+
+def parse_deadlines(value: Optional[str], sections: List[str], default: float) -> Dict[str, float]:
+    """
+    Plazo de cada sección en segundos: `default` salvo los indicados como
+    'news:0.5,prices:2' (acotados a SNAPSHOT_MAX_DEADLINE)
+    Raises:
+        ValueError: Si el formato o la sección no son válidos
+    """
+    deadlines = {name: default for name in sections}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        name, _, seconds = item.partition(":")
+        name = name.strip().lower()
+        if name not in SECTIONS:
+            raise ValueError(f"Sección no válida en deadlines: {name}")
+        try:
+            deadlines[name] = float(seconds)
+        except ValueError:
+            raise ValueError(f"Plazo no válido para {name}: '{seconds}' (segundos, ej: news:0.5)")
+    return {
+        name: min(max(seconds, 0.0), Config.SNAPSHOT_MAX_DEADLINE)
+        for name, seconds in deadlines.items() if name in sections
+    }
+
+def _section(task: asyncio.Task, projection: Optional[Projection] = None) -> Dict[str, Any]:
+    """Sección terminada: datos (proyectados si se pide) o error del proveedor"""
+    if task.exception() is not None:
+        logger.error(f"Error inesperado en la ficha: {task.exception()}")
+        return {"status": ERROR, "error": f"Error interno: {task.exception()}", "code": 500}
+    result = task.result()
+    if is_error(result):
+        return {"status": ERROR, **result}
+    return {"status": OK, "data": projection.apply(result) if projection is not None else result}
+
+async def _fetch(name: str, symbol: str, options: Dict[str, Any]) -> Any:
+    with span(f"snapshot.{name}"):
+        return await SECTIONS[name](symbol, options)
+
+async def build_snapshot(
+    symbol: str,
+    sections: List[str],
+    deadlines: Dict[str, float],
+    options: Dict[str, Any],
+    projection: Optional[Projection] = None
+) -> Dict[str, Any]:
+    """
+    Consulta en paralelo las secciones de la ficha de un símbolo
+    Args:
+        symbol: Símbolo bursátil (ya normalizado)
+        sections: Secciones solicitadas (claves de SECTIONS)
+        deadlines: Plazo de cada sección (segundos desde el inicio)
+        options: interval, period, market y news_limit de las consultas
+        projection: fields, limit y since aplicados a los datos de cada sección
+
+    Returns:
+        Ficha con cada sección como {"status": "ok", "data": ...}, {"status":
+        "error", "error": ..., "code": ...} o, si no respondió a tiempo,
+        {"status": "pending"}: la consulta sigue en segundo plano y llenará la
+        caché para la siguiente petición. 'complete' indica si están todas.
+    """
+    start = time.monotonic()
+    tasks = {name: asyncio.ensure_future(_fetch(name, symbol, options)) for name in sections}
+    results: Dict[str, Dict[str, Any]] = {}
+
+    pending = set(tasks.values())
+    names = {task: name for name, task in tasks.items()}
+    try:
+        # Un ciclo del bucle basta para que terminen los aciertos de caché en memoria
+        await asyncio.sleep(0)
+        while pending:
+            # Espera hasta que termine alguna o venza el plazo más próximo de las pendientes
+            remaining = min(deadlines[names[task]] for task in pending) - (time.monotonic() - start)
+            if remaining > 0:
+                await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            elapsed = time.monotonic() - start
+            for task in list(pending):
+                if task.done():
+                    results[names[task]] = _section(task, projection)
+                elif deadlines[names[task]] <= elapsed:
+                    results[names[task]] = {"status": PENDING, "retry_after": Config.SNAPSHOT_RETRY_AFTER}
+                else:
+                    continue
+                pending.discard(task)
+    finally:
+        # Las que no respondieron a tiempo (o si el cliente se va) siguen en segundo plano
+        for task in tasks.values():
+            if not task.done() and task not in _background:
+                _background.add(task)
+                task.add_done_callback(_finished_in_background(names[task], symbol))
+
+    return {
+        "symbol": symbol,
+        "complete": all(section["status"] != PENDING for section in results.values()),
+        "elapsed_ms": round((time.monotonic() - start) * 1000, 1),
+        "sections": {name: results[name] for name in sections}
+    }
+
+def _finished_in_background(name: str, symbol: str) -> Callable[[asyncio.Task], None]:
+    def done(task: asyncio.Task) -> None:
+        _background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error obteniendo {name} de {symbol} en segundo plano: {task.exception()}")
+    return done
@@ -0,0 +1,8 @@
+# app/storage/__init__.py
+# Almacenamiento local persistente (SQLite)
+from .base import SQLiteStore
+from .figi_index import FigiIndex, figi_index
+from .price_store import PriceStore, price_store
+from .fundamentals import FundamentalsStore, fundamentals_store
+
+__all__ = ["SQLiteStore", "FigiIndex", "figi_index", "PriceStore", "price_store", "FundamentalsStore", "fundamentals_store"]
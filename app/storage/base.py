@@ -0,0 +1,61 @@
+# app/storage/base.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+class SQLiteStore:
+    """
+    Base de los almacenes locales: conexión SQLite perezosa (creada con su
+    esquema en el primer uso, en modo WAL para que los workers lean a la vez)
+    y transacciones de escritura
+
+    Los servicios llaman a los almacenes con `asyncio.to_thread` para no
+    bloquear el bucle de eventos; la conexión se comparte entre esos hilos y
+    las transacciones se serializan con un lock.
+    """
+
+    schema: str = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA journal_mode=WAL")  # Lectores concurrentes entre workers
+                conn.execute("PRAGMA busy_timeout=5000")
+                conn.executescript(self.schema)
+                self._conn = conn
+            return self._conn
+
+    def open(self, path: str) -> None:
+        """Cambia el fichero del almacén (cierra la conexión actual)"""
+        self.close()
+        self.path = path
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
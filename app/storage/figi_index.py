@@ -0,0 +1,191 @@
+# app/storage/figi_index.py
+import argparse
+import csv
+import json
+import logging
+import sqlite3
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.config import Config
+from app.storage.base import SQLiteStore
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mappings (
+    id_type TEXT NOT NULL,
+    id_value TEXT NOT NULL,
+    exch_code TEXT NOT NULL,
+    figi TEXT NOT NULL,
+    name TEXT,
+    ticker TEXT,
+    market TEXT,
+    security_type TEXT,
+    currency TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (id_type, id_value, exch_code, figi)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mappings_figi ON mappings (figi);
+"""
+
+# Columnas devueltas con la forma del modelo InstrumentInfo
+INSTRUMENT_COLUMNS = ("figi", "name", "ticker", "market", "security_type", "currency")
+
+# Identificadores por consulta en las búsquedas por lotes (3 parámetros cada uno)
+LOOKUP_BATCH = 300
+
+def _normalize(id_type: str, value: str, market: str) -> tuple:
+    return id_type.strip().upper(), value.strip().upper(), market.strip().upper()
+
+class FigiIndex(SQLiteStore):
+    """
+    Índice local persistente de identificadores -> FIGI
+
+    Se alimenta de cada respuesta de OpenFIGI y responde sin salir a red.
+    Política de refresco: una entrada más antigua que FIGI_INDEX_MAX_AGE_DAYS
+    se considera caducada y se vuelve a consultar (y sobrescribir) en
+    OpenFIGI; `refresh=True` fuerza la consulta.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, path: str, max_age_days: float):
+        super().__init__(path)
+        self.max_age = max_age_days * 86400
+
+    def lookup(self, id_type: str, value: str, market: str) -> Optional[List[Dict]]:
+        """
+        Busca un identificador en el índice
+        Returns:
+            Lista de instrumentos, o None si no está o su entrada ha caducado
+        """
+        return self.lookup_many([(id_type, value, market)])[0]
+
+    def lookup_many(self, identifiers: List[Tuple[str, str, str]]) -> List[Optional[List[Dict]]]:
+        """
+        Busca varios identificadores (id_type, valor, mercado) con una consulta
+        por cada LOOKUP_BATCH
+        Returns:
+            Un resultado por identificador, como `lookup`
+        """
+        keys = [_normalize(*identifier) for identifier in identifiers]
+        found: Dict[tuple, List[sqlite3.Row]] = {}
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), LOOKUP_BATCH):
+            batch = unique[i:i + LOOKUP_BATCH]
+            rows = self.conn.execute(
+                "SELECT id_type, id_value, exch_code, figi, name, ticker, market, security_type, currency, updated_at "
+                "FROM mappings WHERE (id_type, id_value, exch_code) IN "
+                f"(VALUES {', '.join(['(?, ?, ?)'] * len(batch))})",
+                [part for key in batch for part in key]
+            ).fetchall()
+            for row in rows:
+                found.setdefault((row["id_type"], row["id_value"], row["exch_code"]), []).append(row)
+
+        threshold = time.time() - self.max_age
+        results = []
+        for key in keys:
+            rows = found.get(key)
+            if not rows or min(row["updated_at"] for row in rows) < threshold:
+                results.append(None)
+            else:
+                results.append([{column: row[column] for column in INSTRUMENT_COLUMNS} for row in rows])
+        return results
+
+    def reverse(self, figi: str) -> List[Dict]:
+        """Devuelve los identificadores conocidos de un FIGI (ticker, ISIN, CUSIP...)"""
+        rows = self.conn.execute(
+            "SELECT id_type, id_value, exch_code, figi, name, ticker, market, security_type, currency "
+            "FROM mappings WHERE figi = ? ORDER BY id_type, id_value",
+            (figi.strip().upper(),)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def store(self, id_type: str, value: str, market: str, instruments: List[Dict]) -> None:
+        """Reemplaza las entradas de un identificador con el resultado de OpenFIGI"""
+        self.store_many([(id_type, value, market, instruments)])
+
+    def store_many(self, entries: List[Tuple[str, str, str, List[Dict]]]) -> None:
+        """Reemplaza las entradas de varios identificadores (id_type, valor, mercado, instrumentos) en una transacción"""
+        keys = [_normalize(id_type, value, market) for id_type, value, market, _ in entries]
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM mappings WHERE id_type = ? AND id_value = ? AND exch_code = ?", keys)
+            conn.executemany(
+                "INSERT OR REPLACE INTO mappings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*key, *(item.get(column) for column in INSTRUMENT_COLUMNS), now)
+                 for key, (*_, instruments) in zip(keys, entries) for item in instruments if item.get("figi")]
+            )
+
+    def delete(self, id_type: str, value: str, market: str) -> None:
+        """Elimina un identificador (fuerza su refresco en la próxima consulta)"""
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM mappings WHERE id_type = ? AND id_value = ? AND exch_code = ?",
+                _normalize(id_type, value, market)
+            )
+
+    def bulk_import(self, rows: Iterable[Dict[str, str]], batch_size: int = 10000) -> int:
+        """
+        Carga masiva de mapeos (columnas: id_type, id_value, exch_code, figi,
+        name, ticker, market, security_type, currency)
+        Returns:
+            Número de filas importadas
+        """
+        now = time.time()
+        total = 0
+        batch = []
+        for row in rows:
+            key = _normalize(row.get("id_type") or "TICKER", row["id_value"], row.get("exch_code") or "US")
+            batch.append((*key, row["figi"].strip().upper(), row.get("name"), row.get("ticker"),
+                          row.get("market") or key[2], row.get("security_type"), row.get("currency"), now))
+            if len(batch) >= batch_size:
+                total += self._insert_batch(batch)
+                batch = []
+        if batch:
+            total += self._insert_batch(batch)
+        logger.info(f"Índice FIGI: {total} mapeos importados")
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        row = self.conn.execute(
+            "SELECT COUNT(*) AS mappings, COUNT(DISTINCT figi) AS figis, "
+            "SUM(updated_at < ?) AS stale FROM mappings",
+            (time.time() - self.max_age,)
+        ).fetchone()
+        return {"mappings": row["mappings"], "figis": row["figis"], "stale": row["stale"] or 0}
+
+    def _insert_batch(self, batch: List[tuple]) -> int:
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO mappings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        return len(batch)
+
+figi_index = FigiIndex(Config.FIGI_INDEX_PATH, Config.FIGI_INDEX_MAX_AGE_DAYS)
+
+def read_rows(path: str) -> Iterator[Dict[str, str]]:
+    """Lee un fichero CSV (con cabecera) o JSON Lines"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(handle)
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestión del índice local de FIGI")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("import", help="Importar mapeos desde CSV o JSON Lines")
+    load.add_argument("path")
+    commands.add_parser("stats", help="Mostrar tamaño del índice")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print(f"{figi_index.bulk_import(read_rows(args.path))} mapeos importados en {figi_index.path}")
+    else:
+        print(figi_index.stats())
+
+if __name__ == "__main__":
+    main()
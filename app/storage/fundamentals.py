@@ -0,0 +1,63 @@
+# app/storage/fundamentals.py
+import logging
+import sqlite3
+import time
+from typing import Dict, List
+from app.config import Config
+from app.storage.base import SQLiteStore
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Columnas numéricas (nombres de los modelos FinancialRatios / FinancialData)
+FUNDAMENTAL_COLUMNS = ("current_ratio", "debt_to_equity", "roe", "pe_ratio", "revenue", "net_income")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fundamentals (
+    symbol TEXT PRIMARY KEY,
+    date TEXT,
+    current_ratio REAL,
+    debt_to_equity REAL,
+    roe REAL,
+    pe_ratio REAL,
+    revenue REAL,
+    net_income REAL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+class FundamentalsStore(SQLiteStore):
+    """Últimos fundamentales conocidos de cada símbolo del universo del screener"""
+
+    schema = SCHEMA
+
+    def upsert(self, rows: List[Dict]) -> int:
+        """Guarda (o sustituye) la fila de cada símbolo"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO fundamentals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row["symbol"].upper(), row.get("date"), *(row.get(column) for column in FUNDAMENTAL_COLUMNS), now)
+                 for row in rows]
+            )
+        return len(rows)
+
+    def load(self) -> List[sqlite3.Row]:
+        """Todas las filas, ordenadas por símbolo"""
+        return self.conn.execute(
+            f"SELECT symbol, date, {', '.join(FUNDAMENTAL_COLUMNS)}, updated_at FROM fundamentals ORDER BY symbol"
+        ).fetchall()
+
+    def last_modified(self) -> float:
+        """Instante de la última actualización (0 si la tabla está vacía)"""
+        return self.conn.execute("SELECT COALESCE(MAX(updated_at), 0) FROM fundamentals").fetchone()[0]
+
+    def stale(self, symbols: List[str], max_age: float, limit: int) -> List[str]:
+        """Símbolos sin datos o más antiguos que `max_age`, los más atrasados primero"""
+        updated = dict(self.conn.execute("SELECT symbol, updated_at FROM fundamentals").fetchall())
+        threshold = time.time() - max_age
+        pending = [symbol for symbol in symbols if updated.get(symbol, 0) < threshold]
+        return sorted(pending, key=lambda symbol: updated.get(symbol, 0))[:limit]
+
+fundamentals_store = FundamentalsStore(Config.FUNDAMENTALS_STORE_PATH)
@@ -0,0 +1,129 @@
+# app/storage/price_store.py
+import logging
+import time
+from typing import Dict, Optional
+from app.config import Config
+from app.storage.base import SQLiteStore
+from app.timeseries import SERIES_FIELDS
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS series (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    timezone TEXT,
+    last_refreshed TEXT,
+    backfilled_at REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (symbol, interval)
+) WITHOUT ROWID;
+"""
+
+class PriceStore(SQLiteStore):
+    """
+    Histórico local de precios por símbolo e intervalo
+
+    Una descarga completa (backfill) por serie y, después, solo se añade la
+    cola que falta. Las barras se deduplican por timestamp (la última versión
+    recibida de una barra sustituye a la anterior).
+    """
+
+    schema = SCHEMA
+
+    def state(self, symbol: str, interval: str) -> Optional[Dict]:
+        """
+        Estado de una serie almacenada
+        Returns:
+            Dict con first_ts, last_ts, bars, backfilled_at, updated_at... o None
+        """
+        row = self.conn.execute(
+            "SELECT s.timezone, s.last_refreshed, s.backfilled_at, s.updated_at, "
+            "MIN(b.ts) AS first_ts, MAX(b.ts) AS last_ts, COUNT(b.ts) AS bars "
+            "FROM series s LEFT JOIN bars b ON b.symbol = s.symbol AND b.interval = s.interval "
+            "WHERE s.symbol = ? AND s.interval = ?",
+            (symbol.upper(), interval)
+        ).fetchone()
+        if row is None or row["updated_at"] is None:
+            return None
+        return dict(row)
+
+    def append(self, series: Dict, backfill: bool = False) -> int:
+        """
+        Guarda una serie columnar (normalizada) deduplicando por timestamp
+        Args:
+            series: Serie de `normalize_alpha_vantage`
+            backfill: True si es la descarga completa del histórico
+
+        Returns:
+            Número de barras escritas
+        """
+        symbol, interval = series["symbol"].upper(), series["interval"]
+        rows = list(zip(
+            [symbol] * len(series["timestamps"]), [interval] * len(series["timestamps"]),
+            series["timestamps"], *(series[field] for field in SERIES_FIELDS)
+        ))
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute(
+                "INSERT INTO series VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (symbol, interval) DO UPDATE SET timezone = excluded.timezone, "
+                "last_refreshed = excluded.last_refreshed, updated_at = excluded.updated_at, "
+                "backfilled_at = COALESCE(excluded.backfilled_at, series.backfilled_at)",
+                (symbol, interval, series.get("timezone"), series.get("last_refreshed"), now if backfill else None, now)
+            )
+        return len(rows)
+
+    def read(self, symbol: str, interval: str, start: Optional[int] = None, end: Optional[int] = None) -> Optional[Dict]:
+        """
+        Lee una serie columnar entre dos timestamps (incluidos)
+        Returns:
+            Serie con la forma de `normalize_alpha_vantage`, o None si no existe
+        """
+        state = self.state(symbol, interval)
+        if state is None:
+            return None
+        rows = self.conn.execute(
+            "SELECT ts, open, high, low, close, volume FROM bars "
+            "WHERE symbol = ? AND interval = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+            (symbol.upper(), interval, start if start is not None else -2 ** 62, end if end is not None else 2 ** 62)
+        ).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * (len(SERIES_FIELDS) + 1)
+        series = {
+            "symbol": symbol.upper(),
+            "interval": interval,
+            "timezone": state["timezone"],
+            "last_refreshed": state["last_refreshed"],
+            "timestamps": list(columns[0])
+        }
+        for index, field in enumerate(SERIES_FIELDS, start=1):
+            series[field] = list(columns[index])
+        return series
+
+    def delete(self, symbol: str, interval: str) -> None:
+        """Elimina una serie (la siguiente consulta hará un backfill completo)"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM bars WHERE symbol = ? AND interval = ?", (symbol.upper(), interval))
+            conn.execute("DELETE FROM series WHERE symbol = ? AND interval = ?", (symbol.upper(), interval))
+
+    def stats(self) -> Dict[str, int]:
+        row = self.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM series) AS series, (SELECT COUNT(*) FROM bars) AS bars"
+        ).fetchone()
+        return {"series": row["series"], "bars": row["bars"]}
+
+price_store = PriceStore(Config.PRICE_STORE_PATH)
@@ -0,0 +1,406 @@
+# app/streaming.py
+import asyncio
+import logging
+import uuid
+from bisect import bisect_left
+from collections import Counter, deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+from fastapi import Request, WebSocket, WebSocketDisconnect
+from redis.exceptions import RedisError
+from app.config import Config
+from app.cache import cache, is_error
+from app.cache.serialization import dumps, loads
+from app.cache.singleflight import LEADER_SCRIPT
+from app.services import alpha_vantage
+from app.timeseries import SERIES_FIELDS
+from app.tracing import detach
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Tema de suscripción: (símbolo, intervalo)
+Topic = Tuple[str, str]
+
+def channel_for(topic: Topic) -> str:
+    return f"stream:prices:{topic[1]}:{topic[0]}"
+
+def bars_message(series: Dict, start: int, kind: str = "bars") -> Dict:
+    """Mensaje columnar con las barras de la serie a partir de la posición `start`"""
+    message = {
+        "type": kind,
+        "symbol": series["symbol"],
+        "interval": series["interval"],
+        "timestamps": series["timestamps"][start:]
+    }
+    for field in SERIES_FIELDS:
+        message[field] = series[field][start:]
+    return message
+
+def last_bar(series: Dict) -> Dict:
+    return {"ts": series["timestamps"][-1], **{field: series[field][-1] for field in SERIES_FIELDS}}
+
+def diff_bars(series: Dict, last: Optional[Dict]) -> Dict:
+    """
+    Barras nuevas o modificadas respecto a la última barra publicada
+    Args:
+        series: Serie columnar actual
+        last: Última barra publicada ({"ts", "open", ...}) o None
+
+    Returns:
+        Mensaje 'bars' (sin barras si no hay cambios; solo la última si no hay referencia)
+    """
+    timestamps = series["timestamps"]
+    if not timestamps:
+        return bars_message(series, 0)
+    if last is None:
+        return bars_message(series, len(timestamps) - 1)
+    start = bisect_left(timestamps, last["ts"])
+    if start < len(timestamps) and timestamps[start] == last["ts"]:
+        # La barra en curso solo se reenvía si ha cambiado
+        if all(series[field][start] == last[field] for field in SERIES_FIELDS):
+            start += 1
+    return bars_message(series, start)
+
+def merge_messages(pending: Dict, message: Dict, max_bars: int) -> Tuple[Dict, int]:
+    """
+    Funde dos mensajes del mismo tema (la versión más nueva de cada barra gana)
+    Returns:
+        Mensaje combinado con como mucho `max_bars` barras y número de barras descartadas
+    """
+    rows = {}
+    for source in (pending, message):
+        for index, ts in enumerate(source["timestamps"]):
+            rows[ts] = [source[field][index] for field in SERIES_FIELDS]
+    timestamps = sorted(rows)
+    dropped = max(len(timestamps) - max_bars, 0)
+    timestamps = timestamps[dropped:]
+    merged = {key: pending[key] for key in ("type", "symbol", "interval")}
+    merged["timestamps"] = timestamps
+    for index, field in enumerate(SERIES_FIELDS):
+        merged[field] = [rows[ts][index] for ts in timestamps]
+    return merged, dropped
+
+class Subscriber:
+    """
+    Cola de un cliente con conflación por tema
+
+    Si el cliente no consume a tiempo, las actualizaciones pendientes de un
+    mismo símbolo se funden en un único mensaje (acotado a
+    STREAM_MAX_PENDING_BARS barras), de modo que un cliente lento nunca
+    retiene memoria sin límite ni frena a los demás.
+    """
+
+    def __init__(self, max_bars: Optional[int] = None):
+        self.max_bars = max_bars or Config.STREAM_MAX_PENDING_BARS
+        self.topics: Set[Topic] = set()
+        self.pending: Dict[Topic, Dict] = {}
+        self.notices: Deque[Dict] = deque(maxlen=10)
+        self.counters: Counter = Counter()
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def push(self, message: Dict) -> None:
+        """Encola un mensaje de barras (no bloquea nunca)"""
+        topic = (message["symbol"], message["interval"])
+        current = self.pending.get(topic)
+        if current is None:
+            self.pending[topic] = message
+        else:
+            self.pending[topic], dropped = merge_messages(current, message, self.max_bars)
+            self.counters["conflated"] += 1
+            self.counters["dropped_bars"] += dropped
+        self._ready.set()
+
+    def notify(self, message: Dict) -> None:
+        """Mensaje de control (errores, confirmaciones) fuera de la conflación"""
+        self.notices.append(message)
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def next(self, timeout: float) -> List[Dict]:
+        """Espera mensajes hasta `timeout` segundos (lista vacía si no llega ninguno)"""
+        if not self.pending and not self.notices and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        messages = list(self.notices) + list(self.pending.values())
+        self.notices.clear()
+        self.pending.clear()
+        return messages
+
+class PriceStream:
+    """
+    Difusión de actualizaciones de precios a los clientes suscritos
+
+    Por cada símbolo suscrito en cualquier worker, un único worker (lease en
+    Redis) consulta el proveedor cada STREAM_POLL_INTERVAL segundos, compara
+    con la última barra publicada y publica solo las diferencias en Redis
+    pub/sub; cada worker las reparte a sus clientes. Sin Redis, cada worker
+    consulta y reparte por su cuenta.
+    """
+
+    def __init__(self):
+        self.topics: Dict[Topic, Set[Subscriber]] = {}
+        self.counters: Counter = Counter()
+        self._last: Dict[Topic, Dict] = {}
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._worker_id = uuid.uuid4().hex
+
+    def validate(self, symbols: List[str], interval: str, current: int = 0) -> Optional[Dict]:
+        """Error de suscripción o None si es válida"""
+        if interval not in alpha_vantage.FUNCTION_MAP:
+            return {"error": f"Intervalo no válido: {interval}", "code": 400}
+        if not symbols:
+            return {"error": "Debe indicar al menos un símbolo", "code": 400}
+        if current + len(symbols) > Config.STREAM_MAX_SYMBOLS:
+            return {"error": f"Máximo {Config.STREAM_MAX_SYMBOLS} símbolos por conexión", "code": 413}
+        return None
+
+    async def subscribe(self, subscriber: Subscriber, symbols: List[str], interval: str) -> Optional[Dict]:
+        """
+        Suscribe un cliente y le envía las últimas barras de cada símbolo
+        Returns:
+            Diccionario de error o None
+        """
+        topics = [(symbol, interval) for symbol in symbols if (symbol, interval) not in subscriber.topics]
+        added = [symbol for symbol, _ in topics]
+        # Solo cuentan para el límite los símbolos que el cliente aún no tiene
+        error = self.validate(added, interval, len(subscriber.topics)) if added else self.validate(symbols, interval)
+        if error:
+            return error
+        for topic in topics:
+            if topic not in self.topics:
+                self.topics[topic] = set()
+                await self._listen_to(topic)
+            self.topics[topic].add(subscriber)
+            subscriber.topics.add(topic)
+        self._ensure_poller()
+        await asyncio.gather(*(self._send_snapshot(subscriber, topic) for topic in topics))
+        return None
+
+    async def unsubscribe(self, subscriber: Subscriber, topics: Optional[List[Topic]] = None) -> None:
+        """Da de baja al cliente de los temas indicados (todos por defecto)"""
+        for topic in list(subscriber.topics if topics is None else topics):
+            subscriber.topics.discard(topic)
+            subscribers = self.topics.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.topics[topic]
+                if self._pubsub is not None:
+                    try:
+                        await self._pubsub.unsubscribe(channel_for(topic))
+                    except (RedisError, OSError) as e:
+                        logger.warning(f"Streaming: no se pudo cancelar la suscripción a {topic}: {str(e)}")
+
+    async def _send_snapshot(self, subscriber: Subscriber, topic: Topic) -> None:
+        prices = await alpha_vantage.get_stock_prices(*topic)
+        if is_error(prices):
+            subscriber.notify({"type": "error", "symbol": topic[0], **prices})
+            return
+        start = max(len(prices["timestamps"]) - Config.STREAM_SNAPSHOT_BARS, 0)
+        subscriber.push(bars_message(prices, start, "snapshot"))
+
+    def dispatch(self, message: Dict) -> None:
+        """Reparte un mensaje a los clientes del worker suscritos a su tema"""
+        for subscriber in list(self.topics.get((message["symbol"], message["interval"]), ())):
+            subscriber.push(message)
+            self.counters["delivered"] += 1
+
+    async def publish(self, message: Dict) -> None:
+        """Publica en Redis (o reparte localmente si Redis no responde)"""
+        try:
+            await cache.redis_client.publish(channel_for((message["symbol"], message["interval"])), dumps(message))
+        except (RedisError, OSError) as e:
+            logger.warning(f"Streaming: Redis no disponible, difusión local: {str(e)}")
+            self.dispatch(message)
+        self.counters["published"] += 1
+
+    async def _listen_to(self, topic: Topic) -> None:
+        try:
+            if self._pubsub is None:
+                self._pubsub = cache.redis_client.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(channel_for(topic))
+        except (RedisError, OSError) as e:
+            logger.warning(f"Streaming: no se pudo suscribir a {topic} en Redis: {str(e)}")
+            return
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        detach()
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except (RedisError, OSError) as e:
+                logger.warning(f"Streaming: error leyendo de Redis pub/sub: {str(e)}")
+                await asyncio.sleep(1)
+                continue
+            if message and message.get("type") == "message":
+                self.dispatch(loads(message["data"]))
+
+    async def _holds_lease(self, topic: Topic) -> bool:
+        """Lease de consulta de un tema (si Redis no responde, consulta cada worker)"""
+        try:
+            return bool(await cache.redis_client.eval(
+                LEADER_SCRIPT, 1, f"lease:stream:{topic[1]}:{topic[0]}", self._worker_id,
+                int(Config.STREAM_POLL_INTERVAL * 2000)
+            ))
+        except (RedisError, OSError):
+            return True
+
+    async def _last_published(self, topic: Topic) -> Optional[Dict]:
+        try:
+            payload = await cache.redis_client.get(f"stream:last:{topic[1]}:{topic[0]}")
+        except (RedisError, OSError):
+            return self._last.get(topic)
+        return loads(payload) if payload is not None else self._last.get(topic)
+
+    async def _save_published(self, topic: Topic, bar: Dict) -> None:
+        self._last[topic] = bar
+        try:
+            await cache.redis_client.set(f"stream:last:{topic[1]}:{topic[0]}", dumps(bar), ex=86400)
+        except (RedisError, OSError):
+            pass
+
+    async def poll(self, topic: Topic) -> int:
+        """
+        Consulta un tema y publica las barras nuevas o modificadas
+        Returns:
+            Número de barras publicadas
+        """
+        prices = await alpha_vantage.get_stock_prices(*topic)
+        if is_error(prices):
+            self.counters["poll_errors"] += 1
+            logger.warning(f"Streaming: error consultando {topic}: {prices['error']}")
+            return 0
+        delta = diff_bars(prices, await self._last_published(topic))
+        if not delta["timestamps"]:
+            return 0
+        await self._save_published(topic, last_bar(prices))
+        await self.publish(delta)
+        return len(delta["timestamps"])
+
+    async def run_cycle(self) -> None:
+        """Consulta los temas con suscriptores cuyo lease tiene este worker"""
+        topics = [topic for topic in list(self.topics) if await self._holds_lease(topic)]
+        await asyncio.gather(*(self.poll(topic) for topic in topics))
+
+    async def _run(self) -> None:
+        detach()
+        while True:
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.error(f"Error en el streaming de precios: {str(e)}", exc_info=True)
+            await asyncio.sleep(Config.STREAM_POLL_INTERVAL)
+
+    def _ensure_poller(self) -> None:
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._run())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "topics": len(self.topics),
+            "subscribers": len({id(s) for subscribers in self.topics.values() for s in subscribers}),
+            "published": self.counters["published"],
+            "delivered": self.counters["delivered"],
+            "poll_errors": self.counters["poll_errors"]
+        }
+
+    async def stop(self) -> None:
+        """Detiene las tareas en segundo plano y cierra la conexión de pub/sub"""
+        for task in (self._poller, self._listener):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._poller = self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except (RedisError, OSError):
+                pass
+            self._pubsub = None
+        self.topics.clear()
+
+price_stream = PriceStream()
+
+async def _read_commands(websocket: WebSocket, subscriber: Subscriber) -> None:
+    """Órdenes del cliente: {"action": "subscribe"|"unsubscribe", "symbols": [...], "interval": "1min"}"""
+    try:
+        while True:
+            try:
+                command = loads(await websocket.receive_text())
+                action, interval = command.get("action"), command.get("interval", "1min")
+                requested = command.get("symbols", [])
+                if not isinstance(requested, list):
+                    raise ValueError("symbols debe ser una lista")
+                symbols = list(dict.fromkeys(str(s).strip().upper() for s in requested if str(s).strip()))
+            except (ValueError, AttributeError):
+                subscriber.notify({"type": "error", "error": "Orden no válida", "code": 400})
+                continue
+            if action == "subscribe":
+                error = await price_stream.subscribe(subscriber, symbols, interval)
+            elif action == "unsubscribe":
+                await price_stream.unsubscribe(subscriber, [(symbol, interval) for symbol in symbols])
+                error = None
+            else:
+                error = {"error": f"Acción no soportada: {action}", "code": 400}
+            subscriber.notify({"type": "error", **error} if error else {
+                "type": action, "symbols": sorted(symbol for symbol, _ in subscriber.topics)
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscriber.close()
+
+async def websocket_session(websocket: WebSocket, symbols: List[str], interval: str) -> None:
+    """Atiende una conexión WebSocket hasta que el cliente se desconecta"""
+    await websocket.accept()
+    subscriber = Subscriber()
+    reader = asyncio.create_task(_read_commands(websocket, subscriber))
+    try:
+        if symbols:
+            error = await price_stream.subscribe(subscriber, symbols, interval)
+            if error:
+                subscriber.notify({"type": "error", **error})
+        while not subscriber.closed:
+            messages = await subscriber.next(Config.STREAM_HEARTBEAT)
+            if subscriber.closed:
+                break
+            for message in messages or [{"type": "heartbeat"}]:
+                await websocket.send_text(dumps(message).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        await price_stream.unsubscribe(subscriber)
+
+async def sse_events(request: Request, symbols: List[str], interval: str) -> AsyncIterator[bytes]:
+    """Eventos Server-Sent Events ('snapshot', 'bars') para una suscripción fija"""
+    subscriber = Subscriber()
+    try:
+        error = await price_stream.subscribe(subscriber, symbols, interval)
+        if error:
+            yield b"event: error\ndata: " + dumps(error) + b"\n\n"
+            return
+        while not await request.is_disconnected():
+            messages = await subscriber.next(Config.STREAM_HEARTBEAT)
+            if not messages:
+                yield b": heartbeat\n\n"
+            for message in messages:
+                yield b"event: " + message["type"].encode() + b"\ndata: " + dumps(message) + b"\n\n"
+    finally:
+        await price_stream.unsubscribe(subscriber)
@@ -0,0 +1,42 @@
+# app/tests/conftest.py
+import pytest
+from fakeredis import aioredis
+from app.cache import cache
+from app.ratelimit import rate_limiter
+from app.resilience import reset_breakers
+from app.services.providers import AlphaVantageProvider, FakeProvider, FMPProvider, router
+from app.storage import figi_index, price_store, fundamentals_store
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """Sustituye Redis por fakeredis (vacío en cada prueba, con los circuitos cerrados y sin medidas de proveedores)"""
+    client = aioredis.FakeRedis()
+    monkeypatch.setattr(cache, "redis_client", client)
+    cache.reset()
+    rate_limiter.reset()
+    reset_breakers()
+    router.reset()
+    return client
+
+
+@pytest.fixture
+def fake_providers():
+    """Sustituye Alpha Vantage y FMP por proveedores locales (y los restaura al terminar)"""
+    providers = {"alpha_vantage": FakeProvider("alpha_vantage"), "fmp": FakeProvider("fmp")}
+    for provider in providers.values():
+        router.register(provider)
+    yield providers
+    router.register(AlphaVantageProvider())
+    router.register(FMPProvider())
+
+
+@pytest.fixture(autouse=True)
+def local_storage(tmp_path):
+    """Almacenamiento SQLite aislado en un directorio temporal por prueba"""
+    figi_index.open(str(tmp_path / "figi_index.sqlite3"))
+    price_store.open(str(tmp_path / "prices.sqlite3"))
+    fundamentals_store.open(str(tmp_path / "fundamentals.sqlite3"))
+    yield tmp_path
+    figi_index.close()
+    price_store.close()
+    fundamentals_store.close()
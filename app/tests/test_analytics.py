@@ -0,0 +1,116 @@
+# app/tests/test_analytics.py
+import numpy as np
+import pytest
+from app.analytics import parse_interval, resample, source_interval
+from app.analytics.indicators import IndicatorMemo, compute, ema, parse_indicators
+from app.timeseries import to_arrays
+
+def make_series(interval, timestamps, closes, timezone="US/Eastern"):
+    return {
+        "symbol": "AAPL",
+        "interval": interval,
+        "timezone": timezone,
+        "last_refreshed": None,
+        "timestamps": timestamps,
+        "open": [close - 1 for close in closes],
+        "high": [close + 1 for close in closes],
+        "low": [close - 2 for close in closes],
+        "close": closes,
+        "volume": [10] * len(closes)
+    }
+
+def test_source_interval_for_targets():
+    """Cada intervalo destino se construye desde la serie nativa más gruesa compatible"""
+    assert source_interval("4h") == "60min"
+    assert source_interval("90min") == "30min"
+    assert source_interval("weekly") == "daily"
+    assert parse_interval("monthly") == ("mo", 1)
+    with pytest.raises(ValueError):
+        parse_interval("2 semanas")
+
+def test_weekly_bars_from_daily():
+    """Semanas de lunes a domingo: open primero, high máximo, low mínimo, close último, volumen sumado"""
+    day = 86400
+    monday = 1696204800  # 2023-10-02
+    series = make_series("daily", [monday + i * day for i in (0, 1, 4, 7, 8)], [10.0, 12.0, 11.0, 20.0, 21.0])
+
+    weekly = resample(series, "weekly")
+
+    assert weekly["timestamps"] == [monday, monday + 7 * day]
+    assert weekly["open"] == [9.0, 19.0]
+    assert weekly["high"] == [13.0, 22.0]
+    assert weekly["low"] == [8.0, 18.0]
+    assert weekly["close"] == [11.0, 21.0]
+    assert weekly["volume"] == [30, 20]
+    assert weekly["source_interval"] == "daily"
+
+def test_intraday_bars_align_to_market_time():
+    """Las barras de 4h se alinean con la hora local del mercado, no con UTC"""
+    start = 1696521600  # 2023-10-05 12:00 EDT (16:00 UTC)
+    hourly = make_series("60min", [start + i * 3600 for i in range(8)], [float(i) for i in range(8)])
+
+    bars = resample(hourly, "4h")
+
+    assert bars["timestamps"] == [start, start + 4 * 3600]
+    assert bars["close"] == [3.0, 7.0]
+
+def reference_ema(values, alpha):
+    """EMA recursiva de referencia (bucle simple)"""
+    out, prev = [], values[0]
+    for value in values:
+        prev = alpha * value + (1 - alpha) * prev
+        out.append(prev)
+    return out
+
+def random_series(size, seed=1):
+    rng = np.random.default_rng(seed)
+    closes = list(100 * np.exp(np.cumsum(rng.normal(0, 0.02, size))))
+    return make_series("daily", [1696204800 + i * 86400 for i in range(size)], closes)
+
+def test_blockwise_ema_matches_recursion():
+    """La EMA por bloques coincide con la recurrencia, también con alpha alto y series largas"""
+    values = np.random.default_rng(0).normal(100, 5, 3000)
+    for alpha in (2 / 201, 2 / 13, 0.9):
+        assert np.allclose(ema(values, alpha), reference_ema(values, alpha))
+
+def test_indicator_values():
+    """SMA, RSI y Bollinger sobre una serie conocida"""
+    series = make_series("daily", list(range(0, 86400 * 6, 86400)), [1.0, 2.0, 3.0, 2.0, 3.0, 4.0])
+    columns = compute(parse_indicators("sma:3,rsi:2,bbands:3:2"), to_arrays(series))
+
+    assert np.isnan(columns["sma_3"][1]) and columns["sma_3"][2] == 2.0
+    assert columns["bbands_3_2_upper"][2] == pytest.approx(2 + 2 * np.std([1, 2, 3]))
+    assert np.isnan(columns["rsi_2"][1]) and 0 < columns["rsi_2"][3] < 100
+
+def test_incremental_update_matches_full_recomputation():
+    """Con barras nuevas solo se calcula la cola y el resultado coincide con el cálculo completo"""
+    indicators = parse_indicators("sma:20,ema:12,rsi:14,macd,bbands:20:2,atr:14,volatility:10")
+    full = random_series(300)
+    memo = IndicatorMemo(10)
+
+    # La historia local crece con barras nuevas y la última memorizada se revisa
+    first = {name: (value[:250] if isinstance(value, list) else value) for name, value in full.items()}
+    first["close"] = first["close"][:-1] + [first["close"][-1] * 1.01]
+    memo.get(first, indicators)
+    result = memo.get(full, indicators)
+    memo.get(full, indicators)
+
+    expected = compute(indicators, to_arrays(full))
+    assert memo.counters == {"hits": 1, "incremental": 1, "full": 1}
+    for name, column in result.items():
+        assert np.allclose(column, expected[name], equal_nan=True), name
+
+def test_range_does_not_reuse_longer_history():
+    """Un rango da lo mismo con la memoria vacía que tras pedir la historia completa"""
+    indicators = parse_indicators("sma:20")
+    full = make_series("daily", [1696118400 + day * 86400 for day in range(60)], [float(day) for day in range(60)])
+    window = {name: (value[40:] if isinstance(value, list) else value) for name, value in full.items()}
+
+    fresh = IndicatorMemo(10).get(window, indicators)
+    memo = IndicatorMemo(10)
+    memo.get(full, indicators)
+    after_full = memo.get(window, indicators)
+
+    assert np.isnan(fresh["sma_20"][:19]).all() and fresh["sma_20"][19] == 49.5
+    assert np.array_equal(after_full["sma_20"], fresh["sma_20"], equal_nan=True)
+    assert memo.counters["full"] == 2
@@ -0,0 +1,218 @@
+# app/tests/test_cache.py
+import asyncio
+from datetime import datetime, timezone
+import httpx
+from respx import MockRouter
+from app.cache import build_key, cache, etag_for, ttl_for, FUNDAMENTALS, PRICES_DAILY
+from app.cache.keys import modified_key
+from app.cache.serialization import dumps
+from app.cache.ttl import seconds_until_next_close
+from app.cache.validators import modified_record
+from app.services import alpha_vantage, fmp
+
+MOCK_RATIOS_RESPONSE = [{
+    "symbol": "AAPL",
+    "date": "2022-09-24",
+    "currentRatio": 0.88,
+    "debtEquityRatio": 2.37,
+    "returnOnEquity": 1.97,
+    "priceEarningsRatio": 24.4
+}]
+
+def test_build_key_normalizes_arguments():
+    """Variantes equivalentes de argumentos comparten clave"""
+    assert build_key("fmp", "ratios", {"symbol": " aapl ", "period": "annual"}) == \
+        build_key("fmp", "ratios", {"period": "annual", "symbol": "AAPL"})
+    assert build_key("fmp", "ratios", {"symbol": "AAPL"}) != build_key("fmp", "income_statement", {"symbol": "AAPL"})
+
+def test_cache_key_uses_defaults():
+    """Argumentos por defecto y explícitos producen la misma clave"""
+    assert alpha_vantage.get_stock_prices.cache_key("AAPL") == \
+        alpha_vantage.get_stock_prices.cache_key(symbol="aapl", interval="daily")
+
+def test_read_through_cache(respx_mock: MockRouter, fake_redis):
+    """La segunda llamada se sirve desde Redis sin ir al proveedor"""
+    route = respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        return_value=httpx.Response(200, json=MOCK_RATIOS_RESPONSE)
+    )
+
+    async def scenario():
+        first = await fmp.get_financial_ratios("AAPL")
+        second = await fmp.get_financial_ratios("AAPL", "annual")
+        ttl = await fake_redis.ttl(fmp.get_financial_ratios.cache_key("AAPL"))
+        return first, second, ttl
+
+    first, second, ttl = asyncio.run(scenario())
+
+    assert route.call_count == 1
+    assert first == second
+    assert second[0]["current_ratio"] == 0.88
+    assert ttl > 0
+
+def test_errors_are_not_cached(respx_mock: MockRouter, fake_redis):
+    """Las respuestas de error no se almacenan"""
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        return_value=httpx.Response(500)
+    )
+
+    async def scenario():
+        result = await fmp.get_financial_ratios("AAPL")
+        stored = await fake_redis.get(fmp.get_financial_ratios.cache_key("AAPL"))
+        return result, stored
+
+    result, stored = asyncio.run(scenario())
+
+    assert "error" in result
+    assert stored is None
+
+def test_daily_ttl_expires_after_next_close():
+    """Las series diarias caducan tras el siguiente cierre (saltando el fin de semana)"""
+    friday_after_close = datetime(2023, 10, 6, 21, 0, tzinfo=timezone.utc)  # 17:00 en Nueva York
+    ttl = seconds_until_next_close(friday_after_close)
+
+    assert ttl == (2 * 24 + 23) * 3600 + 30 * 60  # Hasta el lunes 16:30
+    assert ttl_for(PRICES_DAILY) > 0
+
+def test_memory_tier_serves_repeated_calls(respx_mock: MockRouter, fake_redis):
+    """Las llamadas repetidas se sirven desde L1 sin consultar Redis"""
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        return_value=httpx.Response(200, json=MOCK_RATIOS_RESPONSE)
+    )
+
+    async def scenario():
+        for _ in range(3):
+            await fmp.get_financial_ratios("AAPL")
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+
+    assert stats["l1"]["misses"] == 1
+    assert stats["l1"]["hits"] == 2
+    assert stats["l2"]["misses"] == 1
+    assert stats["l2"]["hits"] == 0
+
+def test_stale_entry_served_while_refreshing(respx_mock: MockRouter, monkeypatch):
+    """Una entrada caducada se sirve mientras una única tarea la refresca"""
+    route = respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        side_effect=[
+            httpx.Response(200, json=MOCK_RATIOS_RESPONSE),
+            httpx.Response(200, json=[dict(MOCK_RATIOS_RESPONSE[0], currentRatio=0.95)])
+        ]
+    )
+    monkeypatch.setattr("app.config.Config.CACHE_L1_TTL", 0)
+    monkeypatch.setattr("app.config.Config.CACHE_STALE_TTL", 60)
+
+    async def scenario():
+        await fmp.get_financial_ratios("AAPL")
+        await cache.redis_client.flushall()  # Simula la expiración en L2
+        stale = await asyncio.gather(*(fmp.get_financial_ratios("AAPL") for _ in range(5)))
+        await asyncio.sleep(0.05)  # Deja terminar el refresco en segundo plano
+        return stale
+
+    stale = asyncio.run(scenario())
+
+    assert all(result[0]["current_ratio"] == 0.88 for result in stale)
+    assert route.call_count == 2
+    assert cache.stats()["refreshes"]["started"] == 1
+
+def test_memory_cache_evicts_least_recently_used():
+    """El nivel L1 respeta el límite de entradas y bytes"""
+    from app.cache.memory import MemoryCache
+
+    memory = MemoryCache(max_entries=2, max_bytes=100)
+    memory.set("a", 1, size=10, ttl=60)
+    memory.set("b", 2, size=10, ttl=60)
+    memory.get("a")
+    memory.set("c", 3, size=10, ttl=60)
+
+    assert memory.get("b") is None
+    assert memory.get("a").value == 1
+    memory.set("d", 4, size=95, ttl=60)
+    assert len(memory) == 1 and memory.size_bytes == 95
+
+def test_concurrent_identical_calls_share_one_fetch(respx_mock: MockRouter):
+    """Las llamadas idénticas simultáneas comparten una sola petición al proveedor"""
+    route = respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        return_value=httpx.Response(200, json=MOCK_RATIOS_RESPONSE)
+    )
+
+    async def scenario():
+        return await asyncio.gather(*(fmp.get_financial_ratios("AAPL") for _ in range(50)))
+
+    results = asyncio.run(scenario())
+
+    assert route.call_count == 1
+    assert all(result == results[0] for result in results)
+    assert cache.stats()["singleflight"]["local_deduplicated"] == 49
+
+def test_waits_for_lease_held_by_other_worker(respx_mock: MockRouter, fake_redis):
+    """Si otro worker tiene el lease, se espera a su resultado en Redis (con su TTL restante y Last-Modified)"""
+    route = respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        return_value=httpx.Response(200, json=MOCK_RATIOS_RESPONSE)
+    )
+    key = fmp.get_financial_ratios.cache_key("AAPL")
+    published = [dict(MOCK_RATIOS_RESPONSE[0], symbol="AAPL", current_ratio=1.5)]
+
+    async def other_worker():
+        await fake_redis.set(f"lease:{key}", "otro-worker", px=5000)
+        await asyncio.sleep(0.1)
+        await fake_redis.set(modified_key(key), modified_record(etag_for(dumps(published)), 1600000000))
+        await cache.set(key, published, ttl=60)
+        await fake_redis.delete(f"lease:{key}")
+
+    async def scenario():
+        leader = asyncio.create_task(other_worker())
+        await asyncio.sleep(0.01)
+        result = await fmp.get_financial_ratios("AAPL")
+        await leader
+        return result
+
+    result = asyncio.run(scenario())
+
+    assert result == published
+    assert route.call_count == 0
+    assert cache.stats()["singleflight"]["remote_deduplicated"] == 1
+    _, last_modified, max_age = cache.validators_for(key, result, ttl_for(FUNDAMENTALS))
+    assert last_modified == 1600000000 and 55 < max_age <= 60
+
+def test_get_many_revalidates_expired_entries(monkeypatch, fake_redis):
+    """Las lecturas por lotes no sirven de L1 entradas caducadas: las revalidan en L2 con su TTL restante"""
+    monkeypatch.setattr("app.config.Config.CACHE_L1_TTL", 0)
+    monkeypatch.setattr("app.config.Config.CACHE_STALE_TTL", 60)
+    key = build_key("test", "batch", {"symbol": "AAPL"})
+
+    async def scenario():
+        await cache.set_many({key: ["old"]}, ttl=60)
+        await fake_redis.set(key, dumps(["new"]), ex=100)
+        await fake_redis.set(modified_key(key), modified_record(etag_for(dumps(["new"])), 1600000000))
+        revalidated, = await cache.get_many([key])
+        await fake_redis.flushall()
+        gone, = await cache.get_many([key])
+        return revalidated, gone
+
+    revalidated, gone = asyncio.run(scenario())
+    etag, last_modified, max_age = cache.validators_for(key, revalidated, 0)
+
+    assert revalidated == ["new"] and gone is None
+    assert last_modified == 1600000000 and 95 < max_age <= 100
+    assert cache.stats()["l1"]["stale_hits"] == 2 and cache.stats()["l1"]["hits"] == 0
+
+def test_fast_path_reuses_serialized_payload(respx_mock: MockRouter, monkeypatch):
+    """Con respuestas rápidas, los aciertos devuelven el JSON guardado sin volver a serializar"""
+    from app.cache.serialization import loads
+    from app.config import Config
+    monkeypatch.setattr(Config, "FAST_JSON_RESPONSES", True)
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        return_value=httpx.Response(200, json=MOCK_RATIOS_RESPONSE)
+    )
+
+    async def scenario():
+        first = await fmp.get_financial_ratios.raw("AAPL")
+        second = await fmp.get_financial_ratios.raw("AAPL")
+        return first, second
+
+    (value, payload), (_, cached_payload) = asyncio.run(scenario())
+
+    assert loads(payload) == value
+    assert cached_payload is payload
+    assert cache.stats()["l1"]["payload_reuses"] == 2
@@ -0,0 +1,84 @@
+# app/tests/test_conditional.py
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+import httpx
+import pytest
+from app.cache import cache, etag_for, last_modified_for
+from app.cache.keys import modified_key
+from app.cache.serialization import dumps
+from app.cache.validators import modified_record
+from app.config import Config
+from app.main import app
+from app.services import fmp
+
+def get(*requests):
+    """Ejecuta varias peticiones GET (url, cabeceras) contra la aplicación, en orden"""
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+            return [await client.get(url, headers=headers) for url, headers in requests]
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("fast_json", [False, True])
+def test_etag_and_not_modified(fake_providers, monkeypatch, fast_json):
+    """Las respuestas llevan ETag, Last-Modified y Cache-Control; si el cliente ya tiene la versión, 304"""
+    monkeypatch.setattr(Config, "FAST_JSON_RESPONSES", fast_json)
+    url = "/financials/ratios?symbol=AAPL"
+    first, = get((url, {}))
+    etag = first.headers["etag"]
+
+    revalidated, modified_since, projected, other = get(
+        (url, {"If-None-Match": f'W/"other", {etag}'}),
+        (url, {"If-Modified-Since": first.headers["last-modified"]}),
+        (url + "&fields=roe", {"If-None-Match": etag}),
+        ("/financials/ratios?symbol=MSFT", {"If-None-Match": etag})
+    )
+
+    assert first.status_code == 200
+    max_age = int(first.headers["cache-control"].removeprefix("public, max-age="))
+    assert Config.CACHE_TTL_FUNDAMENTALS - 5 <= max_age <= Config.CACHE_TTL_FUNDAMENTALS
+    # Sin 'last_refreshed' del proveedor, Last-Modified es cuando se guardó el dato
+    assert abs(parsedate_to_datetime(first.headers["last-modified"]).timestamp() - time.time()) < 5
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    assert modified_since.status_code == 304
+    # Cada proyección es otra representación, con su propio ETag
+    assert projected.status_code == 200 and projected.headers["etag"] != etag
+    assert other.status_code == 200
+
+def test_last_modified_from_upstream_refresh():
+    """Last-Modified del proveedor solo sale del 'Last Refreshed' de la serie"""
+    intraday = {"last_refreshed": "2023-10-05 16:00:00", "timezone": "US/Eastern", "timestamps": []}
+    daily = {"last_refreshed": "2023-10-05", "timezone": "US/Eastern", "timestamps": []}
+    news = {"articles": [{"published_at": "2023-10-05T10:00:00Z"}]}
+
+    assert last_modified_for(intraday) == 1696536000  # 20:00 UTC (EDT)
+    assert last_modified_for(daily) == 1696464000
+    # La fecha de un periodo o de una noticia no dice cuándo cambió la respuesta
+    assert last_modified_for([{"date": "2023-09-30"}]) is None
+    assert last_modified_for(news) is None
+
+def test_last_modified_and_max_age_follow_the_cache_entry(fake_providers, fake_redis):
+    """max-age es el TTL restante en L2; Last-Modified solo avanza si cambia el contenido"""
+    url = "/financials/ratios?symbol=AAPL"
+    key = fmp.get_financial_ratios.cache_key("AAPL", "annual")
+    ratios = asyncio.run(fmp.get_financial_ratios("AAPL", "annual"))
+    etag = etag_for(dumps(ratios))
+
+    async def age(record: str):
+        await fake_redis.set(modified_key(key), record)
+        await fake_redis.expire(key, 100)
+        cache.reset()  # La siguiente petición lee de L2
+    asyncio.run(age(modified_record(etag, 1600000000)))
+    from_l2, = get((url, {}))
+    refreshed = asyncio.run(fmp.get_financial_ratios.refresh("AAPL", "annual"))
+    unchanged, = get((url, {}))
+    asyncio.run(age(modified_record("otro", 1600000000)))
+    asyncio.run(fmp.get_financial_ratios.refresh("AAPL", "annual"))
+    changed, = get((url, {}))
+
+    assert from_l2.headers["cache-control"] in ("public, max-age=99", "public, max-age=100")
+    assert from_l2.headers["last-modified"] == "Sun, 13 Sep 2020 12:26:40 GMT"
+    # Un refresco con el mismo contenido conserva la fecha; con otro hash, pasa a ser ahora
+    assert refreshed == ratios and unchanged.headers["last-modified"] == from_l2.headers["last-modified"]
+    assert parsedate_to_datetime(changed.headers["last-modified"]).timestamp() > time.time() - 5
@@ -0,0 +1,120 @@
+# app/tests/test_exports.py
+import asyncio
+import csv
+import gzip
+import httpx
+import pytest
+from respx import MockRouter
+from app import exports as exports_module
+from app.config import Config
+from app.exports import ExportManager
+
+PRICES_RESPONSE = {
+    "Meta Data": {"2. Symbol": "AAPL", "3. Last Refreshed": "2023-10-05"},
+    "Time Series (Daily)": {
+        day: {"1. open": "170", "2. high": "175", "3. low": "169", "4. close": close, "5. volume": "100"}
+        for day, close in (("2023-10-03", "171"), ("2023-10-04", "172"), ("2023-10-05", "173"))
+    }
+}
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "EXPORT_DIR", str(tmp_path / "exports"))
+    monkeypatch.setattr(exports_module, "pa", None)  # Fuerza el formato CSV de respaldo
+    return ExportManager()
+
+def run_job(manager: ExportManager, request: dict) -> dict:
+    async def scenario():
+        status = await manager.submit(request)
+        await manager._queue.join()
+        await manager.stop()
+        return manager.status(status["id"])
+    return asyncio.run(scenario())
+
+def read_csv(manager: ExportManager, status: dict, dataset: str) -> list:
+    path, media_type = manager.file_path(status["id"], dataset)
+    assert media_type == "application/gzip"
+    with gzip.open(path, "rt", newline="") as handle:
+        return list(csv.reader(handle))
+
+def test_export_prices_and_ratios(respx_mock: MockRouter, manager):
+    """Exporta precios del histórico local y ratios filtrados por fecha, con errores por símbolo"""
+    respx_mock.get("https://www.alphavantage.co/query").mock(return_value=httpx.Response(200, json=PRICES_RESPONSE))
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(return_value=httpx.Response(200, json=[
+        {"symbol": "AAPL", "date": "2023-09-30", "priceEarningsRatio": 28.0},
+        {"symbol": "AAPL", "date": "2019-09-28", "priceEarningsRatio": 20.8}
+    ]))
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/NOPE").mock(
+        return_value=httpx.Response(200, json={"Error Message": "Invalid ticker"})
+    )
+
+    status = run_job(manager, {
+        "symbols": ["aapl", "nope"], "datasets": ["prices", "ratios"], "interval": "daily", "period": "annual",
+        "start": "2020-01-01", "end": "2023-10-04", "format": "parquet"
+    })
+
+    assert status["status"] == "completed" and status["format"] == "csv"
+    assert status["progress"] == {"done": 4, "total": 4}
+    assert status["errors"]["NOPE"]["ratios"] == "Invalid ticker"
+    prices = read_csv(manager, status, "prices")
+    assert prices[0] == ["symbol", "timestamp", "open", "high", "low", "close", "volume"]
+    assert [row[5] for row in prices[1:] if row[0] == "AAPL"] == ["171.0", "172.0"]
+    assert read_csv(manager, status, "ratios")[1:] == [["AAPL", "2023-09-30", "", "", "", "28.0"]]
+
+def test_export_validation_and_cleanup(respx_mock: MockRouter, manager, monkeypatch):
+    """Rechaza solicitudes no válidas y elimina los trabajos caducados"""
+    base = {"symbols": ["AAPL"], "interval": "daily", "period": "annual", "format": "csv"}
+    assert asyncio.run(manager.submit({**base, "datasets": ["options"]}))["code"] == 400
+    assert asyncio.run(manager.submit({**base, "datasets": ["prices"], "start": "2023-10-05", "end": "2023-10-01"}))["code"] == 400
+    assert asyncio.run(manager.submit({**base, "datasets": ["prices"], "start": "2024-02-30"}))["code"] == 400
+    assert manager.status("../../etc") is None
+
+    respx_mock.get("https://financialmodelingprep.com/api/v3/income-statement/AAPL").mock(return_value=httpx.Response(500))
+    status = run_job(manager, {**base, "datasets": ["financials"]})
+    assert status["status"] == "completed" and status["files"]["financials"]["rows"] == 0
+    assert status["error_count"] == 1
+
+    monkeypatch.setattr(Config, "EXPORT_RETENTION", -1)
+    assert manager.cleanup() == 1 and manager.status(status["id"]) is None
+
+def test_worker_survives_errors_and_abandoned_jobs_expire(respx_mock: MockRouter, manager, monkeypatch):
+    """Un fallo al guardar el estado no detiene el pool y los trabajos abandonados se eliminan"""
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(return_value=httpx.Response(200, json=[]))
+    request = {"symbols": ["AAPL"], "datasets": ["ratios"], "interval": "daily", "period": "annual", "format": "csv"}
+    save, failures = manager._save, [OSError("No space left on device")]
+
+    def failing_save(status):
+        if status["status"] == "running" and failures:
+            raise failures.pop()  # Falla al marcar como 'running' el primer trabajo
+        save(status)
+    monkeypatch.setattr(Config, "EXPORT_WORKERS", 1)
+    monkeypatch.setattr(manager, "_save", failing_save)
+
+    async def scenario():
+        broken = await manager.submit(request)
+        await manager._queue.put("0" * 32)  # Trabajo eliminado antes de ejecutarse
+        ok = await manager.submit(request)
+        await manager._queue.join()
+        await manager.stop()
+        return manager.status(broken["id"]), manager.status(ok["id"])
+    broken, ok = asyncio.run(scenario())
+
+    assert broken["status"] == "queued"  # Quedó abandonado
+    assert ok["status"] == "completed"  # El pool siguió funcionando
+    monkeypatch.setattr(Config, "EXPORT_RETENTION", -1)
+    assert manager.cleanup() == 2 and manager.status(broken["id"]) is None
+
+def test_export_parquet_row_group_per_symbol(respx_mock: MockRouter, tmp_path, monkeypatch):
+    """Con pyarrow se escribe Parquet, un row group por lote de símbolo"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(Config, "EXPORT_DIR", str(tmp_path / "exports"))
+    monkeypatch.setattr(Config, "EXPORT_CONCURRENCY", 1)
+    respx_mock.get("https://www.alphavantage.co/query").mock(return_value=httpx.Response(200, json=PRICES_RESPONSE))
+    manager = ExportManager()
+
+    status = run_job(manager, {"symbols": ["AAPL", "MSFT"], "datasets": ["prices"], "interval": "daily",
+                               "period": "annual", "format": "parquet"})
+
+    parquet = pq.ParquetFile(manager.file_path(status["id"], "prices")[0])
+    assert status["format"] == "parquet" and parquet.num_row_groups == 2
+    assert parquet.read().column("symbol").to_pylist() == ["AAPL"] * 3 + ["MSFT"] * 3
@@ -0,0 +1,125 @@
+# app/tests/test_instruments.py
+import asyncio
+import json
+import sqlite3
+import httpx
+from respx import MockRouter
+from app.cache import cache
+from app.services import openfigi
+from app.storage import figi_index
+
+OPENFIGI_URL = "https://api.openfigi.com/v3/mapping"
+
+def mapping_response(request: httpx.Request) -> httpx.Response:
+    """Simula OpenFIGI: un resultado por trabajo, 'warning' si no existe"""
+    jobs = json.loads(request.content)
+    return httpx.Response(200, json=[
+        {"warning": "No identifier found."} if job["idValue"] == "NOPE" else
+        {"data": [{"figi": f"BBG-{job['idValue']}", "name": job["idValue"], "ticker": job["idValue"],
+                   "exchCode": job["exchCode"], "securityType": "Common Stock"}]}
+        for job in jobs
+    ])
+
+def test_batch_mapping_chunks_and_keeps_order(respx_mock: MockRouter, monkeypatch):
+    """Los trabajos se agrupan en bloques del tamaño máximo y se devuelven en orden"""
+    route = respx_mock.post(OPENFIGI_URL).mock(side_effect=mapping_response)
+    monkeypatch.setattr(openfigi, "MAX_JOBS_PER_REQUEST", 10)
+    symbols = [f"SYM{i}" for i in range(25)] + ["NOPE", "SYM3"]
+
+    results = asyncio.run(openfigi.map_instruments([{"id_type": "TICKER", "value": s, "market": "US"} for s in symbols]))
+
+    assert route.call_count == 3  # 26 trabajos únicos en bloques de 10
+    assert [r[0]["figi"] for r in results[:25]] == [f"BBG-SYM{i}" for i in range(25)]
+    assert results[25]["code"] == 404
+    assert results[26] == results[3]
+
+def test_batch_mapping_rejects_incomplete_response(respx_mock: MockRouter):
+    """Si OpenFIGI no devuelve un resultado por trabajo no se asigna ni se guarda ninguno"""
+    route = respx_mock.post(OPENFIGI_URL).mock(
+        side_effect=lambda request: httpx.Response(200, json=json.loads(mapping_response(request).content)[1:])
+    )
+    jobs = [{"id_type": "TICKER", "value": s, "market": "US"} for s in ("AAPL", "MSFT", "IBM")]
+
+    results = asyncio.run(openfigi.map_instruments(jobs))
+    route.mock(return_value=httpx.Response(200, json={"error": "Invalid request"}))
+    not_a_list = asyncio.run(openfigi.map_instruments(jobs))
+
+    assert [result["code"] for result in results] == [502, 502, 502]
+    assert [result["code"] for result in not_a_list] == [502, 502, 502]
+    assert route.call_count == 2  # Nada quedó en caché
+    assert figi_index.reverse("BBG-MSFT") == []
+
+def test_batch_mapping_uses_cached_mappings(respx_mock: MockRouter):
+    """Los mapeos ya resueltos por /instruments no vuelven al proveedor"""
+    route = respx_mock.post(OPENFIGI_URL).mock(side_effect=mapping_response)
+
+    async def scenario():
+        await openfigi.search_instrument("AAPL")
+        return await openfigi.map_instruments([
+            {"id_type": "TICKER", "value": "AAPL", "market": "US"},
+            {"id_type": "TICKER", "value": "MSFT", "market": "US"},
+            {"id_type": "BAD", "value": "X", "market": "US"}
+        ])
+
+    results = asyncio.run(scenario())
+
+    assert route.call_count == 2
+    assert json.loads(route.calls[1].request.content) == [{"idType": "TICKER", "idValue": "MSFT", "exchCode": "US"}]
+    assert results[0][0]["figi"] == "BBG-AAPL"
+    assert results[2]["code"] == 400
+
+def test_local_index_answers_without_network(respx_mock: MockRouter):
+    """Los mapeos resueltos quedan en el índice local, con búsqueda inversa por FIGI"""
+    route = respx_mock.post(OPENFIGI_URL).mock(side_effect=mapping_response)
+
+    asyncio.run(openfigi.search_instrument("AAPL"))
+    cache.reset()  # Sin L1; Redis vacío en el siguiente paso
+    asyncio.run(cache.redis_client.flushall())
+    result = asyncio.run(openfigi.search_instrument("aapl"))
+
+    assert route.call_count == 1
+    assert result[0]["figi"] == "BBG-AAPL"
+    assert figi_index.reverse("BBG-AAPL")[0]["id_value"] == "AAPL"
+
+def test_index_bulk_import_and_refresh_policy(monkeypatch):
+    """La carga masiva alimenta el índice; las entradas caducadas no se sirven"""
+    imported = figi_index.bulk_import([
+        {"id_type": "ID_ISIN", "id_value": "US0378331005", "exch_code": "US", "figi": "BBG000B9XRY4", "ticker": "AAPL"},
+        {"id_type": "TICKER", "id_value": "AAPL", "exch_code": "US", "figi": "BBG000B9XRY4", "ticker": "AAPL"}
+    ])
+
+    assert imported == 2
+    assert figi_index.lookup("ID_ISIN", "us0378331005", "US")[0]["ticker"] == "AAPL"
+    assert len(figi_index.reverse("BBG000B9XRY4")) == 2
+
+    monkeypatch.setattr(figi_index, "max_age", -1)
+    assert figi_index.lookup("ID_ISIN", "US0378331005", "US") is None
+
+def test_index_batch_store_and_lookup():
+    """Muchos identificadores se guardan en una transacción y se buscan en una consulta"""
+    figi_index.store_many([
+        ("TICKER", "AAPL", "US", [{"figi": "BBG-AAPL", "ticker": "AAPL"}]),
+        ("TICKER", "MSFT", "US", [{"figi": "BBG-MSFT", "ticker": "MSFT"}, {"figi": "BBG-MSFT2", "ticker": "MSFT"}])
+    ])
+
+    found = figi_index.lookup_many([("TICKER", "msft", "us"), ("TICKER", "NOPE", "US"), ("TICKER", "AAPL", "US"),
+                                    ("TICKER", "AAPL", "US")])
+
+    assert [len(result) if result else None for result in found] == [2, None, 1, 1]
+    assert found[2][0]["figi"] == "BBG-AAPL"
+
+def test_reverse_lookup_with_index_unavailable(monkeypatch):
+    """Un índice bloqueado o corrupto responde 503 en lugar de un error interno"""
+    from app.main import app
+
+    def locked(figi):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(figi_index, "reverse", locked)
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+            return await client.get("/instruments/figi/BBG000B9XRY4")
+    response = asyncio.run(request())
+
+    assert response.status_code == 503
+    assert response.json()["code"] == 503
@@ -0,0 +1,48 @@
+# app/tests/test_metrics.py
+import asyncio
+import httpx
+from prometheus_client import REGISTRY
+from respx import MockRouter
+from app.config import Config
+from app.metrics import render
+from app.services import fmp
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_provider_call_metrics(respx_mock: MockRouter):
+    """Una llamada real mide el proveedor, el servicio, la caché y el limitador; la segunda es un acierto L1"""
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        return_value=httpx.Response(200, json=[{"symbol": "AAPL", "date": "2023-09-30", "priceEarningsRatio": 28.0}])
+    )
+    before = {
+        "upstream": sample("upstream_requests_total", provider="fmp", status="200"),
+        "bytes": sample("upstream_response_bytes_sum", provider="fmp"),
+        "calls": sample("provider_calls_total", function="fmp.get_financial_ratios", outcome="ok"),
+        "l1_hit": sample("cache_requests_total", tier="l1", result="hit"),
+        "l2_miss": sample("cache_requests_total", tier="l2", result="miss"),
+        "allowed": sample("ratelimit_decisions_total", provider="fmp", decision="immediate")
+    }
+
+    async def calls():
+        await fmp.get_financial_ratios("AAPL")
+        await fmp.get_financial_ratios("AAPL")
+    asyncio.run(calls())
+
+    assert sample("upstream_requests_total", provider="fmp", status="200") == before["upstream"] + 1
+    assert sample("upstream_response_bytes_sum", provider="fmp") > before["bytes"]
+    assert sample("provider_calls_total", function="fmp.get_financial_ratios", outcome="ok") == before["calls"] + 1
+    assert sample("cache_requests_total", tier="l1", result="hit") == before["l1_hit"] + 1
+    assert sample("cache_requests_total", tier="l2", result="miss") >= before["l2_miss"] + 1
+    assert sample("ratelimit_decisions_total", provider="fmp", decision="immediate") == before["allowed"] + 1
+
+def test_upstream_errors_by_class(respx_mock: MockRouter):
+    """Los errores de transporte se cuentan por clase (cada reintento por separado)"""
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/SLOW").mock(side_effect=httpx.ReadTimeout("lento"))
+    before = sample("upstream_requests_total", provider="fmp", status="timeout")
+
+    asyncio.run(fmp.get_financial_ratios("SLOW"))
+
+    assert sample("upstream_requests_total", provider="fmp", status="timeout") == before + 1 + Config.RETRY_ATTEMPTS
+    payload, content_type = render()
+    assert content_type.startswith("text/plain") and b"upstream_request_duration_seconds_bucket" in payload
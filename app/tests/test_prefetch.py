@@ -0,0 +1,61 @@
+# app/tests/test_prefetch.py
+import asyncio
+import httpx
+from respx import MockRouter
+from app.config import Config
+from app.cache import cache
+from app.ratelimit import RateLimiter
+from app.prefetch import Candidate, Prefetcher, plan
+
+def test_plan_prioritizes_demand_within_quota():
+    """Solo se planifica lo que caduca, por demanda y sin superar la cuota de cada proveedor"""
+    candidates = [
+        Candidate("ratios", ("IBM", "annual"), score=1, remaining=0),
+        Candidate("ratios", ("AAPL", "annual"), score=9, remaining=0),
+        Candidate("ratios", ("MSFT", "annual"), score=50, remaining=Config.CACHE_TTL_FUNDAMENTALS),
+        Candidate("news", ("AAPL", 5, "publishedAt"), score=0, remaining=0)
+    ]
+    credit = {"fmp": 1.5, "newsapi": 3}
+
+    selected, deferred = plan(candidates, credit)
+
+    assert [(c.kind, c.args[0]) for c in selected] == [("ratios", "AAPL"), ("news", "AAPL")]
+    assert deferred == 1 and credit == {"fmp": 0.5, "newsapi": 2}
+
+def test_cycle_refreshes_watchlist_and_hot_queries(respx_mock: MockRouter, monkeypatch):
+    """El líder refresca la watchlist y lo más consultado; un segundo worker no refresca"""
+    monkeypatch.setattr(Config, "PREFETCH_WATCHLIST", "AAPL")
+    monkeypatch.setattr(Config, "PREFETCH_KINDS", ["ratios"])
+    route = respx_mock.get(url__regex=r"https://financialmodelingprep.com/api/v3/ratios/\w+").mock(
+        return_value=httpx.Response(200, json=[{"symbol": "AAPL", "date": "2023-09-30", "priceEarningsRatio": 28.0}])
+    )
+    monkeypatch.setitem(RateLimiter._limits, "fmp", {"max": 60, "window": 60})
+    leader, follower = Prefetcher(), Prefetcher()
+    follower.record("ratios", "msft", "annual")
+
+    async def cycles():
+        await leader.run_cycle()  # Toma el lease y precarga la watchlist
+        await follower.run_cycle()  # Solo comparte su demanda
+        await leader.run_cycle()
+        return await cache.ttl_many([
+            leader.watchlist()[0].key, Candidate("ratios", ("MSFT", "annual")).key
+        ])
+
+    remaining = asyncio.run(cycles())
+
+    assert route.call_count == 2
+    assert all(seconds > 0 for seconds in remaining)
+    assert leader.stats()["refreshed"] == 2 and not follower.stats()["leader"]
+
+def test_routed_refreshes_charge_the_provider_the_router_uses(fake_providers, monkeypatch):
+    """Los precios se cargan a la cuota del proveedor que elegirá el router, no siempre a Alpha Vantage"""
+    monkeypatch.setattr(Config, "PRICE_PROVIDERS", ["fmp", "alpha_vantage"])
+    candidates = [Candidate("prices", ("AAPL", "daily")), Candidate("news", ("AAPL", 5, "publishedAt"))]
+    prefetcher = Prefetcher()
+
+    asyncio.run(prefetcher.route(candidates))
+    credit = {"alpha_vantage": 0, "fmp": 1, "newsapi": 1}
+    selected, deferred = plan(candidates, credit)
+
+    assert [c.provider for c in candidates] == ["fmp", "newsapi"]
+    assert len(selected) == 2 and deferred == 0 and credit["fmp"] == 0
@@ -1,10 +1,12 @@
 # app/tests/test_prices.py
+import asyncio
 import pytest
-from unittest.mock import patch
-from requests_mock import Mocker
-from app.services.alpha_vantage import get_stock_prices
+import httpx
+from respx import MockRouter
+from app.services import alpha_vantage
 from app.config import Config
 from app.utils import RateLimiter
+from app.timeseries import to_alpha_vantage
 
 # Datos de prueba mock
 MOCK_SUCCESS_RESPONSE = {
@@ -28,24 +30,32 @@ MOCK_ERROR_RESPONSE = {
     "Error Message": "Invalid API call. Please retry or visit the documentation."
 }
 
-def test_get_stock_prices_success(requests_mock: Mocker):
+@pytest.fixture(autouse=True)
+def alpha_vantage_only(monkeypatch):
+    """Estas pruebas cubren el proveedor Alpha Vantage: sin conmutación a FMP"""
+    monkeypatch.setattr(Config, "PRICE_PROVIDERS", ["alpha_vantage"])
+
+def get_stock_prices(*args, **kwargs):
+    """Ejecuta el servicio asíncrono de precios desde un test síncrono"""
+    return asyncio.run(alpha_vantage.get_stock_prices(*args, **kwargs))
+
+def test_get_stock_prices_success(respx_mock: MockRouter):
     """Prueba exitosa de obtención de precios"""
-    requests_mock.get(
-        "https://www.alphavantage.co/query",
-        json=MOCK_SUCCESS_RESPONSE
+    respx_mock.get("https://www.alphavantage.co/query").mock(
+        return_value=httpx.Response(200, json=MOCK_SUCCESS_RESPONSE)
     )
     
     result = get_stock_prices("AAPL")
     
-    assert "Meta Data" in result
-    assert "Time Series (Daily)" in result
-    assert result["Meta Data"]["2. Symbol"] == "AAPL"
+    assert result["symbol"] == "AAPL"
+    assert result["timestamps"] == [1696464000]  # 2023-10-05 00:00 UTC
+    assert result["close"] == [173.5]
+    assert result["volume"] == [10058372]
 
-def test_get_stock_prices_api_error(requests_mock: Mocker):
+def test_get_stock_prices_api_error(respx_mock: MockRouter):
     """Prueba de error en la API"""
-    requests_mock.get(
-        "https://www.alphavantage.co/query",
-        status_code=500
+    respx_mock.get("https://www.alphavantage.co/query").mock(
+        return_value=httpx.Response(500)
     )
     
     result = get_stock_prices("AAPL")
@@ -53,11 +63,10 @@ def test_get_stock_prices_api_error(requests_mock: Mocker):
     assert "error" in result
     assert "Error de conexión" in result["error"]
 
-def test_get_stock_prices_invalid_response(requests_mock: Mocker):
+def test_get_stock_prices_invalid_response(respx_mock: MockRouter):
     """Prueba de respuesta inválida de la API"""
-    requests_mock.get(
-        "https://www.alphavantage.co/query",
-        json=MOCK_ERROR_RESPONSE
+    respx_mock.get("https://www.alphavantage.co/query").mock(
+        return_value=httpx.Response(200, json=MOCK_ERROR_RESPONSE)
     )
     
     result = get_stock_prices("AAPL")
@@ -72,15 +81,15 @@ def test_get_stock_prices_invalid_interval():
     assert "error" in result
     assert "Intervalo no válido" in result["error"]
 
-def test_get_stock_prices_rate_limiting(requests_mock: Mocker):
+def test_get_stock_prices_rate_limiting(respx_mock: MockRouter, monkeypatch):
     """Prueba de límite de tasa"""
-    # Resetear el contador de límites
-    RateLimiter._limits["alpha_vantage"]["calls"] = 0
+    # Sin caché cada llamada llega al proveedor; sin cola se rechaza al agotar el bucket
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+    monkeypatch.setattr(Config, "RATE_LIMIT_MAX_WAIT", 0)
     
     # Mock de llamadas exitosas
-    requests_mock.get(
-        "https://www.alphavantage.co/query",
-        json=MOCK_SUCCESS_RESPONSE
+    respx_mock.get("https://www.alphavantage.co/query").mock(
+        return_value=httpx.Response(200, json=MOCK_SUCCESS_RESPONSE)
     )
     
     # Llamar hasta el límite
@@ -100,37 +109,102 @@ def test_get_stock_prices_empty_symbol():
     assert "error" in result
     assert "El símbolo no puede estar vacío" in result["error"]
 
-@patch.dict("app.config.Config.__dict__", {"ALPHA_VANTAGE_API_KEY": None})
-def test_missing_api_key():
+def test_missing_api_key(monkeypatch):
     """Prueba de falta de API key"""
+    monkeypatch.setattr(Config, "ALPHA_VANTAGE_API_KEY", None)
     result = get_stock_prices("AAPL")
     
     assert "error" in result
     assert "API key no configurada" in result["error"]
 
-def test_different_intervals(requests_mock: Mocker):
+def test_different_intervals(respx_mock: MockRouter, monkeypatch):
     """Prueba de diferentes intervalos temporales"""
     intervals = ["1min", "5min", "15min", "30min", "60min", "daily"]
+    # Una llamada real por intervalo: ampliar la cuota por minuto para la prueba
+    monkeypatch.setitem(RateLimiter._limits["alpha_vantage"], "max", len(intervals))
     
     for interval in intervals:
-        requests_mock.get(
-            "https://www.alphavantage.co/query",
-            json=MOCK_SUCCESS_RESPONSE
+        respx_mock.get("https://www.alphavantage.co/query").mock(
+            return_value=httpx.Response(200, json=MOCK_SUCCESS_RESPONSE)
         )
         
         result = get_stock_prices("AAPL", interval)
-        assert "Meta Data" in result
+        assert result["interval"] == interval
+        assert len(result["timestamps"]) == 1
 
-def test_response_data_types(requests_mock: Mocker):
+def test_response_data_types(respx_mock: MockRouter):
     """Prueba de tipos de datos en la respuesta"""
-    requests_mock.get(
-        "https://www.alphavantage.co/query",
-        json=MOCK_SUCCESS_RESPONSE
+    respx_mock.get("https://www.alphavantage.co/query").mock(
+        return_value=httpx.Response(200, json=MOCK_SUCCESS_RESPONSE)
     )
     
     result = get_stock_prices("AAPL")
     
     assert isinstance(result, dict)
-    assert isinstance(result["Meta Data"], dict)
-    assert isinstance(result["Time Series (Daily)"], dict)
-    assert isinstance(result["Time Series (Daily)"]["2023-10-05"], dict)
\ No newline at end of file
+    assert all(isinstance(value, int) for value in result["timestamps"] + result["volume"])
+    assert all(isinstance(value, float) for value in result["open"] + result["high"] + result["low"] + result["close"])
+
+def test_normalized_series_order_and_raw_format():
+    """La serie se ordena de forma ascendente y el formato 'raw' reconstruye el original"""
+    from app.timeseries import normalize_alpha_vantage
+    payload = {
+        "Meta Data": {"2. Symbol": "AAPL", "3. Last Refreshed": "2023-10-05 16:00:00", "6. Time Zone": "US/Eastern"},
+        "Time Series (5min)": {
+            "2023-10-05 16:00:00": {"1. open": "2.0000", "2. high": "2.5000", "3. low": "1.5000", "4. close": "2.2500", "5. volume": "20"},
+            "2023-10-05 15:55:00": {"1. open": "1.0000", "2. high": "1.5000", "3. low": "0.5000", "4. close": "1.2500", "5. volume": "10"}
+        }
+    }
+
+    series = normalize_alpha_vantage(payload, "aapl", "5min")
+
+    assert series["timestamps"] == [1696535700, 1696536000]  # 19:55 y 20:00 UTC (EDT)
+    assert series["open"] == [1.0, 2.0]
+    raw = to_alpha_vantage(series)
+    assert raw["Time Series (5min)"] == payload["Time Series (5min)"]
+    assert list(raw["Time Series (5min)"])[0] == "2023-10-05 16:00:00"
+
+def test_batch_prices_reports_per_symbol_results(respx_mock: MockRouter, monkeypatch):
+    """El lote devuelve primero los símbolos en caché y un resultado o error por símbolo"""
+    route = respx_mock.get("https://www.alphavantage.co/query").mock(
+        return_value=httpx.Response(200, json=MOCK_SUCCESS_RESPONSE)
+    )
+    monkeypatch.setattr(Config, "RATE_LIMIT_MAX_WAIT", 0)
+    monkeypatch.setitem(RateLimiter._limits["alpha_vantage"], "max", 3)
+
+    async def scenario():
+        await alpha_vantage.get_stock_prices("MSFT")
+        return [item async for item in alpha_vantage.iter_stock_prices(["AAPL", "MSFT", "IBM", "TSLA"])]
+
+    results = asyncio.run(scenario())
+
+    assert results[0][0] == "MSFT"  # En caché: sin esperar al resto
+    assert route.call_count == 3
+    errors = [symbol for symbol, result in results if "error" in result]
+    assert len(results) == 4 and len(errors) == 1
+
+def test_price_history_backfills_once_then_fetches_tail(respx_mock: MockRouter, monkeypatch):
+    """Primera consulta: histórico completo; después solo la cola, sin duplicar barras"""
+    from app.storage import price_store
+    bar = {"1. open": "1.0", "2. high": "2.0", "3. low": "0.5", "4. close": "1.5", "5. volume": "100"}
+    full = {"Meta Data": {"3. Last Refreshed": "2023-10-04"}, "Time Series (Daily)": {"2023-10-03": bar, "2023-10-04": bar}}
+    tail = {"Meta Data": {"3. Last Refreshed": "2023-10-05"}, "Time Series (Daily)": {"2023-10-04": bar, "2023-10-05": {**bar, "4. close": "1.75"}}}
+    route = respx_mock.get("https://www.alphavantage.co/query").mock(
+        side_effect=[httpx.Response(200, json=full), httpx.Response(200, json=tail)]
+    )
+    monkeypatch.setattr(alpha_vantage, "_compact_covers", lambda state, interval: True)
+
+    first = asyncio.run(alpha_vantage.get_price_history("AAPL"))
+    assert route.calls[0].request.url.params["outputsize"] == "full"
+
+    # Desde caché local mientras no cambie la barra diaria
+    asyncio.run(alpha_vantage.get_price_history("AAPL"))
+    assert route.call_count == 1
+
+    monkeypatch.setattr(alpha_vantage, "_history_is_fresh", lambda state, interval: False)
+    second = asyncio.run(alpha_vantage.get_price_history("aapl", start=1696377600, end=1696550399))
+
+    assert route.calls[1].request.url.params["outputsize"] == "compact"
+    assert len(first["timestamps"]) == 2
+    assert second["timestamps"] == [1696377600, 1696464000]  # 2023-10-04 y 2023-10-05
+    assert second["close"] == [1.5, 1.75]
+    assert price_store.stats() == {"series": 1, "bars": 3}
@@ -0,0 +1,45 @@
+# app/tests/test_projection.py
+import asyncio
+import pytest
+from app.projection import parse_projection
+from app.services import alpha_vantage, fmp
+from app.snapshot import build_snapshot
+
+def test_series_projection_keeps_cached_value(fake_providers):
+    """fields/limit/since recortan la serie sin modificar el valor cacheado"""
+    prices = asyncio.run(alpha_vantage.get_stock_prices("AAPL"))
+    bars = len(prices["timestamps"])
+
+    latest = parse_projection("close", 1).apply(prices)
+    since = parse_projection(since="2023-10-05").apply(prices)
+
+    assert latest["symbol"] == "AAPL" and latest["timestamps"] == prices["timestamps"][-1:]
+    assert latest["close"] == prices["close"][-1:]
+    assert not any(field in latest for field in ("open", "high", "low", "volume"))
+    assert since["timestamps"] == prices["timestamps"][-2:]  # 2023-10-05 y 2023-10-06
+    assert len(since["volume"]) == 2
+    assert len(prices["timestamps"]) == bars and "open" in prices
+    assert parse_projection() is None
+    for params in ({"fields": " , "}, {"fields": "close;drop"}, {"since": "ayer"}, {"limit": 0}):
+        with pytest.raises(ValueError):
+            parse_projection(**params)
+
+def test_rows_and_snapshot_projection(fake_providers):
+    """En las filas se eligen claves y periodos más recientes; la ficha proyecta cada sección"""
+    ratios = asyncio.run(fmp.get_financial_ratios("AAPL"))
+    rows = [{**ratios[0], "date": "2022-09-30"}, ratios[0], {**ratios[0], "date": "2021-09-30"}]
+
+    assert parse_projection("date,roe", 1).apply(ratios) == [{"date": "2023-09-30", "roe": ratios[0]["roe"]}]
+    assert [row["date"] for row in parse_projection(limit=2).apply(rows)] == ["2022-09-30", "2023-09-30"]
+    assert parse_projection(since="1664496000").apply(rows) == rows[:2]  # 2022-09-30 00:00 UTC
+    news = {"total_results": 2, "articles": [{"title": "a", "published_at": "2023-10-05T10:00:00Z"}]}
+    assert parse_projection("title", since="2023-10-06").apply(news) == {"total_results": 2, "articles": []}
+
+    snapshot = asyncio.run(build_snapshot(
+        "AAPL", ["prices", "ratios"], {"prices": 1.0, "ratios": 1.0},
+        {"interval": "daily", "period": "annual", "market": "US", "news_limit": 5},
+        parse_projection("close,pe_ratio", 1)
+    ))
+    prices = snapshot["sections"]["prices"]["data"]
+    assert len(prices["timestamps"]) == 1 and list(prices)[-2:] == ["timestamps", "close"]
+    assert snapshot["sections"]["ratios"]["data"] == [{"pe_ratio": ratios[0]["pe_ratio"]}]
@@ -0,0 +1,61 @@
+# app/tests/test_providers.py
+import asyncio
+import httpx
+import pytest
+from respx import MockRouter
+from app.config import Config
+from app.ratelimit import rate_limiter
+from app.services import alpha_vantage, fmp
+from app.services.providers import router
+from app.services.providers.base import PRICES, RATIOS, Provider
+
+def test_rate_limited_alpha_vantage_fails_over_to_fmp(respx_mock: MockRouter):
+    """El aviso 'Note' de Alpha Vantage es un 429: la serie llega de FMP con el mismo esquema"""
+    respx_mock.get("https://www.alphavantage.co/query").mock(
+        return_value=httpx.Response(200, json={"Note": "Thank you for using Alpha Vantage!"})
+    )
+    respx_mock.get("https://financialmodelingprep.com/api/v3/historical-price-full/AAPL").mock(
+        return_value=httpx.Response(200, json={"symbol": "AAPL", "historical": [
+            {"date": "2023-10-05", "open": 172.81, "high": 174.26, "low": 170.8, "close": 173.5, "volume": 10058372},
+            {"date": "2023-10-04", "open": 170.0, "high": 172.0, "low": 169.5, "close": 171.0, "volume": 9512345}
+        ]})
+    )
+
+    result = asyncio.run(alpha_vantage.get_stock_prices("AAPL"))
+
+    assert result["provider"] == "fmp"
+    assert result["timestamps"] == [1696377600, 1696464000]  # Ascendente, medianoche UTC como Alpha Vantage
+    assert result["close"] == [171.0, 173.5] and result["volume"] == [9512345, 10058372]
+    stats = router.stats()["providers"]
+    assert stats["alpha_vantage"]["errors"] == 1 and stats["fmp"]["errors"] == 0
+
+def test_routing_adapts_to_errors_and_quota(fake_providers, monkeypatch):
+    """Tras fallar, un proveedor pasa detrás del que responde; sin cuota no se le consulta"""
+    monkeypatch.setattr(Config, "CACHE_ENABLED", False)
+    fake_providers["fmp"].errors = [503]
+
+    async def calls():
+        first = await fmp.get_income_statement("AAPL")
+        second = await fmp.get_income_statement("MSFT")
+        return first, second
+    first, second = asyncio.run(calls())
+
+    assert first[0]["symbol"] == "AAPL" and second[0]["symbol"] == "MSFT"
+    # FMP era el preferido y falló: la primera llamada pasó a Alpha Vantage y la segunda ya fue directa
+    assert fake_providers["fmp"].calls == 1 and fake_providers["alpha_vantage"].calls == 2
+
+    # Con la cuota de Alpha Vantage agotada se prefiere FMP aunque acabe de fallar
+    async def without_quota():
+        while await rate_limiter.acquire("alpha_vantage", max_wait=0):
+            pass
+        return [provider.name for provider in await router.candidates("income_statement")]
+    assert asyncio.run(without_quota()) == ["fmp", "alpha_vantage"]
+
+def test_provider_must_implement_declared_capabilities():
+    """Declarar un tipo de dato sin su método fetch_<tipo> falla al definir la clase"""
+    with pytest.raises(TypeError, match="ratios"):
+        class Incomplete(Provider):
+            capabilities = frozenset({PRICES, RATIOS})
+
+            async def fetch_prices(self, symbol: str, interval: str, outputsize: str = "compact"):
+                return {}
@@ -0,0 +1,44 @@
+# app/tests/test_ratelimit.py
+import asyncio
+import time
+from redis.exceptions import ConnectionError as RedisConnectionError
+from app.cache import cache
+from app.ratelimit import RateLimiter, rate_limiter
+
+def test_calls_over_quota_are_queued(monkeypatch):
+    """Las llamadas que exceden la cuota esperan a que haya tokens"""
+    monkeypatch.setitem(RateLimiter._limits, "alpha_vantage", {"max": 2, "window": 1})
+
+    async def scenario():
+        start = time.perf_counter()
+        allowed = [await rate_limiter.acquire("alpha_vantage", max_wait=1) for _ in range(3)]
+        return allowed, time.perf_counter() - start
+
+    allowed, elapsed = asyncio.run(scenario())
+
+    assert allowed == [True, True, True]
+    assert elapsed >= 0.4
+    assert rate_limiter.stats()["alpha_vantage"]["queued"] == 1
+
+def test_quota_is_shared_through_redis(monkeypatch):
+    """El bucket vive en Redis: otro worker con contadores propios ve la misma cuota"""
+    monkeypatch.setitem(RateLimiter._limits, "fmp", {"max": 1, "window": 60})
+    other_worker = RateLimiter()
+
+    async def scenario():
+        return await rate_limiter.acquire("fmp", max_wait=0), await other_worker.acquire("fmp", max_wait=0)
+
+    assert asyncio.run(scenario()) == (True, False)
+
+def test_local_fallback_when_redis_is_down(monkeypatch):
+    """Si Redis no responde se aplica un límite local"""
+    async def unavailable(*args, **kwargs):
+        raise RedisConnectionError("Redis caído")
+
+    monkeypatch.setattr(cache.redis_client, "eval", unavailable)
+    monkeypatch.setitem(RateLimiter._limits, "newsapi", {"max": 2, "window": 60})
+
+    async def scenario():
+        return [await rate_limiter.acquire("newsapi", max_wait=0) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [True, True, False]
@@ -0,0 +1,108 @@
+# app/tests/test_resilience.py
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from respx import MockRouter
+from app.cache import cache
+from app.config import Config
+from app.resilience import ResilientTransport, StaleResponseMiddleware, circuit_stats
+from app.services import fmp, news
+
+RATIOS = [{"symbol": "AAPL", "date": "2023-09-30", "priceEarningsRatio": 28.0}]
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(Config, "RETRY_BACKOFF_BASE", 0.0)
+
+def test_retry_recovers_from_transient_errors(respx_mock: MockRouter):
+    """Un 503 o un fallo de red puntual se reintenta y el cliente no lo nota"""
+    route = respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(side_effect=[
+        httpx.Response(503), httpx.ConnectError("reset"), httpx.Response(200, json=RATIOS)
+    ])
+
+    result = asyncio.run(fmp.get_financial_ratios("AAPL"))
+
+    assert result[0]["pe_ratio"] == 28.0
+    assert route.call_count == 3
+    assert circuit_stats()["fmp"]["state"] == "closed"
+
+def test_circuit_opens_and_fails_fast(respx_mock: MockRouter, monkeypatch):
+    """Tras BREAKER_FAILURES fallos seguidos no se contacta con el proveedor hasta el reintento"""
+    monkeypatch.setattr(Config, "BREAKER_FAILURES", 3)
+    route = respx_mock.get(url__regex=r"https://financialmodelingprep.com/api/v3/ratios/.*").mock(
+        side_effect=httpx.ConnectError("caído")
+    )
+
+    async def calls():
+        first = await fmp.get_financial_ratios("AAPL")
+        second = await fmp.get_financial_ratios("MSFT")
+        return first, second
+    first, second = asyncio.run(calls())
+
+    assert first["code"] == 503 and route.call_count == 3
+    assert second["code"] == 503 and "Circuito abierto" in second["error"]
+    assert route.call_count == 3
+    assert circuit_stats()["fmp"]["state"] == "open"
+
+    # Pasado BREAKER_RESET, una única llamada de prueba cierra el circuito si responde
+    monkeypatch.setattr(Config, "BREAKER_RESET", 0)
+    route.mock(return_value=httpx.Response(200, json=RATIOS))
+    assert asyncio.run(fmp.get_financial_ratios("AAPL"))[0]["symbol"] == "AAPL"
+    assert circuit_stats()["fmp"]["state"] == "closed"
+
+def test_cancelled_probe_releases_half_open_circuit(monkeypatch):
+    """Una llamada de prueba cancelada no deja el circuito en half-open rechazando todo"""
+    monkeypatch.setattr(Config, "BREAKER_RESET", 0)
+
+    async def slow(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200)
+
+    async def scenario():
+        transport = ResilientTransport("fmp", httpx.MockTransport(slow))
+        for _ in range(Config.BREAKER_FAILURES):
+            transport.breaker.record_failure()
+        async with httpx.AsyncClient(transport=transport, base_url="https://fmp.test") as client:
+            probe = asyncio.ensure_future(client.get("/ratios"))
+            await asyncio.sleep(0.05)
+            state = transport.breaker.state
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+        return state, transport.breaker
+    state, breaker = asyncio.run(scenario())
+
+    assert state == "half_open"
+    assert breaker.allow() is True  # Se puede lanzar otra prueba
+
+def test_stale_copy_served_when_upstream_is_down(respx_mock: MockRouter, fake_redis):
+    """Con el proveedor caído se sirve la última copia marcada como caducada"""
+    route = respx_mock.get("https://newsapi.org/v2/everything").mock(return_value=httpx.Response(200, json={
+        "status": "ok", "totalResults": 1,
+        "articles": [{"title": "Apple", "source": {"name": "Wire"}, "url": "https://x", "publishedAt": "2023-10-05", "content": None}]
+    }))
+    app = FastAPI()
+    app.add_middleware(StaleResponseMiddleware)
+
+    @app.get("/news")
+    async def get_news(query: str):
+        return await news.get_financial_news(query)
+
+    async def requests():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+            fresh = await client.get("/news?query=apple")
+            # Caduca la entrada (L1 y Redis) y el proveedor deja de responder
+            cache.memory.clear()
+            await fake_redis.delete(news.get_financial_news.cache_key("apple"))
+            route.mock(return_value=httpx.Response(503))
+            stale = await client.get("/news?query=apple")
+        return fresh, stale
+    fresh, stale = asyncio.run(requests())
+
+    assert "x-stale" not in fresh.headers and "stale" not in fresh.json()
+    assert stale.status_code == 200
+    assert stale.json()["stale"] is True and stale.json()["articles"][0]["title"] == "Apple"
+    assert stale.headers["x-stale"] == "true" and stale.headers["warning"].startswith("110")
+    assert stale.headers["cache-control"] == "no-cache"  # Las cachés intermedias no la guardan
+    assert cache.stats()["l2"]["stale_if_error"] == 1
@@ -0,0 +1,84 @@
+# app/tests/test_screener.py
+import asyncio
+import httpx
+import pytest
+from respx import MockRouter
+from app.config import Config
+from app.screener import ScreenerTable, Screener, parse_query
+from app.storage import fundamentals_store
+
+ROWS = [
+    {"symbol": "AAPL", "date": "2023-09-30", "pe_ratio": 28.0, "roe": 1.56, "revenue": 383e9},
+    {"symbol": "IBM", "date": "2022-12-31", "pe_ratio": 15.0, "roe": 0.07, "revenue": 60e9},
+    {"symbol": "INTC", "date": "2022-12-31", "pe_ratio": 12.0, "roe": 0.16, "revenue": 63e9},
+    {"symbol": "XOM", "date": "2022-12-31", "pe_ratio": 8.0, "roe": 0.30, "revenue": 398e9},
+    {"symbol": "NEW", "date": None}
+]
+
+def load_table() -> ScreenerTable:
+    fundamentals_store.upsert(ROWS)
+    table = ScreenerTable()
+    table.load(fundamentals_store.load(), fundamentals_store.last_modified())
+    return table
+
+def test_parse_query():
+    """Condiciones, orden y límite desde la query string cruda"""
+    query = parse_query("pe_ratio%3C20&roe>=0.15&sort=-revenue&limit=2")
+
+    assert query.filters == [("pe_ratio", "<", 20.0), ("roe", ">=", 0.15)]
+    assert (query.sort, query.descending, query.limit) == ("revenue", True, 2)
+    with pytest.raises(ValueError):
+        parse_query("price<20")
+    with pytest.raises(ValueError):
+        parse_query("roe>alto")
+
+def test_screen_filters_and_sorts():
+    """Filtra y ordena; los símbolos sin dato no cumplen ninguna condición"""
+    result = load_table().screen(parse_query("pe_ratio<20&roe>0.15&sort=-revenue"))
+
+    assert [row["symbol"] for row in result["results"]] == ["XOM", "INTC"]
+    assert result["total"] == 2 and result["universe"] == 5
+    assert result["results"][0]["current_ratio"] is None
+
+def test_sort_puts_missing_values_last():
+    """Orden ascendente y descendente con valores ausentes al final, respetando limit"""
+    table = load_table()
+
+    assert [row["symbol"] for row in table.screen(parse_query("sort=pe_ratio&limit=2"))["results"]] == ["XOM", "INTC"]
+    assert [row["symbol"] for row in table.screen(parse_query("sort=-pe_ratio"))["results"]][-1] == "NEW"
+
+def test_refresh_cycle_updates_stale_symbols(respx_mock: MockRouter, monkeypatch):
+    """Un ciclo de refresco guarda los fundamentales más recientes y recarga la tabla"""
+    monkeypatch.setattr(Config, "SCREENER_UNIVERSE", "AAPL")
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(return_value=httpx.Response(200, json=[
+        {"symbol": "AAPL", "date": "2023-09-30", "returnOnEquity": 1.56, "priceEarningsRatio": 28.0},
+        {"symbol": "AAPL", "date": "2022-09-24", "returnOnEquity": 1.97, "priceEarningsRatio": 24.4}
+    ]))
+    respx_mock.get("https://financialmodelingprep.com/api/v3/income-statement/AAPL").mock(return_value=httpx.Response(200, json=[
+        {"symbol": "AAPL", "date": "2023-09-30", "revenue": 383e9, "netIncome": 97e9}
+    ]))
+    screener = Screener()
+
+    asyncio.run(screener.run_cycle())
+    result = screener.table.screen(parse_query("roe>1"))
+
+    assert result["results"] == [{
+        "symbol": "AAPL", "date": "2023-09-30", "current_ratio": None, "debt_to_equity": None,
+        "roe": 1.56, "pe_ratio": 28.0, "revenue": 383e9, "net_income": 97e9
+    }]
+    assert fundamentals_store.stale(["AAPL", "MSFT"], Config.SCREENER_MAX_AGE, 10) == ["MSFT"]
+
+def test_partial_failure_keeps_known_fundamentals(respx_mock: MockRouter, monkeypatch):
+    """Si falla una de las dos llamadas no se pisan los valores guardados y el símbolo sigue pendiente"""
+    monkeypatch.setattr(Config, "SCREENER_UNIVERSE", "AAPL")
+    fundamentals_store.upsert(ROWS[:1])
+    before = [tuple(row) for row in fundamentals_store.load()]
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(return_value=httpx.Response(404))
+    respx_mock.get("https://financialmodelingprep.com/api/v3/income-statement/AAPL").mock(return_value=httpx.Response(200, json=[
+        {"symbol": "AAPL", "date": "2024-09-28", "revenue": 391e9, "netIncome": 94e9}
+    ]))
+
+    updated = asyncio.run(Screener().refresh(["AAPL"]))
+
+    assert updated == 0
+    assert [tuple(row) for row in fundamentals_store.load()] == before  # updated_at incluido
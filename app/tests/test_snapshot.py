@@ -0,0 +1,41 @@
+# app/tests/test_snapshot.py
+import asyncio
+import pytest
+from app.snapshot import build_snapshot, parse_deadlines, parse_sections
+
+OPTIONS = {"interval": "daily", "period": "annual", "market": "US", "news_limit": 5}
+
+def test_slow_section_is_pending_then_served_from_cache(fake_providers):
+    """Una sección lenta no retrasa la ficha: vuelve 'pending' y la siguiente petición la sirve de caché"""
+    fake_providers["fmp"].latency = 0.3
+    sections = ["prices", "ratios"]
+    deadlines = parse_deadlines("ratios:0.05", sections, 0.05)
+
+    async def snapshots():
+        first = await build_snapshot("AAPL", sections, deadlines, OPTIONS)
+        await asyncio.sleep(0.4)  # La consulta de ratios termina en segundo plano
+        second = await build_snapshot("AAPL", sections, deadlines, OPTIONS)
+        return first, second
+    first, second = asyncio.run(snapshots())
+
+    assert first["complete"] is False and first["elapsed_ms"] < 250
+    assert first["sections"]["prices"]["status"] == "ok"  # Alpha Vantage (sin latencia)
+    assert first["sections"]["prices"]["data"]["symbol"] == "AAPL"
+    assert first["sections"]["ratios"]["status"] == "pending"
+    assert second["complete"] is True and second["sections"]["ratios"]["data"][0]["symbol"] == "AAPL"
+    assert fake_providers["fmp"].calls == 1  # La segunda ficha no volvió a consultar ratios
+
+def test_section_selection_and_errors(fake_providers):
+    """Solo se consultan las secciones pedidas y los errores quedan en su sección"""
+    fake_providers["alpha_vantage"].errors = [400]
+
+    snapshot = asyncio.run(build_snapshot("MSFT", ["prices"], {"prices": 1.0}, OPTIONS))
+
+    assert list(snapshot["sections"]) == ["prices"]
+    assert snapshot["sections"]["prices"] == {"status": "error", "error": "Error simulado de alpha_vantage", "code": 400}
+    assert fake_providers["fmp"].calls == 0
+    assert parse_sections(None) == ["instruments", "prices", "financials", "ratios", "news"]
+    with pytest.raises(ValueError):
+        parse_sections("prices,quotes")
+    with pytest.raises(ValueError):
+        parse_deadlines("news:soon", ["news"], 1.0)
@@ -0,0 +1,105 @@
+# app/tests/test_streaming.py
+import asyncio
+import httpx
+from fastapi import WebSocketDisconnect
+from respx import MockRouter
+from app.cache import cache
+from app.config import Config
+from app.services import alpha_vantage
+from app.streaming import PriceStream, Subscriber, _read_commands, diff_bars, price_stream
+
+def daily_response(bars: dict) -> dict:
+    return {
+        "Meta Data": {"2. Symbol": "AAPL", "3. Last Refreshed": max(bars)},
+        "Time Series (Daily)": {
+            day: {"1. open": "170", "2. high": "175", "3. low": "169", "4. close": str(close), "5. volume": "100"}
+            for day, close in bars.items()
+        }
+    }
+
+def series(timestamps, closes) -> dict:
+    n = len(timestamps)
+    return {"type": "bars", "symbol": "AAPL", "interval": "1min", "timestamps": timestamps, "open": [1.0] * n,
+            "high": [2.0] * n, "low": [0.5] * n, "close": closes, "volume": [10] * n}
+
+def test_diff_bars_sends_new_and_changed_bars():
+    """Solo se publican las barras posteriores y la barra en curso si ha cambiado"""
+    last = {"ts": 120, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10}
+
+    assert diff_bars(series([60, 120, 180], [1.2, 1.5, 1.7]), last)["timestamps"] == [180]
+    assert diff_bars(series([60, 120, 180], [1.2, 1.6, 1.7]), last)["close"] == [1.6, 1.7]
+    assert diff_bars(series([60, 120], [1.2, 1.5]), last)["timestamps"] == []
+    assert diff_bars(series([60, 120], [1.2, 1.5]), None)["timestamps"] == [120]
+
+def test_slow_subscriber_conflates_updates():
+    """Un cliente lento recibe un único mensaje por símbolo con las barras más recientes"""
+    subscriber = Subscriber(max_bars=3)
+    subscriber.push(series([60, 120], [1.0, 1.1]))
+    subscriber.push(series([120, 180, 240], [1.2, 1.3, 1.4]))
+
+    messages = asyncio.run(subscriber.next(0.1))
+
+    assert len(messages) == 1
+    assert messages[0]["timestamps"] == [120, 180, 240] and messages[0]["close"] == [1.2, 1.3, 1.4]
+    assert subscriber.counters["conflated"] == 1 and subscriber.counters["dropped_bars"] == 1
+
+def test_fan_out_across_workers(respx_mock: MockRouter):
+    """El worker que consulta publica las diferencias y el otro las entrega a su cliente"""
+    route = respx_mock.get("https://www.alphavantage.co/query")
+    route.mock(return_value=httpx.Response(200, json=daily_response({"2023-10-04": 171, "2023-10-05": 172})))
+    poller, server = PriceStream(), PriceStream()
+    subscriber = Subscriber()
+
+    async def scenario():
+        await server.subscribe(subscriber, ["AAPL"], "daily")
+        snapshot = await subscriber.next(1)
+        await poller.poll(("AAPL", "daily"))  # Primera referencia: última barra
+        first = await subscriber.next(1)
+
+        route.mock(return_value=httpx.Response(200, json=daily_response({"2023-10-05": 173, "2023-10-06": 174})))
+        cache.reset()
+        await cache.redis_client.delete(alpha_vantage.get_stock_prices.cache_key("AAPL", "daily"))
+        await poller.poll(("AAPL", "daily"))
+        second = await subscriber.next(1)
+        await server.stop()
+        return snapshot, first, second
+
+    snapshot, first, second = asyncio.run(scenario())
+
+    assert snapshot[0]["type"] == "snapshot" and snapshot[0]["close"] == [171.0, 172.0]
+    assert first[0]["type"] == "bars" and first[0]["close"] == [172.0]
+    assert second[0]["close"] == [173.0, 174.0]
+
+class FakeWebSocket:
+    """Cliente WebSocket que envía unas órdenes y se desconecta"""
+
+    def __init__(self, *commands):
+        self.commands = list(commands)
+
+    async def receive_text(self) -> str:
+        if not self.commands:
+            raise WebSocketDisconnect()
+        return self.commands.pop(0)
+
+def test_commands_validate_symbols_and_limit(fake_providers, monkeypatch):
+    """'symbols' debe ser una lista y volver a suscribirse no cuenta dos veces para el límite"""
+    monkeypatch.setattr(Config, "STREAM_MAX_SYMBOLS", 2)
+    subscriber = Subscriber()
+    websocket = FakeWebSocket(
+        '{"action": "subscribe", "symbols": "AAPL", "interval": "daily"}',
+        '{"action": "subscribe", "symbols": null, "interval": "daily"}',
+        '{"action": "subscribe", "symbols": ["AAPL", "MSFT"], "interval": "daily"}',
+        '{"action": "subscribe", "symbols": ["MSFT", "AAPL"], "interval": "daily"}'
+    )
+
+    async def scenario():
+        await _read_commands(websocket, subscriber)
+        messages = [message for message in await subscriber.next(1) if message["type"] != "snapshot"]
+        await price_stream.stop()
+        return messages
+
+    messages = asyncio.run(scenario())
+
+    assert [message.get("code") for message in messages[:2]] == [400, 400]
+    assert [message["type"] for message in messages[2:]] == ["subscribe", "subscribe"]
+    assert messages[3]["symbols"] == ["AAPL", "MSFT"]
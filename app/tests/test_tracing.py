@@ -0,0 +1,66 @@
+# app/tests/test_tracing.py
+import asyncio
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+from respx import MockRouter
+from app.config import Config
+from app.services import fmp
+from app.tracing import TracedRoute, TracingMiddleware, exporter
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+@pytest.fixture
+def traced_app(respx_mock: MockRouter) -> FastAPI:
+    respx_mock.get("https://financialmodelingprep.com/api/v3/ratios/AAPL").mock(
+        return_value=httpx.Response(200, json=[{"symbol": "AAPL", "date": "2023-09-30", "priceEarningsRatio": 28.0}])
+    )
+    app = FastAPI()
+    app.router.route_class = TracedRoute
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/ratios")
+    async def ratios(symbol: str):
+        return await fmp.get_financial_ratios(symbol)
+
+    return app
+
+def get(app: FastAPI, url: str, headers: dict = None) -> httpx.Response:
+    async def request():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            response = await client.get(url, headers=headers)
+        await exporter.stop()
+        return response
+    return asyncio.run(request())
+
+def test_server_timing_breaks_down_stages(traced_app, monkeypatch):
+    """Las peticiones muestreadas detallan Redis, limitador, proveedor, parseo y validación"""
+    monkeypatch.setattr(Config, "TRACING_SAMPLE_RATE", 1.0)
+
+    timing = get(traced_app, "/ratios?symbol=AAPL").headers["server-timing"]
+
+    stages = {metric.split(";")[0] for metric in timing.split(", ")}
+    assert {"handler", "cache.l2", "fmp.get_financial_ratios", "ratelimit", "upstream", "parse", "validate", "total"} <= stages
+    assert 'upstream;dur=' in timing and 'desc="fmp"' in timing
+
+    monkeypatch.setattr(Config, "TRACING_SAMPLE_RATE", 0.0)
+    assert "server-timing" not in get(traced_app, "/ratios?symbol=AAPL").headers
+
+def test_traceparent_is_continued_and_exported(traced_app, tmp_path, monkeypatch):
+    """Con 'traceparent' muestreado se continúa la traza y se exporta en OTLP/JSON"""
+    monkeypatch.setattr(Config, "TRACING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(Config, "TRACING_EXPORTER", "file")
+    monkeypatch.setattr(Config, "TRACING_EXPORT_FILE", str(tmp_path / "traces.jsonl"))
+
+    get(traced_app, "/ratios?symbol=AAPL", {"traceparent": TRACEPARENT})
+
+    payload = json.loads((tmp_path / "traces.jsonl").read_text())
+    spans = {span["name"]: span for span in payload["resourceSpans"][0]["scopeSpans"][0]["spans"]}
+    root = spans["GET /ratios"]
+    assert root["traceId"] == "0af7651916cd43dd8448eb211c80319c" and root["parentSpanId"] == "b7ad6b7169203331"
+    assert spans["handler"]["parentSpanId"] == root["spanId"]
+    upstream = {item["key"]: item["value"] for item in spans["upstream"]["attributes"]}
+    assert upstream["url.full"]["stringValue"] == "https://financialmodelingprep.com/api/v3/ratios/AAPL"
+    assert upstream["http.status_code"]["intValue"] == "200"
@@ -0,0 +1,188 @@
+# app/timeseries.py
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import numpy as np
+
+# Columnas OHLCV de una serie normalizada
+PRICE_FIELDS = ("open", "high", "low", "close")
+SERIES_FIELDS = PRICE_FIELDS + ("volume",)
+
+# Zona horaria que Alpha Vantage usa para las series intradía
+DEFAULT_TIMEZONE = "US/Eastern"
+
+def _zone(name: str):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+def _to_epoch(stamps: List[str], tz_name: str, daily: bool) -> np.ndarray:
+    """Convierte fechas de Alpha Vantage a segundos UNIX (vectorizado)"""
+    naive = np.array(stamps, dtype="datetime64[s]").astype(np.int64)
+    if daily:
+        return naive  # Barras diarias: medianoche UTC de la fecha de sesión
+    # Intradía en hora local: desplazamiento por día (las sesiones no cruzan cambios de horario)
+    zone = _zone(tz_name)
+    days = naive // 86400
+    offsets = {
+        day: int(datetime.fromtimestamp(int(day) * 86400 + 43200, timezone.utc)
+                 .replace(tzinfo=None).replace(tzinfo=zone).utcoffset().total_seconds())
+        for day in np.unique(days)
+    }
+    return naive - np.array([offsets[day] for day in days], dtype=np.int64)
+
+def local_offsets(timestamps: np.ndarray, tz_name: Optional[str]) -> np.ndarray:
+    """Desplazamiento UTC (segundos) de cada timestamp en la zona horaria de la serie"""
+    zone = _zone(tz_name or DEFAULT_TIMEZONE)
+    days, positions = np.unique(np.asarray(timestamps, dtype=np.int64) // 86400, return_inverse=True)
+    offsets = np.array(
+        [int(datetime.fromtimestamp(int(day) * 86400 + 43200, zone).utcoffset().total_seconds()) for day in days],
+        dtype=np.int64
+    )
+    return offsets[positions]
+
+def _from_epoch(timestamps: List[int], tz_name: str, daily: bool) -> List[str]:
+    if daily:
+        return [datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d") for ts in timestamps]
+    zone = _zone(tz_name)
+    return [datetime.fromtimestamp(ts, zone).strftime("%Y-%m-%d %H:%M:%S") for ts in timestamps]
+
+def normalize_alpha_vantage(data: Dict, symbol: str, interval: str) -> Dict:
+    """
+    Convierte la respuesta de Alpha Vantage en una serie columnar compacta
+    Args:
+        data: Respuesta original ({"Meta Data": ..., "Time Series (...)": ...})
+        symbol: Símbolo solicitado
+        interval: Intervalo solicitado (daily, 1min, 5min, etc.)
+
+    Returns:
+        Dict con metadatos y arrays ordenados por fecha ascendente:
+        timestamps (segundos UNIX), open, high, low, close, volume
+    """
+    meta = data.get("Meta Data", {})
+    series_key = next((key for key in data if key.startswith("Time Series")), None)
+    if series_key is None:
+        raise ValueError("Respuesta de Alpha Vantage sin serie temporal")
+
+    tz_name = next((value for key, value in meta.items() if key.endswith("Time Zone")), DEFAULT_TIMEZONE)
+    raw = data[series_key]
+    stamps = sorted(raw)
+
+    # "1. open" -> "open"
+    columns = {}
+    if stamps:
+        for key in raw[stamps[0]]:
+            name = key.split(". ", 1)[-1]
+            if name in SERIES_FIELDS:
+                columns[name] = key
+
+    values = np.array(
+        [[raw[stamp].get(columns.get(field, ""), "nan") for field in SERIES_FIELDS] for stamp in stamps],
+        dtype=np.float64
+    ).reshape(len(stamps), len(SERIES_FIELDS))
+
+    return from_arrays(
+        {
+            "symbol": symbol.upper(),
+            "interval": interval,
+            "timezone": tz_name,
+            "last_refreshed": next((value for key, value in meta.items() if key.endswith("Last Refreshed")), None)
+        },
+        {
+            "timestamps": _to_epoch(stamps, tz_name, interval == "daily"),
+            **{field: values[:, i] for i, field in enumerate(PRICE_FIELDS)},
+            "volume": np.nan_to_num(values[:, 4]).astype(np.int64)
+        }
+    )
+
+def normalize_rows(rows: List[Dict], symbol: str, interval: str, tz_name: str = DEFAULT_TIMEZONE) -> Dict:
+    """
+    Convierte barras en filas (ej: Financial Modeling Prep) en la misma serie
+    columnar que `normalize_alpha_vantage`
+    Args:
+        rows: Barras con 'date' ('YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS' en hora
+            local de tz_name) y open, high, low, close, volume, en cualquier orden
+        symbol: Símbolo solicitado
+        interval: Intervalo solicitado (daily, 1min, 5min, etc.)
+        tz_name: Zona horaria de las fechas intradía
+    """
+    rows = sorted((row for row in rows if row.get("date")), key=lambda row: row["date"])
+    stamps = [row["date"] for row in rows]
+    values = np.array(
+        [[row.get(field) if row.get(field) is not None else np.nan for field in SERIES_FIELDS] for row in rows],
+        dtype=np.float64
+    ).reshape(len(rows), len(SERIES_FIELDS))
+
+    return from_arrays(
+        {
+            "symbol": symbol.upper(),
+            "interval": interval,
+            "timezone": tz_name,
+            "last_refreshed": stamps[-1] if stamps else None
+        },
+        {
+            "timestamps": _to_epoch(stamps, tz_name, interval == "daily"),
+            **{field: values[:, i] for i, field in enumerate(PRICE_FIELDS)},
+            "volume": np.nan_to_num(values[:, 4]).astype(np.int64)
+        }
+    )
+
+def to_arrays(series: Dict) -> Dict[str, np.ndarray]:
+    """Arrays tipados (int64 para timestamps/volumen, float64 para precios)"""
+    arrays = {"timestamps": np.asarray(series["timestamps"], dtype=np.int64)}
+    for field in PRICE_FIELDS:
+        arrays[field] = np.asarray(series[field], dtype=np.float64)
+    arrays["volume"] = np.asarray(series["volume"], dtype=np.int64)
+    return arrays
+
+def from_arrays(meta: Dict, arrays: Dict[str, np.ndarray]) -> Dict:
+    """Serie columnar (listas JSON) a partir de metadatos y arrays tipados"""
+    series = dict(meta)
+    series["timestamps"] = np.asarray(arrays["timestamps"], dtype=np.int64).tolist()
+    for field in PRICE_FIELDS:
+        series[field] = np.asarray(arrays[field], dtype=np.float64).tolist()
+    series["volume"] = np.asarray(arrays["volume"], dtype=np.int64).tolist()
+    return series
+
+def series_meta(series: Dict) -> Dict:
+    """Metadatos de una serie (todo salvo las columnas)"""
+    return {key: value for key, value in series.items() if key != "timestamps" and key not in SERIES_FIELDS}
+
+def to_alpha_vantage(series: Dict, output_size: Optional[str] = "Compact") -> Dict:
+    """Reconstruye el formato original de Alpha Vantage (formato 'raw' heredado)"""
+    interval = series["interval"]
+    # Las series agregadas a partir de barras diarias (weekly, monthly...) se fechan igual
+    daily = series.get("source_interval", interval) == "daily"
+    stamps = _from_epoch(series["timestamps"], series.get("timezone", DEFAULT_TIMEZONE), daily)
+
+    if daily:
+        meta = {
+            "1. Information": f"{'Daily' if interval == 'daily' else interval} Prices (open, high, low, close) and Volumes",
+            "2. Symbol": series["symbol"],
+            "3. Last Refreshed": series.get("last_refreshed"),
+            "4. Output Size": output_size,
+            "5. Time Zone": series.get("timezone", DEFAULT_TIMEZONE)
+        }
+        series_key = "Time Series (Daily)" if interval == "daily" else f"Time Series ({interval})"
+    else:
+        meta = {
+            "1. Information": f"Intraday ({interval}) open, high, low, close prices and volume",
+            "2. Symbol": series["symbol"],
+            "3. Last Refreshed": series.get("last_refreshed"),
+            "4. Interval": interval,
+            "5. Output Size": output_size,
+            "6. Time Zone": series.get("timezone", DEFAULT_TIMEZONE)
+        }
+        series_key = f"Time Series ({interval})"
+
+    bars = {}
+    for i in range(len(stamps) - 1, -1, -1):  # Alpha Vantage ordena de más reciente a más antigua
+        bars[stamps[i]] = {
+            "1. open": f"{series['open'][i]:.4f}",
+            "2. high": f"{series['high'][i]:.4f}",
+            "3. low": f"{series['low'][i]:.4f}",
+            "4. close": f"{series['close'][i]:.4f}",
+            "5. volume": str(series["volume"][i])
+        }
+    return {"Meta Data": meta, series_key: bars}
@@ -0,0 +1,426 @@
+# app/tracing.py
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import nullcontext
+from functools import wraps
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import httpx
+import orjson
+from fastapi.routing import APIRoute
+from app.config import Config
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Tipos de span de OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+# Spans por traza como máximo (el lote de /prices/batch puede generar miles)
+MAX_SPANS = 512
+
+# Trazas pendientes de exportar; si el exportador no da abasto se descartan
+EXPORT_QUEUE_SIZE = 2048
+
+# Traza de la petición en curso y span activo (None si la petición no se muestrea)
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+# Contexto vacío reutilizable: es lo único que cuesta un span sin muestreo
+_NOOP = nullcontext()
+
+class Span:
+    """Etapa medida de una petición (tiempos de perf_counter en segundos)"""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "kind", "start", "end", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: int, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self, error: Optional[str] = None) -> None:
+        if self.end is None:
+            self.end = time.perf_counter()
+            self.error = error or self.error
+
+class Trace:
+    """Spans de una petición muestreada"""
+
+    def __init__(self, trace_id: Optional[str] = None, parent_id: Optional[str] = None):
+        self.trace_id = trace_id or f"{random.getrandbits(128):032x}"
+        self.parent_id = parent_id  # Span remoto recibido en 'traceparent'
+        # Ancla para convertir perf_counter en tiempo UNIX al exportar
+        self.epoch_ns = time.time_ns() - time.perf_counter_ns()
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.handler_end: Optional[float] = None
+
+    def start_span(self, name: str, parent: Optional[Span] = None, kind: int = KIND_INTERNAL, **attributes) -> Optional[Span]:
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return None
+        span = Span(self, name, parent.span_id if parent else self.parent_id, kind, attributes)
+        self.spans.append(span)
+        return span
+
+    def server_timing(self) -> str:
+        """
+        Cabecera Server-Timing: duración acumulada por etapa (ms)
+        Las etapas concurrentes (varios proveedores a la vez) pueden sumar más
+        que 'total'.
+        """
+        root = self.spans[0]
+        stages: Dict[str, List] = {}
+        for span in self.spans[1:]:
+            stage = stages.setdefault(span.name, [0.0, 0, set()])
+            stage[0] += span.duration
+            stage[1] += 1
+            if "provider" in span.attributes:
+                stage[2].add(span.attributes["provider"])
+
+        metrics = []
+        for name, (duration, count, providers) in stages.items():
+            description = ",".join(sorted(providers)) or (f"{count}x" if count > 1 else "")
+            metric = f"{name};dur={duration * 1000:.1f}"
+            metrics.append(f'{metric};desc="{description}"' if description else metric)
+        metrics.append(f"total;dur={root.duration * 1000:.1f}")
+        metrics.append(f'trace;desc="{self.trace_id}"')
+        return ", ".join(metrics)
+
+    def to_otlp(self) -> List[Dict[str, Any]]:
+        """Spans terminados en el formato JSON de OTLP (scopeSpans[].spans)"""
+        spans = []
+        for span in self.spans:
+            if span.end is None:
+                continue
+            item = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": span.kind,
+                "startTimeUnixNano": str(self.epoch_ns + int(span.start * 1e9)),
+                "endTimeUnixNano": str(self.epoch_ns + int(span.end * 1e9)),
+                "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 0}
+            }
+            if span.parent_id:
+                item["parentSpanId"] = span.parent_id
+            spans.append(item)
+        return spans
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+class _SpanContext:
+    """Activa un span durante un bloque 'with' (los spans hijos cuelgan de él)"""
+
+    __slots__ = ("trace", "name", "attributes", "span", "token")
+
+    def __init__(self, trace: Trace, name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> Optional[Span]:
+        self.span = self.trace.start_span(self.name, _span.get(), **self.attributes)
+        self.token = _span.set(self.span) if self.span else None
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.span is not None:
+            _span.reset(self.token)
+            self.span.finish(exc_type.__name__ if exc_type else None)
+
+def span(name: str, **attributes):
+    """
+    Mide un bloque como etapa de la petición en curso:
+
+        with span("parse"):
+            data = response.json()
+
+    Si la petición no se muestrea no hace nada (devuelve None en el 'as').
+    """
+    trace = _trace.get()
+    if trace is None:
+        return _NOOP
+    return _SpanContext(trace, name, attributes)
+
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes) -> Optional[Span]:
+    """
+    Span que no se activa (no tiene hijos) y se cierra explícitamente con
+    finish(); útil cuando la etapa termina en otro sitio, como la lectura
+    del cuerpo de una respuesta HTTP
+    """
+    trace = _trace.get()
+    if trace is None:
+        return None
+    return trace.start_span(name, _span.get(), kind, **attributes)
+
+def annotate(**attributes) -> None:
+    """Añade atributos al span activo (si la petición se muestrea)"""
+    current = _span.get()
+    if current is not None:
+        current.set(**attributes)
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+def detach() -> None:
+    """
+    Desvincula la tarea actual de la traza heredada: las tareas de fondo
+    creadas durante una petición (workers de exportación, poller del
+    streaming) copian su contexto y, si no, alargarían esa traza
+    """
+    _trace.set(None)
+    _span.set(None)
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, span_id, muestreado) de una cabecera W3C 'traceparent' válida"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+class Sampler:
+    """
+    Decide qué peticiones se trazan:
+    - si llega 'traceparent', se respeta su decisión de muestreo
+    - si no, una fracción TRACING_SAMPLE_RATE, con un máximo de
+      TRACING_MAX_PER_SECOND por worker para acotar el coste bajo carga
+    """
+
+    def __init__(self):
+        self._second = 0
+        self._count = 0
+
+    def should_sample(self, parent: Optional[Tuple[str, str, bool]]) -> bool:
+        if parent is not None:
+            return parent[2]
+        if Config.TRACING_SAMPLE_RATE <= 0 or random.random() >= Config.TRACING_SAMPLE_RATE:
+            return False
+        second = int(time.monotonic())
+        if second != self._second:
+            self._second, self._count = second, 0
+        if self._count >= Config.TRACING_MAX_PER_SECOND:
+            return False
+        self._count += 1
+        return True
+
+class TraceExporter:
+    """
+    Exporta las trazas en segundo plano en formato OTLP/JSON:
+    - 'otlp': POST a un colector (TRACING_OTLP_ENDPOINT, ej. el de OpenTelemetry)
+    - 'file': una línea JSON por lote en TRACING_EXPORT_FILE
+    - 'none': no exporta (solo la cabecera Server-Timing)
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._batch: List[Trace] = []
+        self.counters = {"exported": 0, "dropped": 0, "failed": 0}
+
+    def submit(self, trace: Trace) -> None:
+        """Encola una traza terminada sin bloquear la petición"""
+        if Config.TRACING_EXPORTER not in ("otlp", "file"):
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(trace)
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "pending": self._queue.qsize() if self._queue else 0}
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._queue = asyncio.Queue(maxsize=EXPORT_QUEUE_SIZE)
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            self._batch = [await self._queue.get()]
+            # Agrupa lo que llegue durante el intervalo en una sola exportación
+            await asyncio.sleep(Config.TRACING_EXPORT_INTERVAL)
+            while not self._queue.empty() and len(self._batch) < Config.TRACING_EXPORT_BATCH:
+                self._batch.append(self._queue.get_nowait())
+            await self.export(self._batch)
+            self._batch = []
+
+    def payload(self, traces: List[Trace]) -> Dict[str, Any]:
+        """ExportTraceServiceRequest de OTLP con los spans de varias trazas"""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    _otlp_attribute("service.name", Config.TRACING_SERVICE_NAME),
+                    _otlp_attribute("service.version", Config.APP_VERSION),
+                    _otlp_attribute("process.pid", os.getpid())
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [span for trace in traces for span in trace.to_otlp()]
+                }]
+            }]
+        }
+
+    async def export(self, traces: List[Trace]) -> None:
+        body = orjson.dumps(self.payload(traces))
+        try:
+            if Config.TRACING_EXPORTER == "otlp":
+                if self._client is None:
+                    self._client = httpx.AsyncClient(timeout=5.0)
+                response = await self._client.post(
+                    Config.TRACING_OTLP_ENDPOINT, content=body, headers={"Content-Type": "application/json"}
+                )
+                response.raise_for_status()
+            else:
+                await asyncio.to_thread(self._append, body)
+            self.counters["exported"] += len(traces)
+        except (httpx.HTTPError, OSError) as e:
+            self.counters["failed"] += len(traces)
+            logger.warning(f"No se pudieron exportar {len(traces)} trazas: {str(e)}")
+
+    @staticmethod
+    def _append(body: bytes) -> None:
+        directory = os.path.dirname(Config.TRACING_EXPORT_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(Config.TRACING_EXPORT_FILE, "ab") as handle:
+            handle.write(body + b"\n")
+
+    async def stop(self) -> None:
+        """Exporta lo pendiente y detiene el worker (al apagar la aplicación)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        pending, self._batch = self._batch, []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if pending:
+            await self.export(pending)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+sampler = Sampler()
+exporter = TraceExporter()
+
+class TracingMiddleware:
+    """
+    Middleware ASGI que traza las peticiones muestreadas: span raíz por
+    petición, spans de cada etapa (Redis, limitador, proveedor, parseo...)
+    y cabecera Server-Timing con la duración de cada una
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not Config.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+        if not sampler.should_sample(parent):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(*parent[:2]) if parent else Trace()
+        root = trace.start_span(
+            scope["method"], kind=KIND_SERVER, **{"http.method": scope["method"], "url.path": scope["path"]}
+        )
+        trace_token, span_token = _trace.set(trace), _span.set(root)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                if trace.handler_end is not None:
+                    # Validación del response_model y serialización (tras el endpoint)
+                    validate = trace.start_span("validate", root)
+                    if validate is not None:
+                        validate.start = trace.handler_end
+                        validate.finish()
+                root.set(**{"http.status_code": message["status"]})
+                if Config.TRACING_SERVER_TIMING:
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", trace.server_timing().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            root.finish(type(e).__name__)
+            raise
+        finally:
+            _trace.reset(trace_token)
+            _span.reset(span_token)
+            route = scope.get("route")
+            if getattr(route, "path", None):
+                root.name = f"{scope['method']} {route.path}"
+                root.set(**{"http.route": route.path})
+            root.finish()
+            exporter.submit(trace)
+
+def traced_endpoint(endpoint: Callable) -> Callable:
+    """Span 'handler' alrededor del endpoint; marca dónde empieza la validación de la respuesta"""
+    if not asyncio.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        trace = _trace.get()
+        if trace is None:
+            return await endpoint(*args, **kwargs)
+        with span("handler"):
+            result = await endpoint(*args, **kwargs)
+        trace.handler_end = time.perf_counter()
+        return result
+    return wrapper
+
+class TracedRoute(APIRoute):
+    """Ruta de FastAPI cuyo endpoint se mide con traced_endpoint"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, traced_endpoint(endpoint), **kwargs)
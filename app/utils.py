@@ -1,99 +1,68 @@
 # app/utils.py
+import inspect
 import logging
 import time
-from functools import lru_cache, wraps
+from functools import wraps
 from datetime import datetime, timedelta
 from typing import Callable, Any, Optional, Dict
-import redis
 from app.config import Config
+from app.cache import CacheManager, cache  # Reexportado por compatibilidad
+from app.ratelimit import RateLimiter, rate_limiter  # Reexportado por compatibilidad
+from app.metrics import observe_call
+from app.tracing import span
 
 # Configurar logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-class CacheManager:
-    """Gestor de caché para almacenamiento temporal de datos"""
-    
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=Config.REDIS_HOST,
-            port=Config.REDIS_PORT,
-            password=Config.REDIS_PASSWORD,
-            decode_responses=True
-        )
-    
-    @lru_cache(maxsize=100)
-    def memory_cache(self, func: Callable, *args, **kwargs):
-        """Caché en memoria usando LRU"""
-        return func(*args, **kwargs)
-    
-    def redis_cache(self, key: str, ttl: int = 300):
-        """Decorador para caché en Redis"""
-        def decorator(func: Callable):
-            @wraps(func)
-            def wrapper(*args, **kwargs):
-                cached = self.redis_client.get(key)
-                if cached:
-                    return cached
-                result = func(*args, **kwargs)
-                self.redis_client.setex(key, ttl, result)
-                return result
-            return wrapper
-        return decorator
-
-cache = CacheManager()
+def _call_outcome(result: Any) -> str:
+    """'ok', el código de un diccionario de error o 'error' si no lo tiene"""
+    if isinstance(result, dict) and "error" in result:
+        return str(result.get("code") or "error")
+    return "ok"
 
 def log_api_call(func: Callable) -> Callable:
-    """Decorador para registrar llamadas a APIs externas"""
+    """
+    Decorador para registrar llamadas a APIs externas
+    Además del log, mide la duración y el resultado en provider_calls_total
+    y provider_call_duration_seconds (etiqueta 'modulo.funcion') y, si la
+    petición se traza, abre un span con ese nombre.
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    def finish(start_time: float, outcome: str) -> None:
+        execution_time = time.perf_counter() - start_time
+        observe_call(name, outcome, execution_time)
+        logger.info(f"Llamada a {name} completada en {execution_time:.2f}s ({outcome})")
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start_time = time.perf_counter()
+            try:
+                with span(name):
+                    result = await func(*args, **kwargs)
+            except Exception as e:
+                finish(start_time, "exception")
+                logger.error(f"Error en {name}: {str(e)}", exc_info=True)
+                raise
+            finish(start_time, _call_outcome(result))
+            return result
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        logger.info(f"Iniciando llamada a {func.__name__}")
-        
+        start_time = time.perf_counter()
         try:
             result = func(*args, **kwargs)
-            execution_time = time.time() - start_time
-            logger.info(
-                f"Llamada a {func.__name__} completada en {execution_time:.2f}s"
-            )
-            return result
         except Exception as e:
-            logger.error(
-                f"Error en {func.__name__}: {str(e)}",
-                exc_info=True
-            )
+            finish(start_time, "exception")
+            logger.error(f"Error en {name}: {str(e)}", exc_info=True)
             raise
-    
+        finish(start_time, _call_outcome(result))
+        return result
     return wrapper
 
-class RateLimiter:
-    """Gestor de límites de tasa para APIs externas"""
-    
-    _limits: Dict[str, Dict[str, Any]] = {
-        "alpha_vantage": {"calls": 0, "max": 5, "window": 60},
-        "fmp": {"calls": 0, "max": 250, "window": 86400},
-        "newsapi": {"calls": 0, "max": 100, "window": 86400}
-    }
-    
-    @classmethod
-    def check_limit(cls, service: str) -> bool:
-        """Verifica si se ha excedido el límite de llamadas"""
-        now = time.time()
-        limit_data = cls._limits.get(service)
-        
-        if not limit_data:
-            return True
-        
-        if now - limit_data.get("last_reset", 0) > limit_data["window"]:
-            limit_data["calls"] = 0
-            limit_data["last_reset"] = now
-        
-        if limit_data["calls"] >= limit_data["max"]:
-            return False
-        
-        limit_data["calls"] += 1
-        return True
-
 def handle_api_error(error: Exception, service: str) -> Dict[str, str]:
     """Maneja errores de APIs externas de forma estandarizada"""
     error_msg = f"Error en {service}: {str(error)}"
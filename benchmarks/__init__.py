@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Scripts de rendimiento (no forman parte de la suite de pytest)
@@ -0,0 +1,73 @@
+# benchmarks/bench_async_clients.py
+"""
+Compara el rendimiento concurrente de la capa de proveedores antes y después
+de migrar a clientes asíncronos.
+
+- antes: corrutina que llama a `requests.get` (bloquea el event loop)
+- después: `alpha_vantage.get_stock_prices` con el cliente httpx compartido
+
+Uso:
+    python -m benchmarks.bench_async_clients --requests 200 --concurrency 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from benchmarks.fake_upstream import start_fake_upstream
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones totales por escenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="Peticiones simultáneas")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia simulada del proveedor (s)")
+    return parser.parse_args()
+
+async def run_scenario(call, total: int, concurrency: int) -> float:
+    """Ejecuta `total` llamadas con `concurrency` en paralelo y devuelve el tiempo total"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+async def main():
+    args = parse_args()
+    server, base_url = start_fake_upstream(args.latency)
+
+    # La configuración se lee al importar: apuntar al proveedor local antes
+    os.environ["ALPHA_VANTAGE_BASE_URL"] = base_url
+    for key in ("ALPHA_VANTAGE_API_KEY", "FMP_API_KEY", "OPENFIGI_API_KEY", "NEWS_API_KEY"):
+        os.environ.setdefault(key, "benchmark")
+
+    import requests
+    from app.services import alpha_vantage
+    from app.services.clients import close_clients
+
+    logging.disable(logging.INFO)
+    session = requests.Session()
+
+    async def blocking_call():
+        # Patrón anterior: E/S síncrona dentro de una corrutina
+        session.get(f"{base_url}/query", params={"symbol": "AAPL"}, timeout=15).json()
+
+    async def async_call():
+        result = await alpha_vantage.get_stock_prices("AAPL")
+        assert "error" not in result, result
+
+    print(f"{args.requests} peticiones, concurrencia {args.concurrency}, latencia {args.latency * 1000:.0f} ms")
+    for name, call in (("antes (requests)", blocking_call), ("después (httpx async)", async_call)):
+        elapsed = await run_scenario(call, args.requests, args.concurrency)
+        print(f"  {name:<24} {elapsed:7.2f}s  {args.requests / elapsed:9.1f} req/s")
+
+    await close_clients()
+    session.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+# benchmarks/bench_indicators.py
+"""
+Mide el cálculo de indicadores técnicos sobre muchas series:
+
+- bucle: implementación barra a barra en Python (como hacían los clientes),
+  medida sobre una muestra y extrapolada
+- vectorizado: cálculo completo con numpy (primera petición de cada serie)
+- incremental: llega una barra nueva por serie y se actualiza la memoria
+- memorizado: misma última barra, sin cálculo
+
+Uso:
+    python -m benchmarks.bench_indicators --symbols 10000 --bars 252
+"""
+import argparse
+import math
+import os
+import time
+
+INDICATORS = "sma:20,ema:12,rsi:14,macd:12:26:9,bbands:20:2,atr:14,volatility:20"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=10000, help="Número de series")
+    parser.add_argument("--bars", type=int, default=252, help="Barras por serie")
+    parser.add_argument("--sample", type=int, default=200, help="Series de la muestra del bucle Python")
+    return parser.parse_args()
+
+def make_series(symbol: str, bars: int, rng) -> dict:
+    close = 100 * (1 + rng.normal(0, 0.02, bars + 1)).cumprod()
+    return {
+        "symbol": symbol,
+        "interval": "daily",
+        "timezone": "US/Eastern",
+        "last_refreshed": None,
+        "timestamps": list(range(0, 86400 * (bars + 1), 86400)),
+        "open": list(close * 0.995),
+        "high": list(close * 1.01),
+        "low": list(close * 0.99),
+        "close": list(close),
+        "volume": [1000] * (bars + 1)
+    }
+
+def window(series: dict, end: int) -> dict:
+    """Las primeras `end` barras de una serie"""
+    return {name: value[:end] if isinstance(value, list) else value for name, value in series.items()}
+
+def loop_indicators(close, high, low):
+    """Referencia barra a barra (sin numpy)"""
+    out = {"sma": [], "ema": [], "rsi": [], "macd": [], "bb": [], "atr": [], "vol": []}
+    ema12 = fast = slow = signal = close[0]
+    gain = loss = atr = 0.0
+    for i, price in enumerate(close):
+        window20 = close[max(0, i - 19):i + 1]
+        mean = sum(window20) / len(window20)
+        out["sma"].append(mean)
+        out["bb"].append(math.sqrt(sum((x - mean) ** 2 for x in window20) / len(window20)))
+        ema12 = 2 / 13 * price + 11 / 13 * ema12
+        out["ema"].append(ema12)
+        fast, slow = 2 / 13 * price + 11 / 13 * fast, 2 / 27 * price + 25 / 27 * slow
+        signal = 2 / 10 * (fast - slow) + 8 / 10 * signal
+        out["macd"].append((fast - slow, signal))
+        change = price - close[i - 1] if i else 0.0
+        gain, loss = (gain * 13 + max(change, 0)) / 14, (loss * 13 + max(-change, 0)) / 14
+        out["rsi"].append(100 - 100 / (1 + gain / loss) if loss else 100.0)
+        true_range = max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1])) if i else high[i] - low[i]
+        atr = (atr * 13 + true_range) / 14
+        out["atr"].append(atr)
+        returns = [math.log(close[j] / close[j - 1]) for j in range(max(1, i - 19), i + 1)]
+        mean_return = sum(returns) / len(returns) if returns else 0.0
+        out["vol"].append(math.sqrt(sum((r - mean_return) ** 2 for r in returns) / len(returns)) if returns else 0.0)
+    return out
+
+def main():
+    args = parse_args()
+    for key in ("ALPHA_VANTAGE_API_KEY", "FMP_API_KEY", "OPENFIGI_API_KEY", "NEWS_API_KEY"):
+        os.environ.setdefault(key, "benchmark")
+
+    import numpy as np
+    from app.analytics import IndicatorMemo, parse_indicators
+
+    rng = np.random.default_rng(42)
+    universe = [make_series(f"SYM{i}", args.bars, rng) for i in range(args.symbols)]
+    indicators = parse_indicators(INDICATORS)
+    memo = IndicatorMemo(args.symbols)
+    total_bars = args.symbols * args.bars
+    print(f"{args.symbols} series x {args.bars} barras ({total_bars:,} barras), indicadores: {INDICATORS}")
+
+    start = time.perf_counter()
+    for series in universe[:args.sample]:
+        loop_indicators(series["close"][:args.bars], series["high"][:args.bars], series["low"][:args.bars])
+    loop = (time.perf_counter() - start) / args.sample * args.symbols
+
+    timings = {}
+    for name, end in (("vectorizado (completo)", args.bars), ("incremental (+1 barra)", args.bars + 1),
+                      ("memorizado (sin cambios)", args.bars + 1)):
+        start = time.perf_counter()
+        for series in universe:
+            memo.get(window(series, end), indicators)
+        timings[name] = time.perf_counter() - start
+
+    print(f"  {'bucle Python (extrapolado)':<28} {loop:8.2f}s  {total_bars / loop:12,.0f} barras/s")
+    for name, elapsed in timings.items():
+        print(f"  {name:<28} {elapsed:8.2f}s  {total_bars / elapsed:12,.0f} barras/s  x{loop / elapsed:.0f}")
+    print(f"  memoria: {memo.counters}")
+
+if __name__ == "__main__":
+    main()
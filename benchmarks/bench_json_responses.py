@@ -0,0 +1,117 @@
+# benchmarks/bench_json_responses.py
+"""
+Compara la ruta de respuesta por defecto (validación contra response_model +
+jsonable_encoder + json) con la ruta rápida (FAST_JSON_RESPONSES: sin
+revalidar, orjson y JSON reutilizado desde la caché) en aciertos de caché.
+
+Escenarios:
+- /prices con una serie diaria completa (~20 años)
+- /prices/batch con muchos símbolos
+- /financials/ratios trimestral
+
+Uso:
+    python -m benchmarks.bench_json_responses --iterations 200
+"""
+import argparse
+import logging
+import os
+import random
+import time
+from datetime import date, timedelta
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="Peticiones por escenario y ruta")
+    parser.add_argument("--bars", type=int, default=5000, help="Barras de la serie completa")
+    parser.add_argument("--symbols", type=int, default=100, help="Símbolos del lote")
+    parser.add_argument("--quarters", type=int, default=160, help="Periodos de ratios trimestrales")
+    return parser.parse_args()
+
+def alpha_vantage_payload(symbol: str, bars: int) -> dict:
+    """Serie diaria con el formato de Alpha Vantage (outputsize=full)"""
+    rng = random.Random(symbol)
+    day, price, series = date(2023, 10, 5), 150.0, {}
+    while len(series) < bars:
+        if day.weekday() < 5:
+            price = max(1.0, price * (1 + rng.gauss(0, 0.01)))
+            series[day.isoformat()] = {
+                "1. open": f"{price * 0.995:.4f}",
+                "2. high": f"{price * 1.01:.4f}",
+                "3. low": f"{price * 0.99:.4f}",
+                "4. close": f"{price:.4f}",
+                "5. volume": str(rng.randint(1_000_000, 90_000_000))
+            }
+        day -= timedelta(days=1)
+    return {"Meta Data": {"2. Symbol": symbol, "3. Last Refreshed": "2023-10-05"}, "Time Series (Daily)": series}
+
+def ratios_payload(symbol: str, quarters: int) -> list:
+    """Histórico trimestral con el formato de Financial Modeling Prep"""
+    rng = random.Random(symbol)
+    return [
+        {
+            "symbol": symbol,
+            "date": (date(2023, 9, 30) - timedelta(days=91 * i)).isoformat(),
+            "currentRatio": rng.uniform(0.5, 3),
+            "debtEquityRatio": rng.uniform(0, 4),
+            "returnOnEquity": rng.uniform(-0.2, 1.5),
+            "priceEarningsRatio": rng.uniform(5, 60)
+        }
+        for i in range(quarters)
+    ]
+
+def main():
+    args = parse_args()
+    for key in ("ALPHA_VANTAGE_API_KEY", "FMP_API_KEY", "OPENFIGI_API_KEY", "NEWS_API_KEY"):
+        os.environ.setdefault(key, "benchmark")
+    os.environ.setdefault("CACHE_L1_TTL", "3600")
+
+    import httpx
+    import respx
+    import fakeredis.aioredis
+    from fastapi.testclient import TestClient
+    from app.cache import cache
+    from app.config import Config
+    from app.main import app
+    from app.ratelimit import RateLimiter
+
+    logging.disable(logging.WARNING)
+    cache.redis_client = fakeredis.aioredis.FakeRedis()
+    for limit in RateLimiter._limits.values():
+        limit["max"] = 1_000_000
+
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    scenarios = [
+        ("/prices (serie completa)", "/prices?symbol=AAPL"),
+        (f"/prices/batch ({args.symbols} símbolos)", "/prices/batch?symbols=" + ",".join(symbols)),
+        ("/financials/ratios (trimestral)", "/financials/ratios?symbol=AAPL&period=quarterly")
+    ]
+
+    with respx.mock(assert_all_called=False) as mock:
+        def prices(request):
+            symbol = request.url.params["symbol"]
+            bars = args.bars if symbol == "AAPL" else 100
+            return httpx.Response(200, json=alpha_vantage_payload(symbol, bars))
+
+        mock.get(url__startswith=Config.ALPHA_VANTAGE_BASE_URL).mock(side_effect=prices)
+        mock.get(url__startswith=f"{Config.FMP_BASE_URL}/api/v3/ratios/").mock(
+            return_value=httpx.Response(200, json=ratios_payload("AAPL", args.quarters))
+        )
+
+        with TestClient(app) as client:
+            print(f"{args.iterations} peticiones por escenario (aciertos de caché L1)")
+            for name, url in scenarios:
+                timings = {}
+                for fast in (False, True):
+                    Config.FAST_JSON_RESPONSES = fast
+                    cache.memory.clear()
+                    body = client.get(url).content  # Calienta la caché
+                    start = time.perf_counter()
+                    for _ in range(args.iterations):
+                        assert client.get(url).status_code == 200
+                    timings[fast] = (time.perf_counter() - start) / args.iterations
+                print(f"  {name:<34} {len(body) / 1024:8.0f} KiB  "
+                      f"actual {timings[False] * 1000:7.2f} ms  rápida {timings[True] * 1000:7.2f} ms  "
+                      f"x{timings[False] / timings[True]:.1f}")
+
+if __name__ == "__main__":
+    main()
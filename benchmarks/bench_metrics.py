@@ -0,0 +1,92 @@
+# benchmarks/bench_metrics.py
+"""
+Mide el coste de la instrumentación de Prometheus:
+- por operación (observación de un proveedor, incremento de caché...)
+- por petición, comparando METRICS_ENABLED=True/False en un acierto de caché
+  de /prices y /financials/ratios (el caso más barato, donde más pesa)
+
+Uso:
+    python -m benchmarks.bench_metrics --iterations 2000
+    PROMETHEUS_MULTIPROC_DIR=/tmp/metrics python -m benchmarks.bench_metrics   # Modo multiproceso
+"""
+import argparse
+import logging
+import os
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="Peticiones por escenario y configuración")
+    parser.add_argument("--operations", type=int, default=100000, help="Repeticiones de cada operación")
+    return parser.parse_args()
+
+def per_operation(label: str, fn, operations: int) -> None:
+    start = time.perf_counter()
+    for _ in range(operations):
+        fn()
+    print(f"  {label:<44} {(time.perf_counter() - start) / operations * 1e6:7.2f} µs")
+
+def main():
+    args = parse_args()
+    for key in ("ALPHA_VANTAGE_API_KEY", "FMP_API_KEY", "OPENFIGI_API_KEY", "NEWS_API_KEY"):
+        os.environ.setdefault(key, "benchmark")
+    os.environ.setdefault("CACHE_L1_TTL", "3600")
+
+    import httpx
+    import respx
+    import fakeredis.aioredis
+    from fastapi.testclient import TestClient
+    from app.cache import cache
+    from app.config import Config
+    from app.main import app
+    from app.metrics import InstrumentedCounter, MULTIPROC_DIR, observe_call, observe_rate_limit, observe_upstream
+    from app.ratelimit import RateLimiter
+    from benchmarks.bench_json_responses import alpha_vantage_payload, ratios_payload
+
+    logging.disable(logging.WARNING)
+    cache.redis_client = fakeredis.aioredis.FakeRedis()
+    for limit in RateLimiter._limits.values():
+        limit["max"] = 1_000_000
+
+    print(f"Modo {'multiproceso (' + MULTIPROC_DIR + ')' if MULTIPROC_DIR else 'de un solo proceso'}")
+    print(f"Coste por operación ({args.operations} repeticiones)")
+    counter = InstrumentedCounter()
+
+    def increment():
+        counter["l1_hits"] += 1
+
+    per_operation("observe_upstream (contador + 2 histogramas)", lambda: observe_upstream("fmp", "200", 0.12, 4096), args.operations)
+    per_operation("observe_call (contador + histograma)", lambda: observe_call("fmp.get_financial_ratios", "ok", 0.12), args.operations)
+    per_operation("observe_rate_limit (inmediata)", lambda: observe_rate_limit("fmp", "immediate"), args.operations)
+    per_operation("counters['l1_hits'] += 1 (instrumentado)", increment, args.operations)
+
+    scenarios = [
+        ("/prices (acierto L1)", "/prices?symbol=AAPL"),
+        ("/financials/ratios (acierto L1)", "/financials/ratios?symbol=AAPL"),
+        ("/cache/stats (sin E/S)", "/cache/stats")
+    ]
+    with respx.mock(assert_all_called=False) as mock:
+        mock.get(url__startswith=Config.ALPHA_VANTAGE_BASE_URL).mock(
+            return_value=httpx.Response(200, json=alpha_vantage_payload("AAPL", 100))
+        )
+        mock.get(url__startswith=f"{Config.FMP_BASE_URL}/api/v3/ratios/").mock(
+            return_value=httpx.Response(200, json=ratios_payload("AAPL", 10))
+        )
+        with TestClient(app) as client:
+            print(f"Coste por petición ({args.iterations} peticiones)")
+            for name, url in scenarios:
+                client.get(url)  # Calienta la caché
+                timings = {}
+                for enabled in (False, True, False, True):  # Alternando para reducir el ruido
+                    Config.METRICS_ENABLED = enabled
+                    start = time.perf_counter()
+                    for _ in range(args.iterations):
+                        client.get(url)
+                    elapsed = (time.perf_counter() - start) / args.iterations
+                    timings[enabled] = min(timings.get(enabled, elapsed), elapsed)
+                overhead = timings[True] - timings[False]
+                print(f"  {name:<34} sin métricas {timings[False] * 1e3:6.3f} ms  con métricas "
+                      f"{timings[True] * 1e3:6.3f} ms  (+{overhead * 1e6:.0f} µs, {overhead / timings[False]:+.1%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+# benchmarks/fake_upstream.py
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# Respuesta mínima con el formato de Alpha Vantage
+ALPHA_VANTAGE_PAYLOAD = {
+    "Meta Data": {
+        "1. Information": "Daily Prices (open, high, low, close) and Volumes",
+        "2. Symbol": "AAPL",
+        "3. Last Refreshed": "2023-10-05"
+    },
+    "Time Series (Daily)": {
+        "2023-10-05": {
+            "1. open": "172.8100",
+            "2. high": "174.2600",
+            "3. low": "170.8000",
+            "4. close": "173.5000",
+            "5. volume": "10058372"
+        }
+    }
+}
+
+def start_fake_upstream(latency: float = 0.05) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Levanta un servidor HTTP local que imita a Alpha Vantage
+    Args:
+        latency: Segundos de espera antes de responder cada petición
+
+    Returns:
+        Tupla (servidor, URL base)
+    """
+    body = json.dumps(ALPHA_VANTAGE_PAYLOAD).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Permite keep-alive
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+# Variables de entorno con la URL base de cada proveedor (ver app/config.py)
+BASE_URL_SETTINGS = {
+    "alpha_vantage": "ALPHA_VANTAGE_BASE_URL",
+    "fmp": "FMP_BASE_URL",
+    "openfigi": "OPENFIGI_BASE_URL",
+    "newsapi": "NEWS_API_BASE_URL"
+}
+
+# Respuesta de cada proveedor al superar su límite (formato real de cada API)
+RATE_LIMITED = {
+    "alpha_vantage": (200, {"Note": "Thank you for using Alpha Vantage! Our standard API rate limit is 5 requests per minute."}),
+    "fmp": (429, {"Error Message": "Limit Reach . Please upgrade your plan or visit our documentation for more details"}),
+    "openfigi": (429, {"error": "Too Many Requests"}),
+    "newsapi": (429, {"status": "error", "code": "rateLimited", "message": "You have made too many requests recently."})
+}
+
+INTRADAY_SECONDS = {"1min": 60, "5min": 300, "15min": 900, "30min": 1800, "60min": 3600}
+
+def alpha_vantage_series(symbol: str, interval: str, bars: int) -> dict:
+    """Serie diaria o intradía con el formato de Alpha Vantage"""
+    rng = random.Random(f"{symbol}:{interval}")
+    price, series = rng.uniform(20, 500), {}
+    if interval == "daily":
+        day = date(2023, 10, 5)
+        while len(series) < bars:
+            if day.weekday() < 5:
+                series[day.isoformat()] = _bar(rng, price)
+                price = series[day.isoformat()]["price"]
+            day -= timedelta(days=1)
+        key, meta = "Time Series (Daily)", {}
+    else:
+        step = timedelta(seconds=INTRADAY_SECONDS[interval])
+        moment = datetime(2023, 10, 5, 16, 0)
+        for _ in range(bars):
+            series[moment.strftime("%Y-%m-%d %H:%M:%S")] = _bar(rng, price)
+            price = series[moment.strftime("%Y-%m-%d %H:%M:%S")]["price"]
+            moment -= step
+        key, meta = f"Time Series ({interval})", {"4. Interval": interval, "6. Time Zone": "US/Eastern"}
+    for bar in series.values():
+        del bar["price"]
+    return {"Meta Data": {"2. Symbol": symbol, "3. Last Refreshed": max(series), **meta}, key: series}
+
+def _bar(rng: random.Random, price: float) -> dict:
+    price = max(1.0, price * (1 + rng.gauss(0, 0.01)))
+    return {
+        "1. open": f"{price * 0.995:.4f}",
+        "2. high": f"{price * 1.01:.4f}",
+        "3. low": f"{price * 0.99:.4f}",
+        "4. close": f"{price:.4f}",
+        "5. volume": str(rng.randint(1_000_000, 90_000_000)),
+        "price": price
+    }
+
+def _periods(symbol: str, period: str, count: int) -> list:
+    step = 91 if period.startswith("quarter") else 365
+    return [(date(2023, 9, 30) - timedelta(days=step * i)).isoformat() for i in range(count)]
+
+def respond_alpha_vantage(method: str, path: str, params: dict, body: bytes, bars: int) -> Tuple[int, object]:
+    symbol = params.get("symbol", "")
+    if path != "/query" or not symbol:
+        return 200, {"Error Message": "Invalid API call. Please retry or visit the documentation."}
+    if params.get("function") == "INCOME_STATEMENT":
+        rng = random.Random(f"income:{symbol}")
+        reports = lambda period: [
+            {"fiscalDateEnding": day, "totalRevenue": str(int(rng.uniform(1e8, 4e11))),
+             "netIncome": str(int(rng.uniform(-1e9, 1e11)))}
+            for day in _periods(symbol, period, 5)
+        ]
+        return 200, {"symbol": symbol, "annualReports": reports("annual"), "quarterlyReports": reports("quarterly")}
+    if params.get("function") == "TIME_SERIES_INTRADAY":
+        interval = params.get("interval", "5min")
+        if interval not in INTRADAY_SECONDS:
+            return 200, {"Error Message": "Invalid API call. Please retry or visit the documentation."}
+        return 200, alpha_vantage_series(symbol, interval, bars)
+    return 200, alpha_vantage_series(symbol, "daily", bars if params.get("outputsize") == "full" else min(bars, 100))
+
+def respond_fmp(method: str, path: str, params: dict, body: bytes, bars: int) -> Tuple[int, object]:
+    parts = path.strip("/").split("/")
+    if len(parts) == 5 and parts[:3] == ["api", "v3", "historical-chart"]:
+        interval = "60min" if parts[3] == "1hour" else parts[3]
+        if interval not in INTRADAY_SECONDS:
+            return 404, {"Error Message": "Not found"}
+        return 200, _fmp_rows(alpha_vantage_series(parts[4], interval, bars))
+    if len(parts) != 4 or parts[:2] != ["api", "v3"]:
+        return 404, {"Error Message": "Not found"}
+    resource, symbol = parts[2], parts[3]
+    rng = random.Random(f"{resource}:{symbol}")
+    dates = _periods(symbol, params.get("period", "annual"), 5)
+    if resource == "ratios":
+        return 200, [
+            {"symbol": symbol, "date": day, "currentRatio": rng.uniform(0.5, 3), "debtEquityRatio": rng.uniform(0, 4),
+             "returnOnEquity": rng.uniform(-0.2, 1.5), "priceEarningsRatio": rng.uniform(5, 60)}
+            for day in dates
+        ]
+    if resource == "income-statement":
+        return 200, [
+            {"symbol": symbol, "date": day, "revenue": rng.uniform(1e8, 4e11), "netIncome": rng.uniform(-1e9, 1e11),
+             "peRatio": rng.uniform(5, 60)}
+            for day in dates
+        ]
+    if resource == "historical-price-full":
+        count = min(bars, int(params["timeseries"])) if "timeseries" in params else bars
+        return 200, {"symbol": symbol, "historical": _fmp_rows(alpha_vantage_series(symbol, "daily", count))}
+    return 404, {"Error Message": "Not found"}
+
+def _fmp_rows(payload: dict) -> list:
+    """Barras de una serie de Alpha Vantage con la forma de FMP (la más reciente primero)"""
+    series = next(value for key, value in payload.items() if key.startswith("Time Series"))
+    return [
+        {"date": day, "open": float(bar["1. open"]), "high": float(bar["2. high"]), "low": float(bar["3. low"]),
+         "close": float(bar["4. close"]), "volume": int(bar["5. volume"])}
+        for day, bar in sorted(series.items(), reverse=True)
+    ]
+
+def respond_newsapi(method: str, path: str, params: dict, body: bytes, bars: int) -> Tuple[int, object]:
+    query = params.get("q", "")
+    size = min(int(params.get("pageSize", 20)), 100)
+    return 200, {"status": "ok", "totalResults": size, "articles": [
+        {"source": {"id": None, "name": "Fake Wire"}, "title": f"{query} noticia {i}",
+         "url": f"https://news.example/{query}/{i}", "publishedAt": f"2023-10-05T{i % 24:02d}:00:00Z",
+         "content": f"Contenido de la noticia {i} sobre {query}"}
+        for i in range(size)
+    ]}
+
+def respond_openfigi(method: str, path: str, params: dict, body: bytes, bars: int) -> Tuple[int, object]:
+    if method != "POST" or path != "/v3/mapping":
+        return 404, {"error": "Not found"}
+    jobs = json.loads(body or b"[]")
+    return 200, [
+        {"data": [{"figi": f"BBG{zlib.crc32(str(job.get('idValue')).encode()) % 10**9:09d}", "name": f"{job.get('idValue')} INC",
+                   "ticker": job.get("idValue"), "exchCode": job.get("exchCode", "US"), "securityType": "Common Stock",
+                   "marketSector": "Equity"}]}
+        for job in jobs
+    ]
+
+RESPONDERS = {
+    "alpha_vantage": respond_alpha_vantage,
+    "fmp": respond_fmp,
+    "openfigi": respond_openfigi,
+    "newsapi": respond_newsapi
+}
+
+class FakeProvider:
+    """
+    Servidor HTTP local que imita a un proveedor, con latencia, errores y
+    límite de tasa configurables; cuenta las peticiones por estado
+
+    Los cuerpos se generan de forma determinista por petición y se guardan,
+    para que el coste de generarlos no se confunda con el de la API.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit: Optional[Tuple[int, float]] = None,
+        bars: int = 100
+    ):
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # (llamadas, ventana en segundos)
+        self.bars = bars
+        self.counters: Counter = Counter()
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+        self._window: Deque[float] = deque()
+        self._bodies: Dict[Tuple, Tuple[int, bytes]] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self) -> str:
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Permite keep-alive
+
+            def do_GET(self):
+                provider._handle(self, b"")
+
+            def do_POST(self):
+                provider._handle(self, self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def _admit(self) -> bool:
+        """Ventana deslizante de llamadas (el límite del proveedor real)"""
+        if self.rate_limit is None:
+            return True
+        calls, window = self.rate_limit
+        now = time.monotonic()
+        with self._lock:
+            while self._window and self._window[0] <= now - window:
+                self._window.popleft()
+            if len(self._window) >= calls:
+                return False
+            self._window.append(now)
+            return True
+
+    def _handle(self, handler: BaseHTTPRequestHandler, body: bytes) -> None:
+        url = urlsplit(handler.path)
+        params = dict(parse_qsl(url.query))
+        delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        time.sleep(max(delay, 0.0))
+
+        if not self._admit():
+            status, payload = RATE_LIMITED[self.name]
+            content = json.dumps(payload).encode()
+            outcome = "rate_limited"
+        elif self.error_rate and random.random() < self.error_rate:
+            status, content, outcome = 500, b'{"error": "Internal Server Error"}', "error"
+        else:
+            # La API key no forma parte de la respuesta
+            key = (handler.command, url.path, tuple(sorted((k, v) for k, v in params.items() if k != "apikey")), body)
+            cached = self._bodies.get(key)
+            if cached is None:
+                status, payload = RESPONDERS[self.name](handler.command, url.path, params, body, self.bars)
+                cached = self._bodies[key] = (status, json.dumps(payload).encode())
+            status, content = cached
+            outcome = str(status)
+
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters[outcome] += 1
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+def start_fake_providers(
+    latency: float = 0.05,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    rate_limits: Optional[Dict[str, Tuple[int, float]]] = None,
+    bars: int = 100
+) -> Dict[str, FakeProvider]:
+    """
+    Levanta un proveedor falso por cada API (Alpha Vantage, FMP, OpenFIGI y NewsAPI)
+    Args:
+        latency: Segundos de espera antes de responder cada petición
+        jitter: Variación uniforme (±segundos) de la latencia
+        error_rate: Fracción de peticiones que responden 500
+        rate_limits: Límite por proveedor, {nombre: (llamadas, ventana en segundos)}
+        bars: Barras de las series de precios completas
+
+    Returns:
+        Proveedores arrancados por nombre; `BASE_URL_SETTINGS` indica la
+        variable de entorno que apunta la aplicación a cada uno
+    """
+    providers = {}
+    for name in RESPONDERS:
+        provider = FakeProvider(name, latency, jitter, error_rate, (rate_limits or {}).get(name), bars)
+        provider.start()
+        providers[name] = provider
+    return providers
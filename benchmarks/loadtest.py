@@ -0,0 +1,349 @@
+# benchmarks/loadtest.py
+"""
+Prueba de carga de la aplicación real contra proveedores falsos locales
+
+Levanta un servidor falso por proveedor (Alpha Vantage, FMP, OpenFIGI y
+NewsAPI) con latencia, errores y límites de tasa configurables, arranca la
+API con uvicorn en otro proceso apuntando a ellos y la somete a una mezcla
+de peticiones con concurrencia creciente. Los símbolos siguen una
+distribución de Zipf, como el tráfico real: pocos muy consultados y una
+cola larga.
+
+Por cada nivel de concurrencia informa de peticiones por segundo, latencia
+p50/p95/p99, errores, tasa de aciertos de caché (de /metrics) y llamadas a
+cada proveedor. Los resultados se guardan en JSON para comparar ejecuciones.
+
+Uso:
+    python -m benchmarks.loadtest --concurrency 1,8,32,128 --duration 10
+    python -m benchmarks.loadtest --latency 0.2 --jitter 0.1 --error-rate 0.05 --rate-limit fmp=300/60
+    python -m benchmarks.loadtest --label cambio --compare benchmarks/results/20240101-120000-base.json
+    python -m benchmarks.loadtest --workers 4 --redis   # Redis real (REDIS_HOST...), varios workers
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import httpx
+import numpy as np
+from prometheus_client.parser import text_string_to_metric_families
+from benchmarks.fake_upstream import BASE_URL_SETTINGS, FakeProvider, start_fake_providers
+
+# Peticiones de la mezcla por tipo ({symbol} se sustituye por el símbolo elegido)
+ENDPOINTS = {
+    "prices": "/prices?symbol={symbol}",
+    "ratios": "/financials/ratios?symbol={symbol}",
+    "financials": "/financials?symbol={symbol}",
+    "news": "/news?query={symbol}",
+    "instruments": "/instruments?query={symbol}"
+}
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32,128", help="Niveles de concurrencia, separados por comas")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos por nivel")
+    parser.add_argument("--warmup", type=float, default=0, help="Segundos de calentamiento antes del primer nivel")
+    parser.add_argument("--mix", default="prices=60,ratios=15,financials=10,news=10,instruments=5",
+                        help="Peso de cada tipo de petición")
+    parser.add_argument("--symbols", type=int, default=200, help="Tamaño del universo de símbolos")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Exponente de Zipf (0 = uniforme)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia de los proveedores (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Variación uniforme de la latencia (±s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de respuestas 500 de los proveedores")
+    parser.add_argument("--rate-limit", action="append", default=[], metavar="PROVEEDOR=N/VENTANA",
+                        help="Límite de un proveedor falso (ej. alpha_vantage=5/60); repetible")
+    parser.add_argument("--bars", type=int, default=100, help="Barras de las series completas de precios")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn (más de 1 requiere --redis)")
+    parser.add_argument("--redis", action="store_true", help="Usa el Redis configurado en vez de fakeredis")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla de la mezcla de peticiones")
+    parser.add_argument("--label", default="", help="Etiqueta de la ejecución (nombre del fichero de resultados)")
+    parser.add_argument("--results-dir", default=RESULTS_DIR, help="Directorio de resultados")
+    parser.add_argument("--no-save", action="store_true", help="No guarda los resultados")
+    parser.add_argument("--compare", help="Resultados previos (JSON) con los que comparar")
+    return parser.parse_args()
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"Tipo de petición desconocido: {name} (válidos: {', '.join(ENDPOINTS)})")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+def parse_rate_limits(items: List[str]) -> Dict[str, Tuple[int, float]]:
+    limits = {}
+    for item in items:
+        name, _, spec = item.partition("=")
+        calls, _, window = spec.partition("/")
+        if name not in BASE_URL_SETTINGS or not calls:
+            raise SystemExit(f"Límite no válido: {item} (formato proveedor=N/ventana)")
+        limits[name] = (int(calls), float(window or 60))
+    return limits
+
+class Workload:
+    """Genera peticiones según la mezcla de tipos y la popularidad de cada símbolo"""
+
+    def __init__(self, weights: Dict[str, float], symbols: int, zipf: float):
+        self.kinds = list(weights)
+        self.kind_weights = list(weights.values())
+        self.symbols = [f"T{index:04d}" for index in range(symbols)]
+        self.symbol_weights = [1 / (rank ** zipf) for rank in range(1, symbols + 1)]
+
+    def pick(self, rng: random.Random) -> Tuple[str, str]:
+        kind = rng.choices(self.kinds, self.kind_weights)[0]
+        symbol = rng.choices(self.symbols, self.symbol_weights)[0]
+        return kind, ENDPOINTS[kind].format(symbol=symbol)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_app(args, providers: Dict[str, FakeProvider], data_dir: str) -> Tuple[subprocess.Popen, str]:
+    """Arranca la API en otro proceso, apuntando a los proveedores falsos"""
+    port = free_port()
+    env = dict(os.environ)
+    for name, provider in providers.items():
+        env[BASE_URL_SETTINGS[name]] = provider.base_url
+    for key in ("ALPHA_VANTAGE_API_KEY", "FMP_API_KEY", "OPENFIGI_API_KEY", "NEWS_API_KEY"):
+        env.setdefault(key, "benchmark")
+    # Se mide la aplicación, no la cuota: límites propios altos salvo que se indiquen
+    for key in ("ALPHA_VANTAGE_RATE_LIMIT", "FMP_RATE_LIMIT", "NEWSAPI_RATE_LIMIT", "OPENFIGI_RATE_LIMIT"):
+        env.setdefault(key, "1000000")
+    # Sin tareas de fondo que consuman proveedores durante la medida
+    env.setdefault("PREFETCH_ENABLED", "False")
+    env.setdefault("SCREENER_ENABLED", "False")
+    env["DATA_DIR"] = data_dir
+    for key in ("FIGI_INDEX_PATH", "PRICE_STORE_PATH", "FUNDAMENTALS_STORE_PATH", "EXPORT_DIR"):
+        env.pop(key, None)
+    if args.workers > 1:
+        # /metrics debe agregar a todos los workers
+        metrics_dir = os.path.join(data_dir, "metrics")
+        os.makedirs(metrics_dir, exist_ok=True)
+        env["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+
+    command = [sys.executable, "-m", "benchmarks.serve_app", "--port", str(port), "--workers", str(args.workers)]
+    if not args.redis:
+        command.append("--fake-redis")
+    # Los logs de la aplicación van a un fichero para no mezclarse con el informe
+    log = open(os.path.join(data_dir, "app.log"), "w")
+    process = subprocess.Popen(
+        command, env=env, stdout=log, stderr=subprocess.STDOUT,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+async def wait_until_ready(process: subprocess.Popen, base_url: str, log_path: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise SystemExit(f"La aplicación terminó al arrancar (código {process.returncode}), ver {log_path}")
+            try:
+                await client.get("/health")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise SystemExit("La aplicación no respondió a tiempo")
+
+async def cache_counts(client: httpx.AsyncClient) -> Counter:
+    """cache_requests_total por (nivel, resultado), leído de /metrics"""
+    counts: Counter = Counter()
+    response = await client.get("/metrics")
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            if sample.name == "cache_requests_total":
+                counts[(sample.labels["tier"], sample.labels["result"])] += sample.value
+    return counts
+
+def hit_rate(before: Counter, after: Counter) -> Optional[float]:
+    """Consultas servidas desde L1 (frescas o caducadas) o L2 sobre el total de consultas a L1"""
+    delta = {key: after[key] - before[key] for key in after}
+    hits = delta.get(("l1", "hit"), 0) + delta.get(("l1", "stale"), 0) + delta.get(("l2", "hit"), 0)
+    lookups = delta.get(("l1", "hit"), 0) + delta.get(("l1", "stale"), 0) + delta.get(("l1", "miss"), 0)
+    return hits / lookups if lookups else None
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    values = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(values.mean()), "max": float(values.max())}
+
+async def run_level(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    concurrency: int,
+    duration: float,
+    seed: int
+) -> Tuple[float, float, List[Tuple[str, str, float]]]:
+    """
+    Mantiene `concurrency` usuarios lanzando peticiones durante `duration` segundos
+    Returns:
+        Tupla (duración, fracción de CPU usada por el generador, muestras)
+    """
+    samples: List[Tuple[str, str, float]] = []
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int):
+        rng = random.Random(f"{seed}:{concurrency}:{index}")
+        while time.perf_counter() < deadline:
+            kind, path = workload.pick(rng)
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            samples.append((kind, status, time.perf_counter() - start))
+
+    start, cpu = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(user(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return elapsed, (time.process_time() - cpu) / elapsed, samples
+
+def summarize(
+    concurrency: int,
+    elapsed: float,
+    driver_cpu: float,
+    samples: List[Tuple[str, str, float]],
+    cache_hit_rate: Optional[float],
+    upstream: Dict[str, Dict[str, int]]
+) -> Dict:
+    statuses = Counter(status for _, status, _ in samples)
+    by_kind = defaultdict(list)
+    for kind, _, latency in samples:
+        by_kind[kind].append(latency)
+    return {
+        "concurrency": concurrency,
+        "duration": elapsed,
+        "requests": len(samples),
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "driver_cpu": driver_cpu,
+        "latency_ms": percentiles([latency for _, _, latency in samples]),
+        "errors": sum(count for status, count in statuses.items() if status != "200"),
+        "status": dict(statuses),
+        "cache_hit_rate": cache_hit_rate,
+        "upstream": upstream,
+        "endpoints": {
+            kind: {"requests": len(latencies), **percentiles(latencies)} for kind, latencies in sorted(by_kind.items())
+        }
+    }
+
+def upstream_delta(providers: Dict[str, FakeProvider], before: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    delta = {}
+    for name, provider in providers.items():
+        now = provider.stats()
+        delta[name] = {key: value - before[name].get(key, 0) for key, value in now.items() if value - before[name].get(key, 0)}
+    return delta
+
+def print_level(level: Dict) -> None:
+    latency = level["latency_ms"]
+    hit = "-" if level["cache_hit_rate"] is None else f"{level['cache_hit_rate']:.1%}"
+    calls = " ".join(f"{name}={stats.get('requests', 0)}" for name, stats in level["upstream"].items() if stats)
+    # Con el generador cerca del 100% de CPU se mide el generador, no la API
+    saturated = " (generador saturado)" if level["driver_cpu"] > 0.8 else ""
+    print(f"  {level['concurrency']:>5}  {level['rps']:9.1f}  {latency['p50']:8.1f}  {latency['p95']:8.1f}  "
+          f"{latency['p99']:8.1f}  {level['errors']:>7}  {hit:>7}  {calls or '-'}{saturated}")
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(results: Dict, directory: str, label: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    name = datetime.now().strftime("%Y%m%d-%H%M%S") + (f"-{label}" if label else "")
+    path = os.path.join(directory, f"{name}.json")
+    with open(path, "w") as handle:
+        json.dump(results, handle, indent=2)
+    return path
+
+def compare(results: Dict, path: str) -> None:
+    """Compara rps y latencias con una ejecución anterior, nivel a nivel"""
+    with open(path) as handle:
+        baseline = json.load(handle)
+    previous = {level["concurrency"]: level for level in baseline["levels"]}
+    print(f"\nComparación con {path} ({baseline.get('label') or 'sin etiqueta'}, {baseline.get('git') or '?'})")
+    print(f"  {'conc.':>5}  {'req/s':>16}  {'p50 ms':>16}  {'p95 ms':>16}  {'p99 ms':>16}")
+
+    def change(new: float, old: float) -> str:
+        return f"{new:8.1f} ({(new - old) / old:+.0%})" if old else f"{new:8.1f}"
+
+    for level in results["levels"]:
+        old = previous.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"  {level['concurrency']:>5}  {change(level['rps'], old['rps']):>16}  "
+              + "  ".join(f"{change(level['latency_ms'][p], old['latency_ms'][p]):>16}" for p in ("p50", "p95", "p99")))
+
+async def main():
+    args = parse_args()
+    levels = [int(value) for value in args.concurrency.split(",")]
+    workload = Workload(parse_weights(args.mix), args.symbols, args.zipf)
+    if args.workers > 1 and not args.redis:
+        raise SystemExit("Con varios workers la caché y los límites deben compartirse: añade --redis")
+
+    providers = start_fake_providers(args.latency, args.jitter, args.error_rate, parse_rate_limits(args.rate_limit), args.bars)
+    data_dir = tempfile.mkdtemp(prefix="loadtest-")
+    process, base_url = start_app(args, providers, data_dir)
+    results = {
+        "label": args.label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("compare", "no_save", "results_dir")},
+        "levels": []
+    }
+
+    try:
+        await wait_until_ready(process, base_url, os.path.join(data_dir, "app.log"))
+        limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            if args.warmup:
+                await run_level(client, workload, max(levels), args.warmup, args.seed - 1)
+
+            print(f"Proveedores: latencia {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, "
+                  f"errores {args.error_rate:.0%}; {args.symbols} símbolos (Zipf {args.zipf}), {args.duration:.0f}s por nivel")
+            print(f"  {'conc.':>5}  {'req/s':>9}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'errores':>7}  "
+                  f"{'caché':>7}  llamadas a proveedores")
+            for concurrency in levels:
+                cache_before = await cache_counts(client)
+                upstream_before = {name: provider.stats() for name, provider in providers.items()}
+                elapsed, driver_cpu, samples = await run_level(client, workload, concurrency, args.duration, args.seed)
+                level = summarize(
+                    concurrency, elapsed, driver_cpu, samples,
+                    hit_rate(cache_before, await cache_counts(client)),
+                    upstream_delta(providers, upstream_before)
+                )
+                results["levels"].append(level)
+                print_level(level)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        for provider in providers.values():
+            provider.stop()
+
+    if not args.no_save:
+        print(f"\nResultados guardados en {save_results(results, args.results_dir, args.label)}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+# benchmarks/serve_app.py
+"""
+Arranca la aplicación real con uvicorn para las pruebas de carga
+(lo lanza benchmarks.loadtest en un proceso aparte)
+
+Uso:
+    python -m benchmarks.serve_app --port 8001 --fake-redis
+    python -m benchmarks.serve_app --port 8001 --workers 4   # Necesita Redis (REDIS_HOST...)
+"""
+import argparse
+import sys
+import uvicorn
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=1, help="Procesos de uvicorn")
+    parser.add_argument("--fake-redis", action="store_true", help="Usa fakeredis en memoria (un solo worker)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if not args.fake_redis:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+        return
+
+    if args.workers > 1:
+        sys.exit("--fake-redis no se puede compartir entre workers: usa un Redis real con --workers > 1")
+
+    import fakeredis.aioredis
+    from app.cache import cache
+    cache.redis_client = fakeredis.aioredis.FakeRedis()
+
+    from app.main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+# conftest.py
+import os
+
+# Claves ficticias para poder importar la configuración en pruebas
+# (debe ejecutarse antes de importar el paquete `app`)
+for key in ("ALPHA_VANTAGE_API_KEY", "FMP_API_KEY", "OPENFIGI_API_KEY", "NEWS_API_KEY"):
+    os.environ.setdefault(key, "test")